@@ -1,10 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Union
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from backend.config import get_settings
 from backend.routes import db_router
+from backend.services.container import ServiceContainer
+from backend.utils.metrics import REGISTRY
 from .routes import ingestion
 from .routes import retrieval
 import logging
@@ -21,7 +26,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services are shared by all routes and built in the background, not per request
+    app.state.services = ServiceContainer()
+    warm_up = asyncio.create_task(app.state.services.warm_up())
+    yield
+    warm_up.cancel()
+    await app.state.services.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 origins = ["http://localhost:3000","https://perp-henna.vercel.app"]
@@ -32,6 +47,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read the pagination cursor and revalidate with the ETag
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
@@ -62,6 +79,12 @@ async def health_check():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Per process: with several uvicorn workers, each scrape sees the worker that answered
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     
     port = int(os.getenv("PORT", 8000))
@@ -1,15 +1,25 @@
-from backend.services import llm_service
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, List, Dict, Any, Literal, Optional
 from uuid import UUID
 from pydantic import BaseModel
 from datetime import datetime
 
+import asyncio
+from backend.services.container import (
+    ServiceContainer, get_llm_service, get_message_write_buffer, get_search_message_service,
+    get_search_session_service, get_services
+)
+from backend.services.history_cache import compute_etag
 from backend.services.search_message_service import SearchMessageService
 from backend.services.search_session_service import SearchSessionService
-from ..utils.supabase_client import get_supabase
+from backend.utils.pagination import NEXT_CURSOR_HEADER, InvalidCursor, Page
 import logging
 
+if TYPE_CHECKING:
+    from backend.services.llm_service import LLMService
+    from backend.services.message_write_buffer import MessageWriteBuffer
+
 logger = logging.getLogger(__name__)
 class SessionCreate(BaseModel):
     title: str
@@ -30,8 +40,9 @@ class MessageResponse(BaseModel):
     id: str
     session_id: str
     question: str
-    answer: str
-    sources: List[Dict[str, Any]]
+    # Left out of fields=summary listings
+    answer: Optional[str] = None
+    sources: Optional[List[Dict[str, Any]]] = None
     created_at: str
 
 class TitleRequest(BaseModel):
@@ -43,34 +54,60 @@ class TitleResponse(BaseModel):
     session_id: Optional[str] = None
     updated: bool = False
 
+class SessionHistoryResponse(BaseModel):
+    session: SessionResponse
+    messages: List[MessageResponse]
+
 router = APIRouter(prefix="/api/db", tags=["database"])
 
-async def get_search_session_service():
-    return SearchSessionService(get_supabase())
 
-async def get_search_message_service():
-    return SearchMessageService(get_supabase())
+def _page_response(response: Response, page: Page) -> List[Dict[str, Any]]:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
+
+
+def _not_modified(request: Request, response: Response, payload: Any) -> Optional[Response]:
+    """Tags the response with an ETag, or returns a bodiless 304 when the client already has it."""
+    etag = compute_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 # Session routes
 @router.get("/sessions", response_model=List[SessionResponse])
 async def get_all_sessions(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Literal["summary", "full"] = "summary",
     service: SearchSessionService = Depends(get_search_session_service)
 ) -> List[Dict[str, Any]]:
+    """Newest first; the next page's cursor is in the X-Next-Cursor header."""
     try:
-        return await service.get_all_sessions()
+        page = await service.list_sessions(limit, cursor, fields)
+        return _not_modified(request, response, [page.items, page.next_cursor]) or _page_response(response, page)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
 async def get_session_by_id(
     session_id: UUID,
+    request: Request,
+    response: Response,
     service: SearchSessionService = Depends(get_search_session_service)
 ) -> Dict[str, Any]:
     try:
         session = await service.get_session_by_id(session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-        return session
+        return _not_modified(request, response, session) or session
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -86,23 +123,71 @@ async def create_session(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/sessions/{session_id}/history", response_model=SessionHistoryResponse)
+async def get_session_history(
+    session_id: UUID,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    session_service: SearchSessionService = Depends(get_search_session_service),
+    message_service: SearchMessageService = Depends(get_search_message_service)
+) -> Dict[str, Any]:
+    """The session with its oldest `limit` messages; the next page's cursor is in the X-Next-Cursor header."""
+    try:
+        # Independent queries, so they share one round trip of latency
+        session, page = await asyncio.gather(
+            session_service.get_session_by_id(session_id),
+            message_service.list_messages_by_session_id(session_id, limit, cursor)
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        not_modified = _not_modified(request, response, [session, page.items, page.next_cursor])
+        if not_modified:
+            return not_modified
+        return {"session": session, "messages": _page_response(response, page)}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Message routes
-@router.get("/messages/{session_id}", response_model=List[MessageResponse])
+@router.get("/messages/{session_id}", response_model=List[MessageResponse], response_model_exclude_unset=True)
 async def get_session_messages(
     session_id: UUID,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Literal["summary", "full"] = "full",
     service: SearchMessageService = Depends(get_search_message_service)
 ) -> List[Dict[str, Any]]:
+    """Oldest first; the next page's cursor is in the X-Next-Cursor header."""
     try:
-        return await service.get_messages_by_session_id(session_id)
+        page = await service.list_messages_by_session_id(session_id, limit, cursor, fields)
+        return _not_modified(request, response, [page.items, page.next_cursor]) or _page_response(response, page)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/messages", response_model=MessageResponse)
 async def create_message(
     message: MessageCreate,
-    service: SearchMessageService = Depends(get_search_message_service)
+    service: SearchMessageService = Depends(get_search_message_service),
+    write_buffer: Optional["MessageWriteBuffer"] = Depends(get_message_write_buffer)
 ) -> Dict[str, Any]:
     try:
+        if write_buffer is not None:
+            # Shares a multi-row insert with concurrent requests; still returns the stored row
+            return await write_buffer.submit(
+                session_id=message.session_id,
+                question=message.question,
+                answer=message.answer,
+                sources=message.sources
+            )
         return await service.create_message(
             session_id=message.session_id,
             question=message.question,
@@ -113,16 +198,34 @@ async def create_message(
         logging.warning("Not processable")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/messages/batch", response_model=List[MessageResponse])
+async def create_messages(
+    messages: List[MessageCreate],
+    service: SearchMessageService = Depends(get_search_message_service)
+) -> List[Dict[str, Any]]:
+    """Stores several messages in one insert; either all are stored or none are."""
+    try:
+        return await service.create_messages([
+            service.message_row(message.session_id, message.question, message.answer, message.sources)
+            for message in messages
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache")
+async def get_history_cache_stats(services: ServiceContainer = Depends(get_services)):
+    return services.history_cache.stats()
+
 @router.post("/generate-title", response_model=TitleResponse)
 async def generate_title(
     request: TitleRequest,
-    search_session_service: SearchSessionService = Depends(get_search_session_service)
+    search_session_service: SearchSessionService = Depends(get_search_session_service),
+    llm_service: "LLMService" = Depends(get_llm_service)
 ):
 
     try:
-        # Generate title
-        llm = llm_service.LLMService()
-        result = llm.generate_short_title(request.text)
+        # Generate title with the shared service; only the LLM call runs per request
+        result = await run_in_threadpool(llm_service.generate_short_title, request.text)
         
         print("Result: ")
         print(result)
@@ -1,17 +1,21 @@
 # app/api/routes/notes.py
 from pathlib import Path
-from fastapi import APIRouter, FastAPI, HTTPException, Query, File, UploadFile, Body
-from typing import List, Optional
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, File, UploadFile, Body
+from fastapi.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from pydantic import BaseModel
-from backend.services.document_service import DocumentService
-from backend.services.embedding_service import EmbeddingService
+from backend.services.container import get_document_service, get_embedding_service, get_job_manager
+from backend.services.ingestion_jobs import IngestionJob, IngestionJobManager
+from backend.utils.prefetch import prefetch
+
+if TYPE_CHECKING:
+    from backend.services.document_service import DocumentService
+    from backend.services.embedding_service import EmbeddingService
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/upload", tags=["ingestion"])
-embedding_service = EmbeddingService()
-document_service = DocumentService(embedding_service, 3)
 
 class FetchPapersResponse(BaseModel):
     papers_fetched: int
@@ -23,21 +27,50 @@ class ProcessingResponse(BaseModel):
     message: str
     documents_processed: Optional[int] = None
 
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    key: str
+    status: str
+    stage: str
+    progress: Dict[str, int]
+    errors: List[str]
+    result: Optional[Dict[str, Any]] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    coalesced: bool = False
+
+def _job_response(job: IngestionJob, created: bool = True) -> JobResponse:
+    return JobResponse(**job.to_dict(), coalesced=not created)
+
+def _list_local_papers(document_service: "DocumentService") -> List[dict]:
+    papers_dir = Path(document_service.papers_dir)
+    if not papers_dir.exists():
+        raise HTTPException(status_code=404, detail="Papers directory not found")
+
+    # Create paper info list from existing PDFs
+    papers = []
+    for pdf_file in papers_dir.glob("*.pdf"):
+        arxiv_id = pdf_file.stem  # Assuming filename is arxiv_id.pdf
+        papers.append({
+            'local_path': str(pdf_file),
+            'arxiv_id': arxiv_id
+        })
+    return papers
+
 @router.post("/papers/fetch")
 async def fetch_papers(
     keyword: str = Query(..., description="Search keyword for arXiv papers"),
-    max_results: Optional[int] = Query(10, description="Maximum number of papers to fetch")
+    max_results: Optional[int] = Query(10, description="Maximum number of papers to fetch"),
+    document_service: "DocumentService" = Depends(get_document_service)
 ):
    
     try:
-        # Override max_results temporarily
-        original_max = document_service.max_results
-        document_service.max_results = max_results
-        
-        papers = document_service.fetch_papers(keyword)
-        
-        # Restore original max_results
-        document_service.max_results = original_max
+        # Downloads block, so keep them off the event loop
+        papers = await run_in_threadpool(
+            document_service.fetch_papers, keyword, max_results=max_results
+        )
         
         return FetchPapersResponse(
             papers_fetched=len(papers),
@@ -48,106 +81,127 @@ async def fetch_papers(
         logger.error(f"Error fetching papers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/documents/process")
-async def process_documents():
+def _process_documents(document_service: "DocumentService", papers: List[dict], job: IngestionJob) -> dict:
+    # Process the documents; only the count is kept, not the parsed text
+    documents_processed = sum(1 for _ in document_service.iter_cleaned_documents(papers, progress=job))
+
+    if not documents_processed:
+        return ProcessingResponse(
+            status="error",
+            message="No documents were successfully processed"
+        ).model_dump()
+
+    return ProcessingResponse(
+        status="success",
+        message="Documents processed successfully",
+        documents_processed=documents_processed
+    ).model_dump()
+
+@router.post("/documents/process", status_code=202, response_model=JobResponse)
+async def process_documents(
+    document_service: "DocumentService" = Depends(get_document_service),
+    job_manager: IngestionJobManager = Depends(get_job_manager)
+):
 
     try:
-        # Get all PDFs in the papers directory
-        papers_dir = Path("backend/papers")
-        if not papers_dir.exists():
-            raise HTTPException(status_code=404, detail="Papers directory not found")
-        
-        # Create paper info list from existing PDFs
-        papers = []
-        for pdf_file in papers_dir.glob("*.pdf"):
-            arxiv_id = pdf_file.stem  # Assuming filename is arxiv_id.pdf
-            papers.append({
-                'local_path': str(pdf_file),
-                'arxiv_id': arxiv_id
-            })
-        
+        papers = _list_local_papers(document_service)
         if not papers:
-            return ProcessingResponse(
-                status="error",
-                message="No PDF documents found in papers directory"
-            )
-        
-        # Process the documents
-        cleaned_docs = document_service.load_and_clean_documents(papers)
-        
-        if not cleaned_docs:
-            return ProcessingResponse(
-                status="error",
-                message="No documents were successfully processed"
-            )
-            
-        return ProcessingResponse(
-            status="success",
-            message="Documents processed successfully",
-            documents_processed=len(cleaned_docs)
+            raise HTTPException(status_code=404, detail="No PDF documents found in papers directory")
+
+        job, created = job_manager.submit(
+            "process", "local", lambda job: _process_documents(document_service, papers, job)
         )
+        return _job_response(job, created)
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error processing documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/embeddings/create")
-async def create_embeddings():
-    try:
-        # Get the processed documents
-        papers_dir = Path("backend/papers")
-        if not papers_dir.exists():
-            raise HTTPException(status_code=404, detail="Papers directory not found")
-            
-        # Get paper info list
-        papers = []
-        for pdf_file in papers_dir.glob("*.pdf"):
-            arxiv_id = pdf_file.stem
-            papers.append({
-                'local_path': str(pdf_file),
-                'arxiv_id': arxiv_id
-            })
-            
-        if not papers:
-            return ProcessingResponse(
-                status="error",
-                message="No documents found to create embeddings"
-            )
-            
-        # Load and process documents
-        cleaned_docs = document_service.load_and_clean_documents(papers)
-        logging.info("Cleaned_docs list: " + str(len(cleaned_docs)))
-        logging.info(cleaned_docs)
-        if not cleaned_docs:
-            return ProcessingResponse(
-                status="error",
-                message="No documents were successfully processed for embedding"
-            )
-            
-        # Create embeddings
-        document_service.embedding_service.run_pipeline(cleaned_docs)
-        
+def _create_embeddings(document_service: "DocumentService", papers: List[dict], force: bool, job: IngestionJob) -> dict:
+    # Segments flow from the parser straight into the embedding batches
+    documents = prefetch(
+        document_service.iter_cleaned_documents(papers, skip_completed=not force, progress=job),
+        document_service.embedding_service.config.ingestion_buffer_documents
+    )
+    documents_processed = document_service.embedding_service.run_pipeline(
+        documents, skip_completed=not force, progress=job
+    )
+    logging.info(f"Embedded {documents_processed} documents")
+    if not documents_processed and not force and all(
+        document_service.embedding_service.is_ingested(paper['arxiv_id']) for paper in papers
+    ):
         return ProcessingResponse(
             status="success",
-            message="Embeddings created successfully",
-            documents_processed=len(cleaned_docs)
+            message="All documents already have embeddings",
+            documents_processed=0
+        ).model_dump()
+    if not documents_processed:
+        return ProcessingResponse(
+            status="error",
+            message="No documents were successfully processed for embedding"
+        ).model_dump()
+
+    return ProcessingResponse(
+        status="success",
+        message="Embeddings created successfully",
+        documents_processed=documents_processed
+    ).model_dump()
+
+@router.post("/embeddings/create", status_code=202, response_model=JobResponse)
+async def create_embeddings(
+    force: bool = Query(False, description="Re-embed papers the manifest already marks as ingested"),
+    document_service: "DocumentService" = Depends(get_document_service),
+    job_manager: IngestionJobManager = Depends(get_job_manager)
+):
+    try:
+        papers = _list_local_papers(document_service)
+        if not papers:
+            raise HTTPException(status_code=404, detail="No documents found to create embeddings")
+
+        job, created = job_manager.submit(
+            "embeddings", f"local:force={force}", lambda job: _create_embeddings(document_service, papers, force, job)
         )
+        return _job_response(job, created)
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error creating embeddings: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/documents/topic")
+@router.get("/embeddings/cache")
+async def get_embedding_cache_stats(embedding_service: "EmbeddingService" = Depends(get_embedding_service)):
+    if not hasattr(embedding_service.embedding_model, 'stats'):
+        return {"enabled": False}
+    return {"enabled": True, **embedding_service.embedding_model.stats()}
+
+@router.post("/documents/topic", status_code=202, response_model=JobResponse)
 async def query_archive(
-    keyword: str = Query(..., description="Search keyword for arXiv papers")
+    keyword: str = Query(..., description="Search keyword for arXiv papers"),
+    document_service: "DocumentService" = Depends(get_document_service),
+    job_manager: IngestionJobManager = Depends(get_job_manager)
 ):
     logging.info(f"Querying /document/topic for keyword: {keyword}")
-    result = document_service.process_and_embed_papers(keyword)
-    
-    if result["status"] == "error":
-        raise HTTPException(status_code=500, detail=result["message"])
-        
-    return result
+    # Requests for the same keyword share one job
+    job, created = job_manager.submit(
+        "topic",
+        " ".join(keyword.lower().split()),
+        lambda job: document_service.process_and_embed_papers(keyword, progress=job)
+    )
+    return _job_response(job, created)
+
+@router.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(job_manager: IngestionJobManager = Depends(get_job_manager)):
+    return [_job_response(job) for job in job_manager.list()]
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, job_manager: IngestionJobManager = Depends(get_job_manager)):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
 
 @router.post("/documents/upload")
 async def upload_health_document(
@@ -166,13 +220,3 @@ async def get_document_categories():
 @router.post("/document")
 async def upload_document(file: UploadFile = File(...)):
     pass
-
-@router.post("/documents/topic")
-async def query_archive(
-    keyword: str,
-):
-    logging.info(f"Querying /document/topic for keyword: {keyword}")
-    document_service.process_and_embed_papers(keyword)
-    
-    
-
@@ -1,9 +1,14 @@
 # app/api/routes/notes.py
-from fastapi import APIRouter, FastAPI, HTTPException, Query, File, UploadFile, Body
-from typing import Dict, List, Optional
+import json
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, File, UploadFile, Body
+from fastapi.responses import StreamingResponse
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
 from pydantic import BaseModel
 
-from backend.services.llm_service import LLMService
+from backend.services.container import get_llm_service
+
+if TYPE_CHECKING:
+    from backend.services.llm_service import LLMService
 
 
 class QueryGeneral(BaseModel):
@@ -19,15 +24,14 @@ class SearchResponse(BaseModel):
 
 router = APIRouter(prefix="/api/query", tags=["retrieval"])
 
-llm_service = LLMService()  # Add your vector_store if available
-
 
 @router.post("/general")
 async def search_health_information(
     input: QueryGeneral,
+    llm_service: "LLMService" = Depends(get_llm_service)
 ):
     
-    response =  llm_service.query(input.query)
+    response = await llm_service.aquery(input.query)
     return response
   
 
@@ -49,9 +53,31 @@ async def search_medical_information(
 
 
 
-# Initialize LLM service
-
 @router.post("/ask")
 async def ask_health_question(input: QueryGeneral,
+    llm_service: "LLMService" = Depends(get_llm_service)
 ):
-    return llm_service.query_with_research(input.query)
+    return await llm_service.aquery_with_research(input.query)
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _sse_stream(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for item in events:
+        yield _format_sse(item['event'], item['data'])
+
+@router.post("/ask/stream")
+async def ask_health_question_stream(input: QueryGeneral, llm_service: "LLMService" = Depends(get_llm_service)):
+    """Server-sent events: `sources`, then `token` chunks, then `done` with the full answer."""
+    return StreamingResponse(
+        _sse_stream(llm_service.astream_query_with_research(input.query)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache")
+async def get_answer_cache_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    if llm_service.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.answer_cache.stats()}
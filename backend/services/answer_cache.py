@@ -0,0 +1,148 @@
+import time
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Caches answering from each index, so ingestion can invalidate them without holding a reference
+_caches_by_index: Dict[str, "weakref.WeakSet[SemanticAnswerCache]"] = {}
+_registry_lock = threading.Lock()
+
+
+def invalidate_answer_caches(index_name: str) -> None:
+    """Drops every cached answer built on `index_name`; called once new documents are upserted."""
+    with _registry_lock:
+        caches = list(_caches_by_index.get(index_name, ()))
+    for cache in caches:
+        cache.invalidate()
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray
+    answer: Dict[str, Any]
+    latency: float
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """In-memory answer cache keyed on query embeddings.
+
+    A question whose embedding has cosine similarity of at least
+    `similarity_threshold` with a cached one gets that answer back. Entries
+    expire after `ttl_seconds`, and the least recently served ones are dropped
+    once there are more than `max_entries`. `invalidate` bumps `generation`;
+    an answer whose computation started in an older generation is not stored.
+    """
+
+    def __init__(
+        self,
+        index_name: str,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000
+    ):
+        self.index_name = index_name
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+        self.saved_seconds = 0.0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[int] = []
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+        with _registry_lock:
+            _caches_by_index.setdefault(index_name, weakref.WeakSet()).add(self)
+
+    def lookup(self, embedding: List[float]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Returns a copy of the closest cached answer and the time it took to produce, or None."""
+        query = self._normalize(embedding)
+        with self._lock:
+            self._expire()
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[key].embedding for key in self._keys])
+                scores = self._matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    key = self._keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    entry = self._entries[key]
+                    return dict(entry.answer), entry.latency
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: List[float],
+        answer: Dict[str, Any],
+        latency: float,
+        generation: Optional[int] = None
+    ) -> None:
+        """Caches `answer`, unless the cache was invalidated after `generation` was read."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                logger.debug("Not caching an answer built before the index changed")
+                return
+            self._entries[self._next_key] = _Entry(self._normalize(embedding), answer, latency, time.monotonic())
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def record_saving(self, seconds: float) -> None:
+        with self._lock:
+            self.saved_seconds += max(0.0, seconds)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            if self._entries:
+                logger.info(f"Invalidating {len(self._entries)} cached answers for index {self.index_name}")
+            self._entries.clear()
+            self._matrix = None
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'saved_seconds': round(self.saved_seconds, 3),
+                'invalidations': self.invalidations
+            }
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Entries are ordered by last use, not creation, so check them all
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
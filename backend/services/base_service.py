@@ -1,20 +1,80 @@
 from dataclasses import dataclass
-from pinecone.grpc import PineconeGRPC
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-
+from typing import TYPE_CHECKING, Optional
 
 from dotenv import load_dotenv
 import os
 
+# Clients and llama_index are imported where the services are built, so
+# importing the config (and the app) doesn't pay for them
+if TYPE_CHECKING:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.vector_stores.types import BasePydanticVectorStore
+    from backend.services.lexical_index import BM25Index
+
 @dataclass
 class ServiceConfig:
     openai_api_key: str
     pinecone_api_key: str
     index_name: str
+    # "pinecone" or "local"; the local index lives in local_index_dir and needs no network
+    vector_store: str = "pinecone"
+    local_index_dir: str = "backend/cache/vector_index"
+    # "exact" scores every vector; "ivf" only searches the closest partitions
+    local_index_mode: str = "exact"
+    ivf_lists: int = 0
+    ivf_probes: int = 8
+    ivf_min_vectors: int = 4096
+    # Share of replaced or deleted rows in the local index that triggers a compaction
+    local_index_compact_fraction: float = 0.25
+    papers_dir: str = "backend/papers"
+    parse_workers: int = 0
+    # "semantic", "token", "sentence_window" or "hybrid" (semantic only where the topic shifts);
+    # see backend.services.chunking
+    chunking_strategy: str = "semantic"
     buffer_size: int = 1
     breakpoint_percentile: float = 95
+    chunk_size: int = 512
+    chunk_overlap: int = 64
+    sentence_window_size: int = 8
+    sentence_window_overlap: int = 2
+    topic_shift_threshold: float = 0.05
     similarity_cutoff: float = 0.7
     top_k: int = 5
+    # "vector", "hybrid" (vector and BM25 fused by rank) or "lexical" (BM25 only, no embedding call)
+    retrieval_strategy: str = "vector"
+    # Built during ingestion; set to None to skip the BM25 index
+    lexical_index_path: Optional[str] = "backend/cache/lexical.sqlite3"
+    # "two_pass" synthesizes a research summary before answering; "single_pass"
+    # puts the retrieved excerpts straight into one generation call
+    answer_mode: str = "two_pass"
+    # Embedding batches run concurrently within the provider's quota
+    max_concurrent_batches: int = 4
+    embedding_requests_per_minute: int = 3000
+    embedding_tokens_per_minute: int = 1_000_000
+    max_batch_retries: int = 3
+    # Embedding requests are packed across documents up to these limits, this many at a time per batch
+    embedding_request_max_tokens: int = 50_000
+    embedding_request_max_inputs: int = 512
+    embedding_request_concurrency: int = 4
+    # Parsed segments queued ahead of embedding while a topic streams through ingestion
+    ingestion_buffer_documents: int = 200
+    # Document hashes from earlier runs, so re-ingestion only processes changed segments
+    docstore_path: Optional[str] = "backend/cache/docstore.json"
+    # Set to None to call the embedding API without the on-disk cache
+    embedding_cache_path: Optional[str] = "backend/cache/embeddings.sqlite3"
+    embedding_cache_max_bytes: int = 512 * 1024 * 1024
+    # Near-duplicate questions are answered from memory; set max entries to 0 to disable
+    answer_cache_similarity: float = 0.95
+    answer_cache_ttl_seconds: float = 3600
+    answer_cache_max_entries: int = 1000
+    # Session and message reads kept in memory; writes through the services invalidate them
+    history_cache_ttl_seconds: float = 300
+    history_cache_max_entries: int = 2000
+    # Write-behind: POST /messages requests are grouped into multi-row inserts
+    message_write_behind: bool = False
+    message_batch_max_size: int = 50
+    message_batch_max_delay: float = 0.05
+    message_batch_max_retries: int = 3
 
 class BaseService:
     
@@ -24,10 +84,53 @@ class BaseService:
         return ServiceConfig(
             openai_api_key=os.getenv('OPENAI_API_KEY', ''),
             pinecone_api_key=os.getenv('PINECONE_API_KEY', ''),
-            index_name="perplexity"
+            index_name="perplexity",
+            parse_workers=int(os.getenv('PARSE_WORKERS', '0')),
+            answer_mode=os.getenv('ANSWER_MODE', 'two_pass'),
+            chunking_strategy=os.getenv('CHUNKING_STRATEGY', 'semantic'),
+            vector_store=os.getenv('VECTOR_STORE', 'pinecone'),
+            local_index_mode=os.getenv('LOCAL_INDEX_MODE', 'exact'),
+            retrieval_strategy=os.getenv('RETRIEVAL_STRATEGY', 'vector'),
+            message_write_behind=os.getenv('MESSAGE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+        )
+
+    def _create_embedding_model(self) -> "BaseEmbedding":
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        from backend.services.embedding_cache import CachedEmbedding, get_embedding_cache_store
+
+        embedding_model = OpenAIEmbedding(api_key=self.config.openai_api_key)
+        if not self.config.embedding_cache_path:
+            return embedding_model
+        store = get_embedding_cache_store(
+            self.config.embedding_cache_path,
+            self.config.embedding_cache_max_bytes
         )
+        return CachedEmbedding(embedding_model, store)
+
+    def _create_lexical_index(self) -> Optional["BM25Index"]:
+        from backend.services.lexical_index import get_lexical_index
+
+        if not self.config.lexical_index_path:
+            return None
+        return get_lexical_index(self.config.lexical_index_path)
+
+    def _create_vector_store(self) -> "BasePydanticVectorStore":
+        if self.config.vector_store == "local":
+            from backend.services.local_vector_store import get_local_vector_store
+
+            return get_local_vector_store(
+                self.config.local_index_dir,
+                mode=self.config.local_index_mode,
+                ivf_lists=self.config.ivf_lists,
+                ivf_probes=self.config.ivf_probes,
+                ivf_min_vectors=self.config.ivf_min_vectors,
+                compact_dead_fraction=self.config.local_index_compact_fraction
+            )
+        if self.config.vector_store != "pinecone":
+            raise ValueError(f"Unknown vector store: {self.config.vector_store}")
+        from pinecone.grpc import PineconeGRPC
+        from backend.services.pinecone_store import ThreadedPineconeVectorStore
 
-    def _create_vector_store(self) -> PineconeVectorStore:
         pc = PineconeGRPC(api_key=self.config.pinecone_api_key)
         pinecone_index = pc.Index(self.config.index_name)
-        return PineconeVectorStore(pinecone_index=pinecone_index)
\ No newline at end of file
+        return ThreadedPineconeVectorStore(pinecone_index=pinecone_index)
\ No newline at end of file
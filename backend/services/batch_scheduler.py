@@ -0,0 +1,247 @@
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RATE_LIMIT_STATUS_CODES = {429}
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+REQUEST_TOO_LARGE_STATUS_CODES = {400, 413}
+# How providers word a request over the model's input limits (OpenAI: "maximum context length is 8192 tokens")
+REQUEST_TOO_LARGE_PATTERN = re.compile(
+    r"context length|context window|token limit|too many (tokens|inputs)|tokens per request|"
+    r"max(imum)? (of )?\d+ (tokens|inputs)|request too large",
+    re.IGNORECASE
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    `throttle` cuts the refill rate after the provider pushes back and
+    `recover` raises it again step by step, up to the configured rate.
+    """
+
+    def __init__(self, rate_per_minute: float, min_rate_fraction: float = 0.1):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = self.max_rate * min_rate_fraction
+        self.rate = self.max_rate
+        self.capacity = self.max_rate * 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Blocks until `amount` tokens are available and returns the time spent waiting."""
+        # A single oversized request must still go through eventually
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttle(self, factor: float = 0.5) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * factor)
+            self.tokens = 0.0
+
+    def recover(self, step_fraction: float = 0.05) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * step_fraction)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def _unwrap(exc: BaseException) -> List[BaseException]:
+    # tenacity.RetryError keeps the real error on its last attempt
+    chain = []
+    while exc is not None and exc not in chain:
+        chain.append(exc)
+        last_attempt = getattr(exc, 'last_attempt', None)
+        if last_attempt is not None and callable(getattr(last_attempt, 'exception', None)):
+            exc = last_attempt.exception()
+        else:
+            exc = exc.__cause__ or exc.__context__
+    return chain
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    return any(
+        _status_code(e) in RATE_LIMIT_STATUS_CODES or 'RateLimit' in type(e).__name__
+        for e in _unwrap(exc)
+    )
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    for e in _unwrap(exc):
+        if _status_code(e) in TRANSIENT_STATUS_CODES:
+            return True
+        if isinstance(e, (TimeoutError, ConnectionError)):
+            return True
+        if type(e).__name__ in ('APIConnectionError', 'APITimeoutError', 'InternalServerError'):
+            return True
+    return False
+
+
+def is_request_too_large_error(exc: BaseException) -> bool:
+    """Whether the provider rejected a request for holding too much input, so a smaller one can succeed."""
+    for e in _unwrap(exc):
+        status = _status_code(e)
+        if status is not None and status not in REQUEST_TOO_LARGE_STATUS_CODES:
+            continue
+        if status == 413 or REQUEST_TOO_LARGE_PATTERN.search(str(e)):
+            return True
+    return False
+
+
+@dataclass
+class SchedulerReport(Generic[T]):
+    succeeded: List[T] = field(default_factory=list)
+    failed: List[Tuple[T, BaseException]] = field(default_factory=list)
+    retries: int = 0
+    rate_limited: int = 0
+
+
+class RateLimitedBatchScheduler:
+    """Runs batches concurrently under request and token budgets.
+
+    Batches are pulled lazily from the input iterable, so at most
+    `max_concurrency` of them are held in memory besides those waiting to be
+    retried. A failed batch goes back on the queue with exponential backoff
+    until it has been tried `max_retries + 1` times. Rate-limit errors also
+    slow both buckets down for everyone, then the rate creeps back up with
+    each success.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 3000,
+        tokens_per_minute: float = 1_000_000,
+        max_retries: int = 3,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def run(
+        self,
+        batches: Iterable[T],
+        process: Callable[[T], Any],
+        cost: Callable[[T], Tuple[int, int]],
+        summarize: Optional[Callable[[T], Any]] = None
+    ) -> SchedulerReport:
+        """Processes every batch; the report lists them, or `summarize(batch)` when given.
+
+        Summarizing lets a long stream of batches run without the report
+        keeping every one of them alive.
+        """
+        summarize = summarize or (lambda batch: batch)
+        report: SchedulerReport = SchedulerReport()
+        source = iter(batches)
+        source_exhausted = False
+        sequence = itertools.count()
+        retry_heap: List[Tuple[float, int, int, T]] = []
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed-batch") as executor:
+            in_flight = {}
+            while True:
+                while len(in_flight) < self.max_concurrency:
+                    if retry_heap and retry_heap[0][0] <= time.monotonic():
+                        _, _, attempt, batch = heapq.heappop(retry_heap)
+                    elif not source_exhausted:
+                        try:
+                            batch, attempt = next(source), 0
+                        except StopIteration:
+                            source_exhausted = True
+                            continue
+                    else:
+                        break
+                    future = executor.submit(self._run_one, batch, process, cost)
+                    in_flight[future] = (batch, attempt)
+
+                if not in_flight:
+                    if not retry_heap:
+                        break
+                    time.sleep(max(0.0, retry_heap[0][0] - time.monotonic()))
+                    continue
+
+                timeout = None
+                if retry_heap:
+                    timeout = max(0.0, retry_heap[0][0] - time.monotonic())
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    batch, attempt = in_flight.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        report.succeeded.append(summarize(batch))
+                        self.request_bucket.recover()
+                        self.token_bucket.recover()
+                        continue
+
+                    if is_rate_limit_error(error):
+                        report.rate_limited += 1
+                        self.request_bucket.throttle()
+                        self.token_bucket.throttle()
+
+                    if attempt >= self.max_retries:
+                        logger.error(f"Batch failed after {attempt + 1} attempts: {str(error)}")
+                        report.failed.append((summarize(batch), error))
+                        continue
+
+                    delay = self._backoff(attempt, error)
+                    logger.warning(f"Batch failed (attempt {attempt + 1}), re-queued in {delay:.1f}s: {str(error)}")
+                    report.retries += 1
+                    heapq.heappush(retry_heap, (time.monotonic() + delay, next(sequence), attempt + 1, batch))
+
+        return report
+
+    def _run_one(self, batch: T, process: Callable[[T], Any], cost: Callable[[T], Tuple[int, int]]) -> Any:
+        requests, tokens = cost(batch)
+        waited = self.request_bucket.acquire(requests) + self.token_bucket.acquire(tokens)
+        if waited > 0.1:
+            logger.info(f"Waited {waited:.1f}s for rate limit budget ({requests} requests, {tokens} tokens)")
+        return process(batch)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        delay = self.base_backoff * (2 ** attempt)
+        if is_rate_limit_error(error):
+            delay *= 2
+        elif not is_transient_error(error):
+            # Likely to fail again the same way; don't hammer the provider with it
+            delay *= 4
+        return min(self.max_backoff, delay) * (0.5 + random.random())
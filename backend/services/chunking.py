@@ -0,0 +1,164 @@
+import math
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Callable, List, Sequence
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import (
+    NodeParser,
+    SemanticSplitterNodeParser,
+    SentenceSplitter,
+    TokenTextSplitter,
+)
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.node_parser.text.utils import split_by_sentence_tokenizer
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tqdm_iterable
+
+import logging
+
+if TYPE_CHECKING:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from backend.services.base_service import ServiceConfig
+
+logger = logging.getLogger(__name__)
+
+# "semantic" embeds every sentence to find split points; the others make no embedding calls of their own
+CHUNKING_STRATEGIES = ("semantic", "token", "sentence_window", "hybrid")
+
+_WORD = re.compile(r"[a-z]{4,}")
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[word] for word, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 1.0
+
+
+class SentenceWindowSplitter(NodeParser):
+    """Groups every `window_size` consecutive sentences into a node.
+
+    Consecutive windows share `window_overlap` sentences, so a passage that
+    straddles a boundary still appears whole in one of them.
+    """
+
+    window_size: int = Field(default=8, gt=0)
+    window_overlap: int = Field(default=2, ge=0)
+    sentence_splitter: Callable[[str], List[str]] = Field(
+        default_factory=split_by_sentence_tokenizer, exclude=True
+    )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SentenceWindowSplitter"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for node in get_tqdm_iterable(nodes, show_progress, "Splitting into sentence windows"):
+            sentences = self.sentence_splitter(node.get_content(metadata_mode=MetadataMode.NONE))
+            step = max(1, self.window_size - self.window_overlap)
+            windows = [
+                "".join(sentences[start:start + self.window_size])
+                for start in range(0, max(1, len(sentences) - self.window_overlap), step)
+            ]
+            all_nodes.extend(build_nodes_from_splits([w for w in windows if w.strip()], node, id_func=self.id_func))
+        return all_nodes
+
+
+class TopicShiftSplitter(NodeParser):
+    """Runs the semantic splitter only on documents that look like they change topic.
+
+    Adjacent groups of `probe_sentences` sentences are compared by word
+    overlap; a document whose groups ever drop below `shift_threshold`
+    cosine similarity goes to `semantic`, the rest to the cheap `fallback`.
+    """
+
+    shift_threshold: float = Field(default=0.05)
+    probe_sentences: int = Field(default=5, gt=0)
+    sentence_splitter: Callable[[str], List[str]] = Field(
+        default_factory=split_by_sentence_tokenizer, exclude=True
+    )
+    _semantic: NodeParser = PrivateAttr()
+    _fallback: NodeParser = PrivateAttr()
+
+    def __init__(self, semantic: NodeParser, fallback: NodeParser, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._semantic = semantic
+        self._fallback = fallback
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TopicShiftSplitter"
+
+    def has_topic_shift(self, text: str) -> bool:
+        sentences = self.sentence_splitter(text)
+        groups = [
+            Counter(_WORD.findall("".join(sentences[start:start + self.probe_sentences]).lower()))
+            for start in range(0, len(sentences), self.probe_sentences)
+        ]
+        return any(_cosine(a, b) < self.shift_threshold for a, b in zip(groups, groups[1:]))
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        shifted = 0
+        for node in get_tqdm_iterable(nodes, show_progress, "Splitting on topic shifts"):
+            # One document at a time keeps the output in document order
+            if self.has_topic_shift(node.get_content(metadata_mode=MetadataMode.NONE)):
+                shifted += 1
+                all_nodes.extend(self._semantic._parse_nodes([node], show_progress=False, **kwargs))
+            else:
+                all_nodes.extend(self._fallback._parse_nodes([node], show_progress=False, **kwargs))
+        logger.debug(f"Semantic splitting {shifted}/{len(nodes)} documents with a topic shift")
+        return all_nodes
+
+    def to_dict(self, **kwargs: Any) -> dict:
+        return {
+            **super().to_dict(**kwargs),
+            'semantic': self._semantic.to_dict(**kwargs),
+            'fallback': self._fallback.to_dict(**kwargs)
+        }
+
+
+def splitter_fingerprint(config: "ServiceConfig") -> str:
+    """Names the strategy and the parameters that shape its chunks, so changing either is detectable."""
+    strategy = config.chunking_strategy
+    semantic = f"buffer={config.buffer_size},percentile={config.breakpoint_percentile}"
+    chunks = f"size={config.chunk_size},overlap={config.chunk_overlap}"
+    if strategy == "semantic":
+        return f"semantic:{semantic}"
+    if strategy == "token":
+        return f"token:{chunks}"
+    if strategy == "sentence_window":
+        return f"sentence_window:size={config.sentence_window_size},overlap={config.sentence_window_overlap}"
+    if strategy == "hybrid":
+        return f"hybrid:{semantic},{chunks},shift={config.topic_shift_threshold}"
+    raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+
+def create_splitter(config: "ServiceConfig", embed_model: "BaseEmbedding") -> NodeParser:
+    """Builds the node parser for `config.chunking_strategy`."""
+    strategy = config.chunking_strategy
+    if strategy == "semantic":
+        return SemanticSplitterNodeParser(
+            buffer_size=config.buffer_size,
+            breakpoint_percentile_threshold=config.breakpoint_percentile,
+            embed_model=embed_model,
+        )
+    if strategy == "token":
+        return TokenTextSplitter(chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap)
+    if strategy == "sentence_window":
+        return SentenceWindowSplitter(
+            window_size=config.sentence_window_size,
+            window_overlap=config.sentence_window_overlap
+        )
+    if strategy == "hybrid":
+        return TopicShiftSplitter(
+            semantic=SemanticSplitterNodeParser(
+                buffer_size=config.buffer_size,
+                breakpoint_percentile_threshold=config.breakpoint_percentile,
+                embed_model=embed_model,
+            ),
+            fallback=SentenceSplitter(chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap),
+            shift_threshold=config.topic_shift_threshold
+        )
+    raise ValueError(f"Unknown chunking strategy: {strategy}")
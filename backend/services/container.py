@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional, TypeVar
+
+from fastapi import Request
+
+from backend.services.base_service import BaseService, ServiceConfig
+from backend.services.history_cache import HistoryCache
+from backend.services.ingestion_jobs import IngestionJobManager
+from backend.utils.supabase_client import close_async_supabase, get_async_supabase
+import logging
+
+# The service modules pull in llama_index, pinecone, OpenAI and arxiv; they are
+# imported when a service is first built, not when the app is imported
+if TYPE_CHECKING:
+    from backend.services.document_service import DocumentService
+    from backend.services.embedding_service import EmbeddingService
+    from backend.services.llm_service import LLMService
+    from backend.services.message_write_buffer import MessageWriteBuffer
+    from backend.services.search_message_service import SearchMessageService
+    from backend.services.search_session_service import SearchSessionService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ServiceContainer:
+    """Application-wide services, each built once and shared by every request.
+
+    Services are built on first use, so startup doesn't wait on them;
+    `warm_up` builds them in the background right after startup so the first
+    request normally finds them ready. The LLM and document services reuse the
+    embedding service's embedding model, vector store client and indexes.
+    """
+
+    def __init__(self, config: Optional[ServiceConfig] = None):
+        self.config = config or BaseService._load_default_config()
+        self._embedding_service: Optional[EmbeddingService] = None
+        self._llm_service: Optional[LLMService] = None
+        self._document_service: Optional[DocumentService] = None
+        self._job_manager: Optional[IngestionJobManager] = None
+        self._search_session_service: Optional[SearchSessionService] = None
+        self._search_message_service: Optional[SearchMessageService] = None
+        self._message_write_buffer: Optional[MessageWriteBuffer] = None
+        # Shared by both supabase services so a write through either invalidates the other's reads
+        self.history_cache = HistoryCache(
+            ttl_seconds=self.config.history_cache_ttl_seconds,
+            max_entries=self.config.history_cache_max_entries
+        )
+        # Seconds spent building each service, imports included
+        self.build_times: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, build: Callable[[], T]) -> T:
+        service = getattr(self, name)
+        if service is None:
+            with self._lock:
+                service = getattr(self, name)
+                if service is None:
+                    start = time.perf_counter()
+                    service = build()
+                    setattr(self, name, service)
+                    self.build_times[type(service).__name__] = time.perf_counter() - start
+                    logger.info(f"Built {type(service).__name__} in {time.perf_counter() - start:.2f}s")
+        return service
+
+    @property
+    def embedding_service(self) -> "EmbeddingService":
+        def build():
+            from backend.services.embedding_service import EmbeddingService
+            return EmbeddingService(self.config)
+        return self._get('_embedding_service', build)
+
+    @property
+    def llm_service(self) -> "LLMService":
+        def build():
+            from backend.services.llm_service import LLMService
+            return LLMService(self.embedding_service, self.config)
+        return self._get('_llm_service', build)
+
+    @property
+    def document_service(self) -> "DocumentService":
+        def build():
+            from backend.services.document_service import DocumentService
+            return DocumentService(self.embedding_service, 3)
+        return self._get('_document_service', build)
+
+    @property
+    def job_manager(self) -> IngestionJobManager:
+        return self._get('_job_manager', lambda: IngestionJobManager(max_workers=2))
+
+    async def search_session_service(self) -> "SearchSessionService":
+        if self._search_session_service is None:
+            from backend.services.search_session_service import SearchSessionService
+            self._search_session_service = SearchSessionService(await get_async_supabase(), self.history_cache)
+        return self._search_session_service
+
+    async def search_message_service(self) -> "SearchMessageService":
+        if self._search_message_service is None:
+            from backend.services.search_message_service import SearchMessageService
+            self._search_message_service = SearchMessageService(await get_async_supabase(), self.history_cache)
+        return self._search_message_service
+
+    async def message_write_buffer(self) -> Optional["MessageWriteBuffer"]:
+        """The shared write-behind buffer, or None when `message_write_behind` is off."""
+        if not self.config.message_write_behind:
+            return None
+        if self._message_write_buffer is None:
+            from backend.services.message_write_buffer import MessageWriteBuffer
+            self._message_write_buffer = MessageWriteBuffer(
+                await self.search_message_service(),
+                max_batch_size=self.config.message_batch_max_size,
+                max_delay=self.config.message_batch_max_delay,
+                max_retries=self.config.message_batch_max_retries
+            )
+        return self._message_write_buffer
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.to_thread(self._warm_up)
+        except Exception as e:
+            # Requests will build whatever is missing and surface the error themselves
+            logger.error(f"Service warm-up failed: {str(e)}")
+
+    def _warm_up(self) -> None:
+        start = time.perf_counter()
+        self.llm_service
+        self.document_service
+        # Opens the vector store connection so the first query doesn't pay for it
+        client = self.embedding_service.vector_store.client
+        if hasattr(client, 'describe_index_stats'):
+            client.describe_index_stats()
+        logger.info(f"Services warmed up in {time.perf_counter() - start:.2f}s")
+
+    def shutdown(self) -> None:
+        if self._job_manager is not None:
+            # Queued jobs are dropped; the running ones finish on their own threads
+            self._job_manager.shutdown(wait=False)
+        embedding_model = getattr(self._embedding_service, 'embedding_model', None)
+        if hasattr(embedding_model, 'flush'):
+            # The embedding cache notes access times in memory; write them so eviction still sees them
+            embedding_model.flush()
+
+    async def aclose(self) -> None:
+        self.shutdown()
+        # Queued messages are written before the client they go through is closed
+        if self._message_write_buffer is not None:
+            await self._message_write_buffer.aclose()
+        await close_async_supabase()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_embedding_service(request: Request) -> "EmbeddingService":
+    return get_services(request).embedding_service
+
+
+def get_llm_service(request: Request) -> "LLMService":
+    return get_services(request).llm_service
+
+
+def get_document_service(request: Request) -> "DocumentService":
+    return get_services(request).document_service
+
+
+def get_job_manager(request: Request) -> IngestionJobManager:
+    return get_services(request).job_manager
+
+
+async def get_search_session_service(request: Request) -> "SearchSessionService":
+    return await get_services(request).search_session_service()
+
+
+async def get_search_message_service(request: Request) -> "SearchMessageService":
+    return await get_services(request).search_message_service()
+
+
+async def get_message_write_buffer(request: Request) -> Optional["MessageWriteBuffer"]:
+    return await get_services(request).message_write_buffer()
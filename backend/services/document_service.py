@@ -1,50 +1,156 @@
+import time
+import itertools
+from collections import deque
 from pathlib import Path  
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from llama_index.core import Document
 from llama_index.readers.file import PDFReader
-import re
 import arxiv
 import os
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 from backend.services.embedding_service import EmbeddingService
+from backend.services.ingestion_jobs import NO_PROGRESS, Progress
+from backend.services.paper_downloader import PaperDownloader
+from backend.utils.metrics import record_error, record_stage, track_stage
+from backend.utils.prefetch import prefetch
+from backend.utils.text_normalizer import normalize_text
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class ParsedPaper:
+    segment_count: int
+    documents: List[Tuple[int, Document]] = field(default_factory=list)
+    empty_segments: List[int] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    # Measured where the parse ran, which may be a worker process; the caller records them
+    parse_seconds: float = 0.0
+    clean_seconds: float = 0.0
+    file_bytes: int = 0
+
+
+_worker_loader: Optional[PDFReader] = None
+
+
+def parse_and_clean_pdf(path: str, loader: Optional[PDFReader] = None) -> ParsedPaper:
+    """Loads one PDF and cleans every segment.
+
+    Runs either on the calling thread or inside a pool worker, so it only
+    collects problems and leaves logging to the caller.
+    """
+    global _worker_loader
+    if loader is None:
+        if _worker_loader is None:
+            _worker_loader = PDFReader()
+        loader = _worker_loader
+
+    start = time.perf_counter()
+    documents = loader.load_data(file=Path(path))
+    parsed = ParsedPaper(
+        segment_count=len(documents),
+        parse_seconds=time.perf_counter() - start,
+        file_bytes=os.path.getsize(path)
+    )
+    start = time.perf_counter()
+    for idx, doc in enumerate(documents):
+        try:
+            # Clean text
+            original_length = len(doc.text)
+            cleaned_text = DocumentService.clean_up_text(doc.text)
+            logger.debug(f"Document {idx}: Cleaned text length {original_length} -> {len(cleaned_text)}")
+
+            if not cleaned_text.strip():
+                parsed.empty_segments.append(idx)
+                continue
+
+            doc.text = cleaned_text
+            parsed.documents.append((idx, doc))
+        except Exception as e:
+            parsed.errors.append((idx, str(e)))
+    parsed.clean_seconds = time.perf_counter() - start
+    return parsed
+
+
+def _parse_in_worker(path: str) -> ParsedPaper:
+    try:
+        return parse_and_clean_pdf(path)
+    except Exception as e:
+        # Reader errors can hold locks and other unpicklable state
+        raise RuntimeError(str(e)) from None
+
+
 class DocumentService:
     
     
-    def __init__(self, embedding_service: EmbeddingService, max_results: int = 50):
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_results: int = 50,
+        max_concurrent_downloads: int = 4,
+        download_timeout: float = 60.0,
+        download_retries: int = 3,
+        papers_dir: Optional[str] = None,
+        parse_workers: Optional[int] = None
+    ):
         logger.info("Initializing DocumentService")
         self.loader = PDFReader()
         self.arxiv = arxiv.Client()
         self.max_results = max_results
         self.embedding_service = embedding_service
+        self.papers_dir = papers_dir or embedding_service.config.papers_dir
+        self.manifest = embedding_service.manifest
+        # 0 or 1 parses on the calling thread; more fans out across a process pool
+        self.parse_workers = embedding_service.config.parse_workers if parse_workers is None else parse_workers
+        self.downloader = PaperDownloader(
+            max_concurrency=max_concurrent_downloads,
+            timeout=download_timeout,
+            max_retries=download_retries
+        )
 
         
-    def process_and_embed_papers(self, query: str) -> dict:
+    def process_and_embed_papers(self, query: str, progress: Progress = NO_PROGRESS) -> dict:
+        """Streams a topic's papers through download, parsing and embedding.
+
+        Each stage pulls from the one before it, so embedding starts with the
+        first parsed paper and only a bounded number of segments are held in
+        memory at any time.
+        """
         logger.info(f"Processing papers for query: {query}")
 
         try:
-            # Fetch papers
-            logger.info(f"Processing papers for query: {query}")
+            papers = []
+
+            def fetched_papers() -> Iterator[dict]:
+                for paper in self.iter_papers(query, progress=progress):
+                    papers.append({'arxiv_id': paper['arxiv_id'], 'downloaded': 'local_path' in paper})
+                    yield paper
+
+            # Parsing runs ahead on its own thread while earlier segments are being embedded
+            documents = prefetch(
+                self.iter_cleaned_documents(fetched_papers(), progress=progress),
+                self.embedding_service.config.ingestion_buffer_documents
+            )
+            documents_processed = self.embedding_service.run_pipeline(documents, progress=progress)
 
-            papers = self.fetch_papers(query)
             if not papers:
                 return {"status": "error", "message": "No papers found"}
 
-            # Load and clean documents
-            cleaned_docs = self.load_and_clean_documents(papers)
-            
-            if not cleaned_docs:
+            downloaded = [paper for paper in papers if paper['downloaded']]
+            if not documents_processed and downloaded and all(
+                self.embedding_service.is_ingested(paper['arxiv_id']) for paper in downloaded
+            ):
+                logger.info(f"All papers for query {query} are already ingested")
+            elif not documents_processed:
                 return {"status": "error", "message": "No documents processed successfully"}
 
-        
-            # Create embeddings and store in vector store
-            self.embedding_service.run_pipeline(cleaned_docs)
-
             return {
                 "status": "success",
                 "papers_fetched": len(papers),
-                "documents_processed": len(cleaned_docs),
+                "documents_processed": documents_processed,
                 "query": query
             }
 
@@ -56,142 +162,230 @@ class DocumentService:
                 "message": str(e)
             }
 
-    def fetch_papers(self, query: str, sort_by: arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate) -> List[dict]:
+    def fetch_papers(
+        self,
+        query: str,
+        sort_by: arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate,
+        max_results: Optional[int] = None,
+        progress: Progress = NO_PROGRESS
+    ) -> List[dict]:
         logging.info(f"Fetching papers for this query {query}")
 
+        papers = self._search_papers(query, sort_by, max_results, progress)
+
+        # Downloads run concurrently; the returned list keeps arXiv's result order
+        for _ in self._download_missing(papers, progress):
+            pass
+
+        return papers
+
+    def iter_papers(
+        self,
+        query: str,
+        sort_by: arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate,
+        max_results: Optional[int] = None,
+        progress: Progress = NO_PROGRESS
+    ) -> Iterator[dict]:
+        """Like `fetch_papers`, but yields each paper as soon as its download finishes."""
+        papers = self._search_papers(query, sort_by, max_results, progress)
+        return self._download_missing(papers, progress)
+
+    def _download_missing(self, papers: Iterable[dict], progress: Progress = NO_PROGRESS) -> Iterator[dict]:
+        progress.set_stage("downloading")
+        pending = []
+        for paper in papers:
+            cached_path = self.manifest.cached_path(paper['arxiv_id'])
+            if cached_path:
+                logger.info(f"Using cached PDF for {paper['arxiv_id']}")
+                paper['local_path'] = cached_path
+                progress.increment('papers_downloaded')
+                yield paper
+            else:
+                pending.append(paper)
+
+        for paper in self.downloader.download_all(pending, self.papers_dir):
+            if 'local_path' in paper:
+                self.manifest.record_download(paper['arxiv_id'], paper['local_path'])
+                progress.increment('papers_downloaded')
+            else:
+                progress.add_error(f"Failed to download {paper['arxiv_id']}")
+            yield paper
+
+    def _search_papers(
+        self,
+        query: str,
+        sort_by: arxiv.SortCriterion,
+        max_results: Optional[int] = None,
+        progress: Progress = NO_PROGRESS
+    ) -> List[dict]:
+        progress.set_stage("searching")
         # Create search object with parameters
         search = arxiv.Search(
             query=query,
-            max_results=self.max_results,
+            max_results=max_results or self.max_results,
             sort_by=sort_by,
             sort_order=arxiv.SortOrder.Descending
         )
 
-        papers_dir = "backend/papers"
-        os.makedirs(papers_dir, exist_ok=True)
-            # Get results
         papers = []
         logging.info("Iterating through arxiv results")
-        for result in self.arxiv.results(search):
-            paper_info = {
-                'title': result.title,
-                'published': result.published,
-                'authors': [author.name for author in result.authors],
-                'arxiv_id': result.get_short_id(),
-                'pdf_url': result.pdf_url,
-                'abstract': result.summary
-            }
-            logging.debug(paper_info)
-            papers.append(paper_info)
-            
-            
-            # Download PDF
-            filename = os.path.join(papers_dir, f"{paper_info['arxiv_id']}.pdf")
-            try:
-                result.download_pdf(filename=filename)
-                paper_info['local_path'] = filename
-            except Exception as e:
-                print(f"Failed to download {paper_info['arxiv_id']}: {str(e)}")
-                continue
-                      
+        with track_stage('arxiv_search') as stage:
+            for result in self.arxiv.results(search):
+                paper_info = {
+                    'title': result.title,
+                    'published': result.published,
+                    'authors': [author.name for author in result.authors],
+                    'arxiv_id': result.get_short_id(),
+                    'pdf_url': result.pdf_url,
+                    'abstract': result.summary
+                }
+                logging.debug(paper_info)
+                papers.append(paper_info)
+            stage.items = len(papers)
+
+        progress.increment('papers_found', len(papers))
         return papers
     
-    def load_and_clean_documents(self, papers: List[dict]) -> List:
-        all_documents = []
-        
+    def load_and_clean_documents(
+        self,
+        papers: Iterable[dict],
+        skip_completed: bool = True,
+        workers: Optional[int] = None,
+        progress: Progress = NO_PROGRESS
+    ) -> List:
+        all_documents = list(self.iter_cleaned_documents(papers, skip_completed, workers, progress))
+        logger.info(f"Total documents processed: {len(all_documents)}")
+        return all_documents
+
+    def iter_cleaned_documents(
+        self,
+        papers: Iterable[dict],
+        skip_completed: bool = True,
+        workers: Optional[int] = None,
+        progress: Progress = NO_PROGRESS
+    ) -> Iterator[Document]:
+        """Yields each paper's cleaned segments as soon as that paper is parsed.
+
+        `papers` may be a generator, such as `iter_papers`; it is only read
+        as far as parsing has room for, so later papers can still be
+        downloading while the first ones are embedded.
+        """
+        workers = self.parse_workers if workers is None else workers
+        progress.set_stage("parsing")
+
+        pending = self._pending_papers(papers, skip_completed)
+        # A pool only pays off with more than one paper to parse
+        head = list(itertools.islice(pending, 2))
+        pending = itertools.chain(head, pending)
+        if workers > 1 and len(head) > 1:
+            results = self._parse_in_pool(pending, workers)
+        else:
+            results = self._parse_in_thread(pending)
+
+        # Results arrive in input order, so segment order and metadata stay stable
+        for paper, parsed, error in results:
+            paper_path = Path(paper['local_path'])
+            if error is not None:
+                record_error('pdf_parse')
+                logger.error(f"Failed to process {paper.get('arxiv_id', 'unknown')}: {error}")
+                progress.add_error(f"Failed to process {paper.get('arxiv_id', 'unknown')}: {error}")
+                continue
+
+            record_stage('pdf_parse', parsed.parse_seconds, items=parsed.segment_count, bytes=parsed.file_bytes)
+            record_stage('clean', parsed.clean_seconds, items=len(parsed.documents))
+            for _ in parsed.errors:
+                record_error('clean')
+            cleaned_docs = self._apply_paper_metadata(paper, paper_path, parsed)
+            logger.info(f"Successfully cleaned {len(cleaned_docs)} segments from {paper_path}")
+            self.manifest.mark([paper.get('arxiv_id', '')], 'parsed')
+            progress.increment('papers_parsed')
+            progress.increment('documents_parsed', len(cleaned_docs))
+            yield from cleaned_docs
+
+    def _pending_papers(self, papers: Iterable[dict], skip_completed: bool) -> Iterator[dict]:
         for paper in papers:
             if 'local_path' not in paper:
                 logger.warning(f"Skipping paper without local_path: {paper.get('arxiv_id', 'unknown')}")
                 continue
-                
+
+            if skip_completed and self.embedding_service.is_ingested(paper.get('arxiv_id', '')):
+                logger.info(f"Skipping already ingested paper: {paper['arxiv_id']}")
+                continue
+
+            paper_path = Path(paper['local_path'])
+            if not paper_path.exists():
+                logger.warning(f"File not found: {paper_path}")
+                continue
+
+            yield paper
+
+    def _parse_in_thread(self, papers: Iterable[dict]) -> Iterator[Tuple[dict, Optional[ParsedPaper], Optional[str]]]:
+        for paper in papers:
+            logger.info(f"Loading PDF: {paper['local_path']}")
             try:
-                paper_path = Path(paper['local_path'])
-                
-                if not paper_path.exists():
-                    logger.warning(f"File not found: {paper_path}")
-                    continue
-                    
-                # Load PDF
-                logger.info(f"Loading PDF: {paper_path}")
-                documents = self.loader.load_data(file=paper_path)
-                logger.info(f"Loaded {len(documents)} document segments from {paper_path}")
-                
-                cleaned_docs = []
-                for idx, doc in enumerate(documents):
-                    try:
-                        # Clean text
-                        original_length = len(doc.text)
-                        cleaned_text = self.clean_up_text(doc.text)
-                        cleaned_length = len(cleaned_text)
-                        
-                        logger.debug(f"Document {idx}: Cleaned text length {original_length} -> {cleaned_length}")
-                        
-                        if not cleaned_text.strip():
-                            logger.warning(f"Skipping empty document after cleaning: {paper_path} segment {idx}")
-                            continue
-                            
-                        doc.text = cleaned_text
-                        
-                        # Add metadata
-                        doc.metadata.update({
-                            'title': paper.get('title', ''),
-                            'authors': paper.get('authors', []),
-                            'published_date': paper.get('published', ''),
-                            'arxiv_id': paper.get('arxiv_id', ''),
-                            'abstract': paper.get('abstract', ''),
-                            'segment_id': idx
-                        })
-                        
-                        cleaned_docs.append(doc)
-                        
-                    except Exception as e:
-                        logger.error(f"Error cleaning document segment {idx} from {paper_path}: {str(e)}")
-                        continue
-                        
-                logger.info(f"Successfully cleaned {len(cleaned_docs)} segments from {paper_path}")
-                all_documents.extend(cleaned_docs)
-                
+                yield paper, parse_and_clean_pdf(paper['local_path'], self.loader), None
             except Exception as e:
-                logger.error(f"Failed to process {paper.get('arxiv_id', 'unknown')}: {str(e)}")
-                continue
-                    
-        logger.info(f"Total documents processed: {len(all_documents)}")
-        return all_documents
+                yield paper, None, str(e)
+
+    def _parse_in_pool(self, papers: Iterable[dict], workers: int) -> Iterator[Tuple[dict, Optional[ParsedPaper], Optional[str]]]:
+        logger.info(f"Parsing PDFs with {workers} worker processes")
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Only a couple of papers per worker are submitted ahead, so parsed results don't pile up
+        window = deque()
+        try:
+            for paper in papers:
+                logger.info(f"Loading PDF: {paper['local_path']}")
+                window.append((paper, executor.submit(_parse_in_worker, paper['local_path'])))
+                if len(window) >= 2 * workers:
+                    yield self._parse_result(*window.popleft())
+            while window:
+                yield self._parse_result(*window.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _parse_result(paper: dict, future: Future) -> Tuple[dict, Optional[ParsedPaper], Optional[str]]:
+        try:
+            return paper, future.result(), None
+        except Exception as e:
+            return paper, None, str(e)
+
+    @staticmethod
+    def _apply_paper_metadata(paper: dict, paper_path: Path, parsed: ParsedPaper) -> List[Document]:
+        logger.info(f"Loaded {parsed.segment_count} document segments from {paper_path}")
+
+        for idx, error in parsed.errors:
+            logger.error(f"Error cleaning document segment {idx} from {paper_path}: {error}")
+        for idx in parsed.empty_segments:
+            logger.warning(f"Skipping empty document after cleaning: {paper_path} segment {idx}")
+
+        published = paper.get('published', '')
+        if isinstance(published, (datetime, date)):
+            # Metadata has to be JSON for the docstore and the vector store
+            published = published.isoformat()
+
+        cleaned_docs = []
+        for idx, doc in parsed.documents:
+            # Stable across runs, so the pipeline's docstore can tell unchanged segments apart
+            doc.id_ = f"arxiv:{paper.get('arxiv_id', '')}#{idx}"
+            # Add metadata
+            doc.metadata.update({
+                'title': paper.get('title', ''),
+                'authors': paper.get('authors', []),
+                'published_date': published,
+                'arxiv_id': paper.get('arxiv_id', ''),
+                'abstract': paper.get('abstract', ''),
+                'segment_id': idx
+            })
+            cleaned_docs.append(doc)
+        return cleaned_docs
         
     @staticmethod
     def clean_up_text(content: str) -> str:
 
         try:
-            # Handle surrogate pairs by encoding and decoding with error handling
-            content = content.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
-            
-            # Fix hyphenated words broken by newline
-            content = re.sub(r'(\w+)-\n(\w+)', r'\1\2', content)
-
-            # Remove specific unwanted patterns and characters
-            unwanted_patterns = [
-                r"\\n",                    # Escaped newlines
-                r"\s*—\s*",               # Em dashes with optional spaces
-                r"—{3,}",                 # Multiple em dashes
-                r"\\u[\dA-Fa-f]{4}",      # Unicode escapes
-                r"[\uf075\uf0b7]",        # Specific Unicode characters
-                r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]",  # Control characters
-                r"[^\x00-\x7F]+",         # Non-ASCII characters
-            ]
-            
-            for pattern in unwanted_patterns:
-                content = re.sub(pattern, " ", content)
-
-            # Fix spacing issues
-            content = re.sub(r'(\w)\s*-\s*(\w)', r'\1-\2', content)  # Fix hyphenation
-            content = re.sub(r'\s+', ' ', content)  # Normalize whitespace
-            
-            # Final cleanup of any remaining problematic characters
-            content = ''.join(char for char in content if ord(char) < 0x10000)
-            
-            return content.strip()
+            return normalize_text(content)
         except Exception as e:
             logger.error(f"Error in clean_up_text: {str(e)}")
             # Return a safe version of the text if cleaning fails
             return ''.join(char for char in content if ord(char) < 128).strip()
-        
\ No newline at end of file
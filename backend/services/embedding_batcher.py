@@ -0,0 +1,111 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+
+from backend.services.batch_scheduler import is_request_too_large_error
+from backend.utils.metrics import record_error, record_stage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The encoding is downloaded on first use; offline, an estimate will do
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def pack_requests(token_counts: Sequence[int], max_tokens: int, max_inputs: int) -> List[List[int]]:
+    """Groups input indices, in order, into requests of at most `max_tokens` tokens and `max_inputs` inputs.
+
+    An input larger than `max_tokens` gets a request to itself.
+    """
+    requests: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_inputs):
+            requests.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        requests.append(current)
+    return requests
+
+
+class TokenPackedEmbedding(TransformComponent):
+    """Embeds nodes in requests packed up to a token budget instead of a fixed node count.
+
+    All the nodes of a pipeline batch, from every document in it, share the
+    requests, which run `max_concurrency` at a time. A request the provider
+    rejects as too large (over the context length or a token limit) is split
+    in half and retried, so one oversized input doesn't sink its neighbours.
+    Every other error, rate limits and transient errors included, is raised
+    for the batch scheduler to back off and retry or give up on.
+    """
+
+    max_tokens: int = Field(default=50_000, gt=0)
+    max_inputs: int = Field(default=512, gt=0)
+    max_concurrency: int = Field(default=4, gt=0)
+    _embed_model: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._embed_model = embed_model
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenPackedEmbedding"
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        pending = [node for node in nodes if node.embedding is None]
+        if not pending:
+            return nodes
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in pending]
+        requests = pack_requests([count_tokens(text) for text in texts], self.max_tokens, self.max_inputs)
+        logger.debug(f"Embedding {len(texts)} nodes in {len(requests)} packed requests")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(requests)), thread_name_prefix="embed-request") as executor:
+            results = executor.map(lambda indices: self._embed([texts[i] for i in indices]), requests)
+            for indices, embeddings in zip(requests, results):
+                for index, embedding in zip(indices, embeddings):
+                    pending[index].embedding = embedding
+        return nodes
+
+    def _embed(self, texts: List[str]) -> List[Embedding]:
+        start = time.perf_counter()
+        try:
+            embeddings = self._embed_model._get_text_embeddings(texts)
+        except Exception as e:
+            record_error('embed_request')
+            # Smaller requests won't fix bad credentials or a missing model
+            if len(texts) == 1 or not is_request_too_large_error(e):
+                raise
+            logger.warning(f"Embedding request of {len(texts)} inputs was too large, retrying in halves: {str(e)}")
+            half = len(texts) // 2
+            return self._embed(texts[:half]) + self._embed(texts[half:])
+        record_stage('embed_request', time.perf_counter() - start, items=len(texts))
+        return embeddings
+
+    def to_dict(self, **kwargs: Any) -> Dict[str, Any]:
+        return {**super().to_dict(**kwargs), 'embed_model': self._embed_model.to_dict(**kwargs)}
@@ -0,0 +1,238 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheStore:
+    """SQLite-backed embedding store with least-recently-used eviction.
+
+    Vectors are stored as raw float64 so cached results are bit-for-bit the
+    ones the provider returned. Once the stored vectors exceed `max_bytes`,
+    the least recently read entries are dropped down to `low_watermark`.
+
+    Reads don't write: hits only note their access time in memory, and the
+    noted times are written with the next `put_many`, before an eviction,
+    or once `access_flush_interval` seconds have passed, so a lookup that
+    hits is a single SELECT. Recency is therefore only as fine as the flush
+    interval, which is plenty for choosing what to evict.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        low_watermark: float = 0.9,
+        access_flush_interval: float = 30.0
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self.access_flush_interval = access_flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._accessed_flushed_at = time.time()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Embedding]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array('d')
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            now = time.time()
+            for key in found:
+                self._accessed[key] = now
+            if now - self._accessed_flushed_at >= self.access_flush_interval:
+                self._write_access_times()
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, Embedding]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array('d', vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._write_access_times()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._total_bytes += sum(len(blob) for _, blob, _ in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def flush(self) -> None:
+        """Writes the access times noted since the last flush."""
+        with self._lock:
+            self._write_access_times()
+            self._conn.commit()
+
+    def _write_access_times(self) -> None:
+        # Rows evicted or replaced in the meantime are simply not matched
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+        self._accessed_flushed_at = time.time()
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * self.low_watermark)
+        # Re-read the size: other processes may share the file
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        victims = []
+        cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access")
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._conn.commit()
+        evicted = len(victims)
+        logger.info(f"Evicted {evicted} cached embeddings, cache is now {self._total_bytes} bytes")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes
+        }
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache_store(path: str, max_bytes: int) -> EmbeddingCacheStore:
+    """One store per file, so every service in the process shares its counters."""
+    return EmbeddingCacheStore(path, max_bytes)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wraps an embedding model and serves repeated texts from an EmbeddingCacheStore.
+
+    Keys are the model name, whether the text is a query or a document, and
+    a hash of the text as the OpenAI client sends it (newlines become spaces).
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingCacheStore = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, store: EmbeddingCacheStore, **kwargs: Any):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        self._store = store
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        return self._embed_model
+
+    def stats(self) -> Dict[str, Any]:
+        return self._store.stats()
+
+    def flush(self) -> None:
+        self._store.flush()
+
+    def _key(self, kind: str, text: str) -> str:
+        normalized = text.replace("\n", " ")
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, kind: str, texts: List[str]) -> tuple:
+        keys = [self._key(kind, text) for text in texts]
+        cached = self._store.get_many(list(dict.fromkeys(keys)))
+        # Each distinct missing text is only sent once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        return keys, cached, missing
+
+    def _embed_texts(self, kind: str, texts: List[str], embed) -> List[Embedding]:
+        keys, cached, missing = self._lookup(kind, texts)
+        if missing:
+            fresh = dict(zip(missing, embed(list(missing.values()))))
+            self._store.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    async def _aembed_texts(self, kind: str, texts: List[str], aembed) -> List[Embedding]:
+        keys, cached, missing = self._lookup(kind, texts)
+        if missing:
+            fresh = dict(zip(missing, await aembed(list(missing.values()))))
+            self._store.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._embed_texts(
+            "query", [query], lambda texts: [self._embed_model._get_query_embedding(texts[0])]
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        async def aembed(texts):
+            return [await self._embed_model._aget_query_embedding(texts[0])]
+        return (await self._aembed_texts("query", [query], aembed))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._embed_texts("text", texts, self._embed_model._get_text_embeddings)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._aembed_texts("text", texts, self._embed_model._aget_text_embeddings)
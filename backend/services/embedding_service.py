@@ -1,68 +1,280 @@
-import time
-from typing import List, Optional
+import os
+import math
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 from llama_index.core import Document
 
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core.node_parser import SemanticSplitterNodeParser
-from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.ingestion import DocstoreStrategy, IngestionPipeline
+from llama_index.core.schema import BaseNode, MetadataMode, RelatedNodeInfo, TransformComponent
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.bridge.pydantic import PrivateAttr
 
 
 
+from backend.services.answer_cache import invalidate_answer_caches
 from backend.services.base_service import BaseService, ServiceConfig
+from backend.services.batch_scheduler import RateLimitedBatchScheduler
+from backend.services.chunking import create_splitter, splitter_fingerprint
+from backend.services.embedding_batcher import TokenPackedEmbedding
+from backend.services.ingestion_jobs import NO_PROGRESS, Progress
+from backend.services.paper_manifest import PaperManifest
+from backend.utils.metrics import track_stage
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class DeterministicNodeIds(TransformComponent):
+    """Replaces the splitter's random node ids with ones derived from the source document and content.
+
+    Re-ingesting an unchanged segment then upserts onto the same vectors
+    instead of adding duplicates. Links between sibling nodes are rewritten
+    to the new ids.
+    """
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        new_ids: Dict[str, str] = {}
+        seen: Dict[str, int] = {}
+        for node in nodes:
+            digest = hashlib.sha256(
+                node.get_content(metadata_mode=MetadataMode.NONE).encode("utf-8")
+            ).hexdigest()[:16]
+            base = f"{node.ref_doc_id or 'node'}:{digest}"
+            # Identical passages in one document still need distinct ids
+            seen[base] = seen.get(base, 0) + 1
+            new_ids[node.id_] = base if seen[base] == 1 else f"{base}:{seen[base]}"
+
+        for node in nodes:
+            node.id_ = new_ids[node.id_]
+            for relationship, related in list(node.relationships.items()):
+                if isinstance(related, RelatedNodeInfo) and related.node_id in new_ids:
+                    related.node_id = new_ids[related.node_id]
+        return nodes
+
+
+class TimedTransform(TransformComponent):
+    """Runs a pipeline transformation and records its latency and output size as `stage`."""
+
+    stage: str
+    _transform: TransformComponent = PrivateAttr()
+
+    def __init__(self, stage: str, transform: TransformComponent):
+        super().__init__(stage=stage)
+        # Held privately so pydantic doesn't copy it; the splitter and embed step share one model
+        self._transform = transform
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        with track_stage(self.stage) as stage:
+            nodes = self._transform(nodes, **kwargs)
+            stage.items = len(nodes)
+        return nodes
+
+    def to_dict(self, **kwargs: Any) -> Dict[str, Any]:
+        # The pipeline's cache keys on this, so it has to change when the wrapped transformation does
+        return {**self._transform.to_dict(**kwargs), 'stage': self.stage}
+
+
+@dataclass
+class _SeenDocuments:
+    documents: int = 0
+    batches: int = 0
+    papers: Set[Optional[str]] = field(default_factory=set)
+
+
 class EmbeddingService(BaseService):
     
     def __init__(self, config: Optional[ServiceConfig] = None):
         self.config = config or self._load_default_config()
+        self.manifest = PaperManifest(self.config.papers_dir)
+        # Recorded with every ingested paper and document, so switching strategies re-chunks them
+        self.chunking = splitter_fingerprint(self.config)
         self._initialize_components()
         self.batch_size = 50  # Smaller batch size for safety
+        self.scheduler = RateLimitedBatchScheduler(
+            max_concurrency=self.config.max_concurrent_batches,
+            requests_per_minute=self.config.embedding_requests_per_minute,
+            tokens_per_minute=self.config.embedding_tokens_per_minute,
+            max_retries=self.config.max_batch_retries
+        )
 
     
     def _initialize_components(self) -> None:
-        self.embedding_model = OpenAIEmbedding(api_key=self.config.openai_api_key)
+        # Shared by the semantic splitter and the embedding step, so both hit the same cache
+        self.embedding_model = self._create_embedding_model()
         self.vector_store = self._create_vector_store()
+        self.lexical_index = self._create_lexical_index()
+        self.docstore = self._load_docstore()
+        self._docstore_lock = threading.Lock()
         self.pipeline = self._create_ingestion_pipeline()
+
+    def _load_docstore(self) -> Optional[SimpleDocumentStore]:
+        path = self.config.docstore_path
+        if not path:
+            return None
+        if os.path.exists(path):
+            return SimpleDocumentStore.from_persist_path(path)
+        return SimpleDocumentStore()
+
+    def _persist_docstore(self) -> None:
+        if self.docstore is None:
+            return
+        with self._docstore_lock:
+            os.makedirs(os.path.dirname(self.config.docstore_path) or ".", exist_ok=True)
+            self.docstore.persist(self.config.docstore_path)
     
     def _create_ingestion_pipeline(self) -> IngestionPipeline:
+        # With a docstore, unchanged segments are skipped and changed ones replace their old vectors
         return IngestionPipeline(
             transformations=[
-                SemanticSplitterNodeParser(
-                    buffer_size=self.config.buffer_size,
-                    breakpoint_percentile_threshold=self.config.breakpoint_percentile,
-                    embed_model=self.embedding_model,
+                TimedTransform(
+                    f"{self.config.chunking_strategy}_split",
+                    create_splitter(self.config, self.embedding_model)
                 ),
-                self.embedding_model,
+                DeterministicNodeIds(),
+                TimedTransform('embed', TokenPackedEmbedding(
+                    self.embedding_model,
+                    max_tokens=self.config.embedding_request_max_tokens,
+                    max_inputs=self.config.embedding_request_max_inputs,
+                    max_concurrency=self.config.embedding_request_concurrency
+                )),
             ],
-            vector_store=self.vector_store
+            vector_store=self.vector_store,
+            docstore=self.docstore,
+            docstore_strategy=DocstoreStrategy.UPSERTS,
+            # The transformation cache keeps every batch's nodes for the life of the process
+            disable_cache=True
         )
     
-    def run_pipeline(self, documents: List[Document] | None):
-        if not documents:
+    def run_pipeline(
+        self,
+        documents: Optional[Iterable[Document]],
+        skip_completed: bool = True,
+        progress: Progress = NO_PROGRESS
+    ) -> int:
+        """Embeds and upserts `documents`, returning how many went through the pipeline.
+
+        `documents` may be a generator. Batches are cut from it as the
+        scheduler has room for them, so only the batches in flight are held in
+        memory and embedding starts while later documents are still being
+        parsed.
+        """
+        if documents is None:
             logger.warning("No documents provided to process")
-            return
-        
+            return 0
+
+        seen = _SeenDocuments()
         try:
-            total_docs = len(documents)
-            logger.info(f"Processing {total_docs} documents through pipeline")
-            
-            # Process in batches
-            for i in range(0, total_docs, self.batch_size):
-                batch = documents[i:i + self.batch_size]
-                logger.info(f"Processing batch {i//self.batch_size + 1}, size: {len(batch)}")
-                
-                try:
-                    self.pipeline.run(documents=batch)
-                    # Add a small delay between batches if needed
-                    time.sleep(1)  
-                except Exception as e:
-                    logger.error(f"Error processing batch {i//self.batch_size + 1}: {str(e)}")
-                    # Continue with next batch instead of failing completely
-                    continue
-                    
-            logger.info("Successfully processed all documents through pipeline")
+            logger.info(f"Streaming documents through pipeline, up to {self.scheduler.max_concurrency} batches at a time")
+            report = self.scheduler.run(
+                self._batches(documents, skip_completed, seen, progress),
+                process=lambda batch: self._run_batch(batch, progress),
+                cost=self._estimate_batch_cost,
+                # Finished batches only need their papers remembered, not their text
+                summarize=lambda batch: {doc.metadata.get('arxiv_id') for doc in batch}
+            )
+            if not seen.documents:
+                logger.warning("No documents provided to process")
+                return 0
+
+            failed_papers = set()
+            for papers, error in report.failed:
+                logger.error(f"Dropping a batch of documents from {sorted(filter(None, papers))} after retries: {str(error)}")
+                progress.add_error(f"Embedding batch failed: {str(error)}")
+                failed_papers.update(papers)
+
+            # A paper only counts as ingested once every one of its segments made it in
+            ingested_papers = seen.papers - failed_papers
+            self.manifest.mark(filter(None, ingested_papers), 'embedded', 'upserted', chunking=self.chunking)
+            if report.succeeded:
+                # Cached answers were built without the new documents
+                invalidate_answer_caches(self.config.index_name)
+
+            logger.info(
+                f"Processed {seen.documents} documents in {len(report.succeeded)}/{seen.batches} batches "
+                f"({report.retries} retries, {report.rate_limited} rate limited)"
+            )
+            if hasattr(self.embedding_model, 'stats'):
+                logger.info(f"Embedding cache: {self.embedding_model.stats()}")
+            return seen.documents
         except Exception as e:
             logger.error(f"Failed to run pipeline: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            self._persist_docstore()
+
+    def _batches(
+        self,
+        documents: Iterable[Document],
+        skip_completed: bool,
+        seen: "_SeenDocuments",
+        progress: Progress
+    ) -> Iterator[List[Document]]:
+        batch = []
+        for doc in documents:
+            arxiv_id = doc.metadata.get('arxiv_id')
+            if skip_completed and self.is_ingested(arxiv_id):
+                continue
+            self._stamp_chunking(doc)
+            seen.documents += 1
+            seen.papers.add(arxiv_id)
+            batch.append(doc)
+            if len(batch) == self.batch_size:
+                seen.batches += 1
+                if seen.batches == 1:
+                    # Parsing may still be going on; from here on both stages overlap
+                    progress.set_stage("embedding")
+                yield batch
+                batch = []
+        if batch:
+            seen.batches += 1
+            progress.set_stage("embedding")
+            yield batch
+
+    def _run_batch(self, batch: List[Document], progress: Progress) -> None:
+        try:
+            nodes = self.pipeline.run(documents=batch, store_doc_text=False)
+        except Exception:
+            # The docstore records hashes before upserting; forget them so a retry isn't skipped as unchanged
+            if self.docstore is not None:
+                for doc in batch:
+                    self.docstore.delete_document(doc.id_, raise_error=False)
+            raise
+        if self.lexical_index is not None:
+            # Index exactly the nodes that went into the vector store, replacing those of changed segments
+            for ref_doc_id in {node.ref_doc_id for node in nodes if node.ref_doc_id}:
+                self.lexical_index.delete(ref_doc_id)
+            self.lexical_index.add(nodes)
+        progress.increment('documents_embedded', len(batch))
+
+    def _estimate_batch_cost(self, batch: List[Document]) -> Tuple[int, int]:
+        """Rough (requests, tokens) a batch will spend on the embedding API.
+
+        The semantic splitter embeds every sentence together with
+        `buffer_size` neighbours on each side, then the resulting nodes are
+        embedded once more, in requests packed up to
+        `embedding_request_max_tokens`. The other strategies only embed the
+        nodes; for "hybrid" this assumes the worst case, every document going
+        semantic.
+        """
+        chars = sum(len(doc.text) for doc in batch)
+        node_tokens = math.ceil(chars / 4)
+        requests = math.ceil(node_tokens / self.config.embedding_request_max_tokens)
+        tokens = node_tokens
+        if self.config.chunking_strategy in ("semantic", "hybrid"):
+            sentences = max(1, chars // 150)
+            requests += math.ceil(sentences / self.embedding_model.embed_batch_size)
+            tokens += node_tokens * (2 * self.config.buffer_size + 1)
+        return requests, tokens
+
+    def is_ingested(self, arxiv_id: Optional[str]) -> bool:
+        """Whether the paper is in the index, chunked the way the current config would chunk it."""
+        return bool(arxiv_id) and self.manifest.is_done(arxiv_id, 'upserted', chunking=self.chunking)
+
+    def _stamp_chunking(self, doc: Document) -> None:
+        # Part of the document hash, so the docstore treats a re-chunked segment as changed
+        doc.metadata['chunking'] = self.chunking
+        for keys in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+            if 'chunking' not in keys:
+                keys.append('chunking')
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Group for results that span sessions, such as the session list
+ALL_SESSIONS = "*"
+
+
+def compute_etag(value: Any) -> str:
+    digest = hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+@dataclass
+class _Entry:
+    value: Any
+    group: str
+    created_at: float
+
+
+class HistoryCache:
+    """In-process read-through cache for sessions and messages.
+
+    Each entry belongs to a group, which is the session it was read from or
+    `ALL_SESSIONS`, so a write can drop everything it may have changed with
+    `invalidate(session_id)`. Entries also expire after `ttl_seconds`, which
+    bounds staleness from writes made by other processes, and the least
+    recently read are dropped past `max_entries`. Cached values are shared,
+    so callers must not modify them.
+
+    A read that races a write could store what it read before the write
+    after the write's invalidation. Readers therefore take the group's
+    `generation` before querying and pass it to `set`, which drops the value
+    if the group was invalidated in the meantime.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 2000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        self._entries: "OrderedDict[Tuple[Hashable, ...], _Entry]" = OrderedDict()
+        self._groups: Dict[str, Set[Tuple[Hashable, ...]]] = {}
+        # Groups that were never invalidated are at generation 0
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def generation(self, group: str) -> int:
+        with self._lock:
+            return self._generations.get(group, 0)
+
+    def set(self, key: Tuple[Hashable, ...], value: Any, group: str, generation: Optional[int] = None) -> None:
+        """Caches `value`, unless `group` was invalidated after `generation` was read."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(group, 0):
+                self.stale_sets += 1
+                return
+            self._remove(key)
+            self._entries[key] = _Entry(value, group, time.monotonic())
+            self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *groups: str) -> None:
+        with self._lock:
+            for group in groups:
+                for key in list(self._groups.get(group, ())):
+                    self._remove(key)
+                self._generations[group] = self._generations.get(group, 0) + 1
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'stale_sets': self.stale_sets
+            }
+
+    def _remove(self, key: Tuple[Hashable, ...]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._groups.get(entry.group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[entry.group]
@@ -0,0 +1,154 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Progress:
+    """Progress sink the ingestion services report to. The base class ignores everything."""
+
+    def set_stage(self, stage: str) -> None:
+        pass
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        pass
+
+    def add_error(self, message: str) -> None:
+        pass
+
+
+NO_PROGRESS = Progress()
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IngestionJob(Progress):
+
+    def __init__(self, kind: str, key: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.key = key
+        self.status = JobStatus.QUEUED
+        self.stage = "queued"
+        self.counters: Dict[str, int] = {}
+        self.errors: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage: str) -> None:
+        with self._lock:
+            self.stage = stage
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_error(self, message: str) -> None:
+        with self._lock:
+            self.errors.append(message)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'key': self.key,
+                'status': self.status.value,
+                'stage': self.stage,
+                'progress': dict(self.counters),
+                'errors': list(self.errors),
+                'result': self.result,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+
+
+class IngestionJobManager:
+    """Runs ingestion work on a bounded thread pool, off the event loop.
+
+    Submitting a job while an identical one (same kind and key) is still
+    queued or running returns the existing job instead of starting another.
+    Finished jobs are kept for status queries until `max_finished_jobs` newer
+    ones push them out.
+    """
+
+    def __init__(self, max_workers: int = 2, max_finished_jobs: int = 200):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._active: Dict[Tuple[str, str], IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, key: str, work: Callable[[IngestionJob], Dict[str, Any]]) -> Tuple[IngestionJob, bool]:
+        """Returns the job and whether it was newly created."""
+        with self._lock:
+            existing = self._active.get((kind, key))
+            if existing is not None and existing.active:
+                logger.info(f"Coalescing {kind} job for {key!r} into {existing.id}")
+                return existing, False
+
+            job = IngestionJob(kind, key)
+            self._jobs[job.id] = job
+            self._active[(kind, key)] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, work)
+        logger.info(f"Queued {kind} job {job.id} for {key!r}")
+        return job, True
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, job: IngestionJob, work: Callable[[IngestionJob], Dict[str, Any]]) -> None:
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        try:
+            result = work(job)
+            job.result = result
+            if result and result.get('status') == 'error':
+                job.add_error(result.get('message', 'Unknown error'))
+                job.status = JobStatus.FAILED
+            else:
+                job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {str(e)}")
+            job.add_error(str(e))
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = time.time()
+            job.set_stage("done")
+            with self._lock:
+                if self._active.get((job.kind, job.key)) is job:
+                    del self._active[(job.kind, job.key)]
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
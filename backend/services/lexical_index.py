@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "of on or should that the their there these this to was what when which who why will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over ingested nodes, stored in SQLite.
+
+    Terms are interned to integer ids and postings are (term, doc, tf)
+    integer rows in a WITHOUT ROWID table, so the index stays a fraction of
+    the size of the text. Nodes are stored alongside so lexical hits can be
+    returned without touching the vector store. Re-adding a node id
+    replaces its postings.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id INTEGER PRIMARY KEY, node_id TEXT NOT NULL UNIQUE, ref_doc_id TEXT, "
+            "length INTEGER NOT NULL, node TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_ref_doc_id ON docs (ref_doc_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term INTEGER NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, doc)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._doc_count, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+        ).fetchone()
+
+    def add(self, nodes: Iterable[BaseNode]) -> int:
+        added = 0
+        with self._lock:
+            for node in nodes:
+                text = node.get_content(metadata_mode=MetadataMode.NONE)
+                counts = Counter(tokenize(text))
+                self._remove(node_id=node.node_id)
+                cursor = self._conn.execute(
+                    "INSERT INTO docs (node_id, ref_doc_id, length, node) VALUES (?, ?, ?, ?)",
+                    (
+                        node.node_id,
+                        node.ref_doc_id,
+                        sum(counts.values()),
+                        json.dumps(node_to_metadata_dict(node, remove_text=False, flat_metadata=False))
+                    )
+                )
+                term_ids = self._term_ids(counts, create=True)
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                    [(term_ids[term], cursor.lastrowid, tf) for term, tf in counts.items()]
+                )
+                self._doc_count += 1
+                self._total_length += sum(counts.values())
+                added += 1
+            self._conn.commit()
+        return added
+
+    def delete(self, ref_doc_id: str) -> None:
+        with self._lock:
+            self._remove(ref_doc_id=ref_doc_id)
+            self._conn.commit()
+
+    def search(self, query: str, top_k: int) -> List[NodeWithScore]:
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._doc_count:
+                return []
+            avg_length = self._total_length / self._doc_count
+            scores: Dict[int, float] = {}
+            lengths: Dict[int, int] = {}
+            for term_id in self._term_ids(terms, create=False).values():
+                postings = self._conn.execute(
+                    "SELECT p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc WHERE p.term = ?",
+                    (term_id,)
+                ).fetchall()
+                idf = math.log(1 + (self._doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            nodes = self._fetch_nodes([doc for doc, _ in best])
+        return [NodeWithScore(node=nodes[doc], score=score) for doc, score in best if doc in nodes]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            terms = self._conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        return {
+            'documents': self._doc_count,
+            'terms': terms,
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def _term_ids(self, terms: Iterable[str], create: bool) -> Dict[str, int]:
+        terms = list(terms)
+        if create:
+            self._conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(term,) for term in terms])
+        ids = {}
+        for start in range(0, len(terms), 500):
+            chunk = terms[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(self._conn.execute(
+                f"SELECT term, id FROM terms WHERE term IN ({placeholders})", chunk
+            ).fetchall())
+        return ids
+
+    def _remove(self, node_id: Optional[str] = None, ref_doc_id: Optional[str] = None) -> None:
+        if node_id is not None:
+            rows = self._conn.execute("SELECT id, length, node FROM docs WHERE node_id = ?", (node_id,)).fetchall()
+        else:
+            rows = self._conn.execute("SELECT id, length, node FROM docs WHERE ref_doc_id = ?", (ref_doc_id,)).fetchall()
+        for doc, length, node_json in rows:
+            # Re-tokenizing the stored text finds the postings without an index on doc
+            text = metadata_dict_to_node(json.loads(node_json)).get_content(metadata_mode=MetadataMode.NONE)
+            term_ids = self._term_ids(set(tokenize(text)), create=False)
+            self._conn.executemany(
+                "DELETE FROM postings WHERE term = ? AND doc = ?", [(term_id, doc) for term_id in term_ids.values()]
+            )
+            self._conn.execute("DELETE FROM docs WHERE id = ?", (doc,))
+            self._doc_count -= 1
+            self._total_length -= length
+
+    def _fetch_nodes(self, docs: List[int]) -> Dict[int, BaseNode]:
+        if not docs:
+            return {}
+        placeholders = ",".join("?" * len(docs))
+        return {
+            doc: metadata_dict_to_node(json.loads(node_json))
+            for doc, node_json in self._conn.execute(
+                f"SELECT id, node FROM docs WHERE id IN ({placeholders})", docs
+            )
+        }
+
+
+@lru_cache(maxsize=None)
+def get_lexical_index(path: str) -> BM25Index:
+    """One index per file, shared by ingestion and retrieval in the same process."""
+    return BM25Index(path)
+
+
+class LexicalRetriever(BaseRetriever):
+    """BM25-only retrieval; needs no query embedding."""
+
+    def __init__(self, index: BM25Index, similarity_top_k: int = 5, **kwargs: Any):
+        self._index = index
+        self._similarity_top_k = similarity_top_k
+        super().__init__(**kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._index.search(query_bundle.query_str, self._similarity_top_k)
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses dense and BM25 results by reciprocal rank.
+
+    The similarity cutoff only applies to the dense side, so a passage the
+    embedding scores low can still come back on an exact term match. Fused
+    scores are sum(1 / (rrf_k + rank)) over the lists a node appears in.
+    """
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        lexical_index: BM25Index,
+        similarity_top_k: int = 5,
+        similarity_cutoff: Optional[float] = None,
+        rrf_k: int = 60,
+        **kwargs: Any
+    ):
+        self._vector_retriever = vector_retriever
+        self._lexical_index = lexical_index
+        self._similarity_top_k = similarity_top_k
+        self._similarity_cutoff = similarity_cutoff
+        self._rrf_k = rrf_k
+        super().__init__(**kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(
+            self._vector_retriever.retrieve(query_bundle),
+            self._lexical_index.search(query_bundle.query_str, self._similarity_top_k)
+        )
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(
+            await self._vector_retriever.aretrieve(query_bundle),
+            self._lexical_index.search(query_bundle.query_str, self._similarity_top_k)
+        )
+
+    def _fuse(self, dense: List[NodeWithScore], lexical: List[NodeWithScore]) -> List[NodeWithScore]:
+        if self._similarity_cutoff is not None:
+            dense = [node for node in dense if node.score is not None and node.score >= self._similarity_cutoff]
+
+        fused: Dict[str, Tuple[float, NodeWithScore]] = {}
+        for results in (dense, lexical):
+            for rank, node in enumerate(results, start=1):
+                score, first = fused.get(node.node.node_id, (0.0, node))
+                fused[node.node.node_id] = (score + 1.0 / (self._rrf_k + rank), first)
+
+        best = sorted(fused.values(), key=lambda item: item[0], reverse=True)[:self._similarity_top_k]
+        return [NodeWithScore(node=node.node, score=score) for score, node in best]
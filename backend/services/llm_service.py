@@ -1,53 +1,140 @@
+import time
+from backend.services.answer_cache import SemanticAnswerCache
 from backend.services.base_service import BaseService, ServiceConfig
 from backend.services.embedding_service import EmbeddingService
-from typing import List, Optional, Dict, Any
+from backend.services.lexical_index import HybridRetriever, LexicalRetriever
+from backend.utils.metrics import record_error, record_stage
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 
 from llama_index.core import VectorStoreIndex
-from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
 from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.postprocessor import SimilarityPostprocessor
 from llama_index.llms.openai import OpenAI
-from llama_index.core.llms import ChatMessage
+from llama_index.core.llms import LLM, ChatMessage
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
 from fastapi import HTTPException
 
 import logging
 
 logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Wall-clock milliseconds per stage of answering a question.
+
+    Each stage is also recorded in the process metrics under the name in
+    `METRIC_STAGES`.
+    """
+
+    METRIC_STAGES = {
+        'embedding': 'query_embed',
+        'cache_lookup': 'answer_cache_lookup',
+        'retrieval': 'retrieve',
+        # Two-pass mode retrieves and synthesizes in one query engine call
+        'retrieval_synthesis': 'retrieve_synthesize',
+        'first_token': 'llm_first_token',
+        'generation': 'llm_chat'
+    }
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.stages: Dict[str, float] = {}
+
+    def mark(self, stage: str, items: int = 0) -> None:
+        now = time.perf_counter()
+        self.stages[f"{stage}_ms"] = round((now - self._last) * 1000, 1)
+        record_stage(self.METRIC_STAGES.get(stage, stage), now - self._last, items=items)
+        self._last = now
+
+    def fail(self) -> None:
+        record_error('ask')
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def to_dict(self) -> Dict[str, float]:
+        return {**self.stages, 'total_ms': round(self.elapsed() * 1000, 1)}
+
+
 class LLMService(BaseService):
     
     def __init__(self, embedding_service: EmbeddingService = None, config: Optional[ServiceConfig] = None):
         
         self.config = config or self._load_default_config()
-        self.client = OpenAI(api_key=self.config.openai_api_key)
+        self.client = self._create_llm()
         
         # Use existing vector store from embedding service or create new one
         if embedding_service:
             self.vector_store = embedding_service.vector_store
+            self.embedding_model = embedding_service.embedding_model
+            self.lexical_index = embedding_service.lexical_index
         else:
             self.vector_store = self._create_vector_store()
+            self.embedding_model = self._create_embedding_model()
+            self.lexical_index = self._create_lexical_index()
             
         self.query_engine = self._setup_retrieval()
+        self.answer_cache = self._create_answer_cache()
+
+    def _create_llm(self) -> LLM:
+        return OpenAI(api_key=self.config.openai_api_key)
+
+    def _create_answer_cache(self) -> Optional[SemanticAnswerCache]:
+        if self.config.answer_cache_max_entries <= 0:
+            return None
+        return SemanticAnswerCache(
+            self.config.index_name,
+            similarity_threshold=self.config.answer_cache_similarity,
+            ttl_seconds=self.config.answer_cache_ttl_seconds,
+            max_entries=self.config.answer_cache_max_entries
+        )
 
     def _setup_retrieval(self) -> RetrieverQueryEngine:
-        index = VectorStoreIndex.from_vector_store(self.vector_store)
+        # Single-pass mode uses the retriever directly and skips the engine's synthesis call
+        self.retriever = self._create_retriever()
+        if self.config.retrieval_strategy == "vector":
+            self.node_postprocessors = [
+                SimilarityPostprocessor(similarity_cutoff=self.config.similarity_cutoff)
+            ]
+        else:
+            # BM25 and fused scores aren't cosine similarities; the hybrid retriever applies the cutoff itself
+            self.node_postprocessors = []
+        # The research summary is synthesized by the same client as the answer, not Settings.llm
+        return RetrieverQueryEngine.from_args(
+            retriever=self.retriever,
+            llm=self.client,
+            node_postprocessors=self.node_postprocessors
+        )
+
+    def _create_retriever(self) -> BaseRetriever:
+        strategy = self.config.retrieval_strategy
+        if strategy not in ("vector", "hybrid", "lexical"):
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+        if strategy != "vector" and self.lexical_index is None:
+            raise ValueError(f"Retrieval strategy {strategy!r} needs lexical_index_path to be set")
+
+        if strategy == "lexical":
+            return LexicalRetriever(self.lexical_index, similarity_top_k=self.config.top_k)
+
+        index = VectorStoreIndex.from_vector_store(self.vector_store, embed_model=self.embedding_model)
         retriever = VectorIndexRetriever(
             index=index,
             similarity_top_k=self.config.top_k
         )
-        return RetrieverQueryEngine(
-            retriever=retriever,
-            node_postprocessors=[
-                SimilarityPostprocessor(similarity_cutoff=self.config.similarity_cutoff)
-            ]
+        if strategy == "vector":
+            return retriever
+        return HybridRetriever(
+            retriever,
+            self.lexical_index,
+            similarity_top_k=self.config.top_k,
+            similarity_cutoff=self.config.similarity_cutoff
         )
 
     def query(self, question: str) -> Dict[str, Any]:
         try:
-            messages = [
-                ChatMessage(role="system", content="You are a personal trainer and nutritionist"),
-                ChatMessage(role="user", content=question)
-            ]
-            response = self.client.chat(messages=messages)
+            response = self.client.chat(messages=self._general_messages(question))
             
             return {
                 'question': question,
@@ -58,30 +145,64 @@ class LLMService(BaseService):
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    async def aquery(self, question: str) -> Dict[str, Any]:
+        try:
+            response = await self.client.achat(messages=self._general_messages(question))
+
+            return {
+                'question': question,
+                'answer': str(response),
+                'sources': None,
+                'error': None
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     def query_with_research(self, question: str) -> Dict[str, Any]:
+        timer = StageTimer()
         try:
+            query_bundle = self._query_bundle(question, timer)
+            cached, generation = self._cached_answer(question, query_bundle, timer)
+            if cached is not None:
+                return cached
+
             # Get research context
-            research_response = self.query_engine.query(question)
-            sources = self._extract_sources(research_response)
+            messages, sources = self._research_context(question, query_bundle, timer)
 
-            # Format messages with research context
-            messages = [
-                ChatMessage(role="system", content="You are a personal trainer and nutritionist"),
-                ChatMessage(
-                    role="user", 
-                    content=f"Using this research context: {str(research_response)}\n\nPlease answer: {question}"
-                )
-            ]
-            
             response = self.client.chat(messages=messages)
+            timer.mark('generation')
 
+            result = self._research_result(question, str(response).replace("assistant: ", ""), sources, timer)
+            self._cache_answer(query_bundle, result, timer, generation)
+            return result
+        except Exception as e:
+            timer.fail()
             return {
                 'question': question,
-                'answer': str(response).replace("assistant: ", ""),
-                'sources': sources,
-                'error': None
+                'answer': None,
+                'sources': None,
+                'error': str(e)
             }
+
+    async def aquery_with_research(self, question: str) -> Dict[str, Any]:
+        timer = StageTimer()
+        try:
+            query_bundle = await self._aquery_bundle(question, timer)
+            cached, generation = self._cached_answer(question, query_bundle, timer)
+            if cached is not None:
+                return cached
+
+            # Get research context
+            messages, sources = await self._aresearch_context(question, query_bundle, timer)
+
+            response = await self.client.achat(messages=messages)
+            timer.mark('generation')
+
+            result = self._research_result(question, str(response).replace("assistant: ", ""), sources, timer)
+            self._cache_answer(query_bundle, result, timer, generation)
+            return result
         except Exception as e:
+            timer.fail()
             return {
                 'question': question,
                 'answer': None,
@@ -89,21 +210,193 @@ class LLMService(BaseService):
                 'error': str(e)
             }
 
-    def _extract_sources(self, response) -> List[Dict[str, Any]]:
-        sources = []
-        if hasattr(response, 'source_nodes'):
-            for node in response.source_nodes:
-                source = {
-                    'text': node.node.text[:200] + "..." if len(node.node.text) > 200 else node.node.text,
-                    'score': node.score if hasattr(node, 'score') else None,
-                    'metadata': {
-                        'title': node.metadata.get('title', 'Unknown'),
-                        'authors': node.metadata.get('authors', []),
-                        'published_date': node.metadata.get('published_date', 'Unknown'),
-                        'arxiv_id': node.metadata.get('arxiv_id', 'Unknown')
-                    } if hasattr(node, 'metadata') else {}
+    async def astream_query_with_research(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """Streams a research-backed answer as events.
+
+        Yields a `sources` event as soon as retrieval finishes, one `token`
+        event per generated chunk, then a `done` event carrying the same
+        payload `query_with_research` returns (or an `error` event).
+        """
+        timer = StageTimer()
+        try:
+            query_bundle = await self._aquery_bundle(question, timer)
+            cached, generation = self._cached_answer(question, query_bundle, timer)
+            if cached is not None:
+                yield {'event': 'sources', 'data': {'question': question, 'sources': cached['sources']}}
+                yield {'event': 'token', 'data': {'delta': cached['answer']}}
+                yield {'event': 'done', 'data': cached}
+                return
+
+            messages, sources = await self._aresearch_context(question, query_bundle, timer)
+            yield {'event': 'sources', 'data': {'question': question, 'sources': sources}}
+
+            chunks = []
+            stream = await self.client.astream_chat(messages=messages)
+            async for chunk in stream:
+                if chunk.delta:
+                    if not chunks:
+                        timer.mark('first_token')
+                    chunks.append(chunk.delta)
+                    yield {'event': 'token', 'data': {'delta': chunk.delta}}
+            timer.mark('generation')
+
+            result = self._research_result(question, ''.join(chunks), sources, timer)
+            self._cache_answer(query_bundle, result, timer, generation)
+            yield {'event': 'done', 'data': result}
+        except Exception as e:
+            timer.fail()
+            logger.error(f"Error streaming answer: {str(e)}")
+            yield {
+                'event': 'error',
+                'data': {
+                    'question': question,
+                    'answer': None,
+                    'sources': None,
+                    'error': str(e)
                 }
-                sources.append(source)
+            }
+
+    @property
+    def single_pass(self) -> bool:
+        return self.config.answer_mode == "single_pass"
+
+    def _research_context(self, question: str, query_bundle: QueryBundle, timer: "StageTimer") -> Tuple[List[ChatMessage], List[Dict[str, Any]]]:
+        if self.single_pass:
+            nodes = self._filter_nodes(self.retriever.retrieve(query_bundle), query_bundle)
+            timer.mark('retrieval', items=len(nodes))
+            return self._context_messages(question, nodes), self._extract_sources(nodes)
+
+        research_response = self.query_engine.query(query_bundle)
+        timer.mark('retrieval_synthesis', items=len(research_response.source_nodes))
+        return self._research_messages(question, research_response), self._extract_sources(research_response.source_nodes)
+
+    async def _aresearch_context(self, question: str, query_bundle: QueryBundle, timer: "StageTimer") -> Tuple[List[ChatMessage], List[Dict[str, Any]]]:
+        if self.single_pass:
+            nodes = self._filter_nodes(await self.retriever.aretrieve(query_bundle), query_bundle)
+            timer.mark('retrieval', items=len(nodes))
+            return self._context_messages(question, nodes), self._extract_sources(nodes)
+
+        research_response = await self.query_engine.aquery(query_bundle)
+        timer.mark('retrieval_synthesis', items=len(research_response.source_nodes))
+        return self._research_messages(question, research_response), self._extract_sources(research_response.source_nodes)
+
+    def _filter_nodes(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        for postprocessor in self.node_postprocessors:
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        return nodes
+
+    def _research_result(self, question: str, answer: str, sources: List[Dict[str, Any]], timer: "StageTimer") -> Dict[str, Any]:
+        timings = timer.to_dict()
+        record_stage('ask', timer.elapsed())
+        logger.info(f"Answered in {self.config.answer_mode} mode: {timings}")
+        return {
+            'question': question,
+            'answer': answer,
+            'sources': sources,
+            'error': None,
+            'timings': timings
+        }
+
+    def _query_bundle(self, question: str, timer: "StageTimer") -> QueryBundle:
+        query_bundle = QueryBundle(question)
+        # Lexical retrieval never needs the embedding, so it skips the answer cache too
+        if self.answer_cache is not None and self.config.retrieval_strategy != "lexical":
+            # The retriever reuses this embedding instead of computing it again
+            query_bundle.embedding = self.embedding_model.get_query_embedding(question)
+            timer.mark('embedding')
+        return query_bundle
+
+    async def _aquery_bundle(self, question: str, timer: "StageTimer") -> QueryBundle:
+        query_bundle = QueryBundle(question)
+        # Lexical retrieval never needs the embedding, so it skips the answer cache too
+        if self.answer_cache is not None and self.config.retrieval_strategy != "lexical":
+            # The retriever reuses this embedding instead of computing it again
+            query_bundle.embedding = await self.embedding_model.aget_query_embedding(question)
+            timer.mark('embedding')
+        return query_bundle
+
+    def _cached_answer(
+        self,
+        question: str,
+        query_bundle: QueryBundle,
+        timer: "StageTimer"
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """Returns the cached answer, if any, and the cache generation to store a fresh one under."""
+        if self.answer_cache is None or query_bundle.embedding is None:
+            return None, None
+        # Read before retrieval, so an answer that straddles an ingestion isn't cached after it
+        generation = self.answer_cache.generation
+        hit = self.answer_cache.lookup(query_bundle.embedding)
+        timer.mark('cache_lookup')
+        if hit is None:
+            return None, generation
+        answer, latency = hit
+        self.answer_cache.record_saving(latency - timer.elapsed())
+        logger.info(f"Answer cache hit for: {question}")
+        return {**answer, 'question': question, 'timings': timer.to_dict()}, generation
+
+    def _cache_answer(
+        self,
+        query_bundle: QueryBundle,
+        result: Dict[str, Any],
+        timer: "StageTimer",
+        generation: Optional[int] = None
+    ) -> None:
+        if self.answer_cache is None or query_bundle.embedding is None:
+            return
+        self.answer_cache.store(query_bundle.embedding, result, timer.elapsed(), generation)
+
+    @staticmethod
+    def _general_messages(question: str) -> List[ChatMessage]:
+        return [
+            ChatMessage(role="system", content="You are a personal trainer and nutritionist"),
+            ChatMessage(role="user", content=question)
+        ]
+
+    @staticmethod
+    def _research_messages(question: str, research_response) -> List[ChatMessage]:
+        # Format messages with research context
+        return [
+            ChatMessage(role="system", content="You are a personal trainer and nutritionist"),
+            ChatMessage(
+                role="user", 
+                content=f"Using this research context: {str(research_response)}\n\nPlease answer: {question}"
+            )
+        ]
+
+    @staticmethod
+    def _context_messages(question: str, nodes: List[NodeWithScore]) -> List[ChatMessage]:
+        # Single pass: the retrieved excerpts go straight into the one generation call
+        if not nodes:
+            context = "No relevant research excerpts were found."
+        else:
+            context = "\n\n".join(
+                f"[{i}] {node.metadata.get('title', 'Unknown')} (arXiv {node.metadata.get('arxiv_id', 'Unknown')})\n"
+                f"{node.node.get_content(metadata_mode=MetadataMode.NONE)}"
+                for i, node in enumerate(nodes, start=1)
+            )
+        return [
+            ChatMessage(role="system", content="You are a personal trainer and nutritionist"),
+            ChatMessage(
+                role="user",
+                content=f"Using these research excerpts:\n\n{context}\n\nPlease answer: {question}"
+            )
+        ]
+
+    def _extract_sources(self, nodes: List[NodeWithScore]) -> List[Dict[str, Any]]:
+        sources = []
+        for node in nodes:
+            source = {
+                'text': node.node.text[:200] + "..." if len(node.node.text) > 200 else node.node.text,
+                'score': node.score if hasattr(node, 'score') else None,
+                'metadata': {
+                    'title': node.metadata.get('title', 'Unknown'),
+                    'authors': node.metadata.get('authors', []),
+                    'published_date': node.metadata.get('published_date', 'Unknown'),
+                    'arxiv_id': node.metadata.get('arxiv_id', 'Unknown')
+                } if hasattr(node, 'metadata') else {}
+            }
+            sources.append(source)
         return sources
     
     def generate_short_title(self, text: str) -> str:
@@ -0,0 +1,461 @@
+import os
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+from backend.utils.metrics import track_stage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorIndex:
+    """In-process vector index persisted under `persist_dir`.
+
+    Vectors are unit-normalized float32 rows appended to `vectors.f32` and
+    read back through a memory map, so similarity is cosine as with the
+    Pinecone index. Node contents live in a small SQLite table next to it.
+    Adding a node with an id that is already stored replaces the old row.
+
+    `mode="exact"` scores every row. `mode="ivf"` clusters the rows into
+    `ivf_lists` partitions with k-means once there are at least
+    `ivf_min_vectors` of them and only scores the `ivf_probes` partitions
+    whose centroids are closest to the query. The partitions are retrained
+    whenever the index has doubled since the last training.
+
+    Replaced and deleted rows stay in the vector file, marked dead, until
+    they make up more than `compact_dead_fraction` of it; then `compact`
+    rewrites the file with the live rows only. That is checked on load and
+    after every write.
+    """
+
+    def __init__(
+        self,
+        persist_dir: str,
+        mode: str = "exact",
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        ivf_min_vectors: int = 4096,
+        compact_dead_fraction: float = 0.25
+    ):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown local vector store mode: {mode}")
+        self.persist_dir = persist_dir
+        self.mode = mode
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_vectors = ivf_min_vectors
+        self.compact_dead_fraction = compact_dead_fraction
+        self._dim: Optional[int] = None
+        self._generation = 0
+        self._count = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._live = np.ones(0, dtype=bool)
+        self._row_ids: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._trained_at = 0
+        self._lock = threading.RLock()
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(persist_dir, "nodes.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "row INTEGER PRIMARY KEY, node_id TEXT NOT NULL, ref_doc_id TEXT, "
+            "node TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_node_id ON nodes (node_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_ref_doc_id ON nodes (ref_doc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return self._vectors_file(self._generation)
+
+    def _vectors_file(self, generation: int) -> str:
+        # Each compaction writes a new file, and the committed generation says which one is current
+        name = "vectors.f32" if generation == 0 else f"vectors.{generation}.f32"
+        return os.path.join(self.persist_dir, name)
+
+    def _load(self) -> None:
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self._dim = int(meta['dim']) if 'dim' in meta else None
+        self._generation = int(meta.get('generation', 0))
+        # Left behind by a compaction that was interrupted before or after its commit
+        for name in os.listdir(self.persist_dir):
+            path = os.path.join(self.persist_dir, name)
+            if name.startswith("vectors.") and name.endswith(".f32") and path != self._vectors_path:
+                os.remove(path)
+        rows = self._conn.execute("SELECT row, node_id, deleted FROM nodes ORDER BY row").fetchall()
+        self._count = len(rows)
+        self._live = np.ones(self._count, dtype=bool)
+        for row_number, node_id, deleted in rows:
+            if deleted:
+                self._live[row_number] = False
+            else:
+                self._row_ids[node_id] = row_number
+
+        # Rows written to the vector file without a committed node record are dropped
+        if self._dim is not None and os.path.exists(self._vectors_path):
+            expected = self._count * self._dim * 4
+            if os.path.getsize(self._vectors_path) > expected:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(expected)
+        self._map_vectors()
+        if not self._compact_if_needed() and self.mode == "ivf":
+            self._train()
+        logger.info(f"Loaded local vector index from {self.persist_dir} with {len(self._row_ids)} nodes")
+
+    def _map_vectors(self) -> None:
+        if self._count == 0 or self._dim is None:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self._dim))
+
+    def add(self, nodes: List[BaseNode]) -> List[str]:
+        if not nodes:
+            return []
+        vectors = self._normalize(np.asarray([node.get_embedding() for node in nodes], dtype=np.float32))
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self._dim),))
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self._dim}")
+
+            first_row = self._count
+            replaced = [self._row_ids[node.node_id] for node in nodes if node.node_id in self._row_ids]
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            self._conn.executemany("UPDATE nodes SET deleted = 1 WHERE row = ?", [(row,) for row in replaced])
+            self._conn.executemany(
+                "INSERT INTO nodes (row, node_id, ref_doc_id, node) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        first_row + i,
+                        node.node_id,
+                        node.ref_doc_id,
+                        json.dumps(node_to_metadata_dict(node, remove_text=False, flat_metadata=False))
+                    )
+                    for i, node in enumerate(nodes)
+                ]
+            )
+            self._conn.commit()
+
+            self._count += len(nodes)
+            self._live = np.concatenate([self._live, np.ones(len(nodes), dtype=bool)])
+            self._live[replaced] = False
+            for i, node in enumerate(nodes):
+                self._row_ids[node.node_id] = first_row + i
+            self._map_vectors()
+
+            # Compacting retrains the partitions itself
+            compacted = self._compact_if_needed()
+            if self.mode == "ivf" and not compacted:
+                if self._centroids is not None and self._count < 2 * self._trained_at:
+                    self._assign(vectors, first_row)
+                else:
+                    self._train()
+
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str) -> None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row, node_id FROM nodes WHERE ref_doc_id = ? AND deleted = 0", (ref_doc_id,)
+            ).fetchall()
+            self._conn.execute("UPDATE nodes SET deleted = 1 WHERE ref_doc_id = ?", (ref_doc_id,))
+            self._conn.commit()
+            for row, node_id in rows:
+                self._live[row] = False
+                if self._row_ids.get(node_id) == row:
+                    del self._row_ids[node_id]
+            self._compact_if_needed()
+
+    def compact(self) -> int:
+        """Rewrites the index without its dead rows and returns how many were dropped.
+
+        Live rows keep their order and are renumbered from 0. The new vectors
+        go to a fresh file, and the renumbering and the switch to that file
+        are committed in one transaction, so an interrupted compaction leaves
+        the previous index intact.
+        """
+        with self._lock:
+            live_rows = np.flatnonzero(self._live)
+            dropped = self._count - len(live_rows)
+            if dropped == 0:
+                return 0
+
+            generation = self._generation + 1
+            path = self._vectors_file(generation)
+            with open(path, "wb") as f:
+                for start in range(0, len(live_rows), 8192):
+                    f.write(np.ascontiguousarray(self._vectors[live_rows[start:start + 8192]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                self._conn.execute("DELETE FROM nodes WHERE deleted = 1")
+                # Ascending order never moves a row onto one that is still in use
+                self._conn.executemany(
+                    "UPDATE nodes SET row = ? WHERE row = ?",
+                    [(new_row, old_row) for new_row, old_row in enumerate(live_rows.tolist())]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(generation),)
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                os.remove(path)
+                raise
+
+            previous_path = self._vectors_path
+            self._vectors = None
+            self._generation = generation
+            self._count = len(live_rows)
+            self._live = np.ones(self._count, dtype=bool)
+            self._row_ids = {
+                node_id: int(np.searchsorted(live_rows, row)) for node_id, row in self._row_ids.items()
+            }
+            self._map_vectors()
+            if os.path.exists(previous_path):
+                os.remove(previous_path)
+            if self.mode == "ivf":
+                self._train()
+            logger.info(f"Compacted local vector index in {self.persist_dir}, dropping {dropped} dead rows")
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rows': self._count,
+                'live': len(self._row_ids),
+                'dead_fraction': 1 - len(self._row_ids) / self._count if self._count else 0.0
+            }
+
+    def _compact_if_needed(self) -> bool:
+        if self._count == 0 or self.compact_dead_fraction is None:
+            return False
+        if 1 - len(self._row_ids) / self._count <= self.compact_dead_fraction:
+            return False
+        return self.compact() > 0
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[BaseNode]:
+        with self._lock:
+            if node_ids is None:
+                rows = sorted(self._row_ids.values())
+            else:
+                rows = [self._row_ids[node_id] for node_id in node_ids if node_id in self._row_ids]
+            nodes = self._fetch_nodes(rows)
+        return [node for node in nodes if self._matches(node.metadata, filters)]
+
+    def query(self, query: VectorStoreQuery) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError("LocalVectorIndex needs a query embedding")
+
+        with self._lock:
+            if self._vectors is None or not self._row_ids:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+            vector = self._normalize(np.asarray(query.query_embedding, dtype=np.float32)[None, :])[0]
+            candidates, scores = self._score(vector)
+            if query.node_ids:
+                allowed = np.isin(candidates, [self._row_ids[node_id] for node_id in query.node_ids if node_id in self._row_ids])
+                candidates, scores = candidates[allowed], scores[allowed]
+
+            top_k = query.similarity_top_k
+            if query.doc_ids or query.filters or top_k >= len(scores):
+                order = np.argsort(-scores, kind="stable")
+            else:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                order = best[np.argsort(-scores[best], kind="stable")]
+
+            nodes, similarities, ids = [], [], []
+            # Filters and doc ids are checked on the best-scoring rows until top_k pass
+            for start in range(0, len(order), max(top_k * 4, 64)):
+                chunk = order[start:start + max(top_k * 4, 64)]
+                for node, score in zip(self._fetch_nodes(candidates[chunk].tolist()), scores[chunk]):
+                    if query.doc_ids and node.ref_doc_id not in query.doc_ids:
+                        continue
+                    if not self._matches(node.metadata, query.filters):
+                        continue
+                    nodes.append(node)
+                    similarities.append(float(score))
+                    ids.append(node.node_id)
+                    if len(nodes) >= top_k:
+                        break
+                if len(nodes) >= top_k or not (query.doc_ids or query.filters):
+                    break
+
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+    def _fetch_nodes(self, rows: List[int]) -> List[BaseNode]:
+        found = {}
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row, node_json in self._conn.execute(
+                f"SELECT row, node FROM nodes WHERE row IN ({placeholders})", chunk
+            ):
+                found[row] = metadata_dict_to_node(json.loads(node_json))
+        return [found[row] for row in rows if row in found]
+
+    def _score(self, vector: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows worth scoring for `vector` and their cosine similarities."""
+        if self.mode == "ivf" and self._centroids is not None:
+            probes = np.argsort(-(self._centroids @ vector))[:self.ivf_probes]
+            candidates = np.fromiter((row for probe in probes for row in self._lists[probe]), dtype=np.int64)
+            candidates = candidates[self._live[candidates]]
+            return candidates, self._vectors[candidates] @ vector
+        # One matrix-vector product over the whole map beats gathering the live rows first
+        candidates = np.flatnonzero(self._live)
+        return candidates, (self._vectors @ vector)[candidates]
+
+    def _train(self) -> None:
+        live_rows = np.flatnonzero(self._live)
+        if self._vectors is None or len(live_rows) < self.ivf_min_vectors:
+            self._centroids = None
+            return
+
+        n_lists = self.ivf_lists or max(1, int(np.sqrt(len(live_rows))))
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live_rows, size=min(len(live_rows), n_lists * 64), replace=False)
+        data = np.asarray(self._vectors[np.sort(sample)])
+        centroids = data[rng.choice(len(data), size=n_lists, replace=False)]
+        # Spherical k-means: centroids stay unit length so dot product is cosine
+        for _ in range(10):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = data[labels == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+
+        self._centroids = centroids
+        self._lists = [[] for _ in range(n_lists)]
+        self._assign(np.asarray(self._vectors), 0)
+        self._trained_at = self._count
+        logger.info(f"Trained {n_lists} IVF partitions over {len(live_rows)} vectors")
+
+    def _assign(self, vectors: np.ndarray, first_row: int) -> None:
+        for start in range(0, len(vectors), 8192):
+            labels = np.argmax(vectors[start:start + 8192] @ self._centroids.T, axis=1)
+            for offset, label in enumerate(labels.tolist()):
+                self._lists[label].append(first_row + start + offset)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filters: Optional[MetadataFilters]) -> bool:
+        if filters is None or not filters.filters:
+            return True
+        results = []
+        for metadata_filter in filters.filters:
+            if isinstance(metadata_filter, MetadataFilters):
+                results.append(LocalVectorIndex._matches(metadata, metadata_filter))
+                continue
+            value = metadata.get(metadata_filter.key)
+            operator = metadata_filter.operator
+            if operator == FilterOperator.EQ:
+                results.append(value == metadata_filter.value)
+            elif operator == FilterOperator.NE:
+                results.append(value != metadata_filter.value)
+            elif operator == FilterOperator.IN:
+                results.append(value in metadata_filter.value)
+            elif operator == FilterOperator.NIN:
+                results.append(value not in metadata_filter.value)
+            else:
+                raise ValueError(f"LocalVectorIndex does not support the {operator} filter")
+        if filters.condition == FilterCondition.OR:
+            return any(results)
+        return all(results)
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """llama_index vector store backed by a LocalVectorIndex.
+
+    All state lives on the index object, which copies of this model share
+    (pydantic copies the store when it is passed into an IngestionPipeline).
+    """
+
+    stores_text: bool = True
+
+    _index: LocalVectorIndex = PrivateAttr()
+
+    def __init__(self, persist_dir: str, **index_kwargs: Any):
+        super().__init__()
+        self._index = LocalVectorIndex(persist_dir, **index_kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @property
+    def client(self) -> LocalVectorIndex:
+        return self._index
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        with track_stage('vector_upsert') as stage:
+            ids = self._index.add(nodes)
+            stage.items = len(ids)
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._index.delete(ref_doc_id)
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[BaseNode]:
+        return self._index.get_nodes(node_ids, filters)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        return self._index.query(query)
+
+
+@lru_cache(maxsize=None)
+def get_local_vector_store(
+    persist_dir: str,
+    mode: str = "exact",
+    ivf_lists: int = 0,
+    ivf_probes: int = 8,
+    ivf_min_vectors: int = 4096,
+    compact_dead_fraction: float = 0.25
+) -> LocalVectorStore:
+    """One store per directory, so ingestion and retrieval in the same process see the same rows."""
+    return LocalVectorStore(
+        persist_dir,
+        mode=mode,
+        ivf_lists=ivf_lists,
+        ivf_probes=ivf_probes,
+        ivf_min_vectors=ivf_min_vectors,
+        compact_dead_fraction=compact_dead_fraction
+    )
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from postgrest.exceptions import APIError
+
+from backend.services.batch_scheduler import is_rate_limit_error, is_transient_error
+from backend.services.search_message_service import SearchMessageService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# PostgREST reports the HTTP status as its error code when the response isn't its own JSON, as from a gateway
+RETRYABLE_POSTGREST_CODES = {'408', '429', '500', '502', '503', '504'}
+
+
+def is_retryable_write_error(error: BaseException) -> bool:
+    """Whether repeating a failed Supabase write may succeed.
+
+    Covers timeouts and dropped connections in the HTTP client (httpx's
+    TimeoutException is a TransportError), 5xx and 429 responses, and the
+    errors the batch scheduler already treats as transient. Services wrap
+    client errors in their own, so the whole chain of causes is checked.
+    """
+    if is_transient_error(error) or is_rate_limit_error(error):
+        return True
+    seen = []
+    while error is not None and error not in seen:
+        seen.append(error)
+        if isinstance(error, httpx.TransportError):
+            return True
+        if isinstance(error, APIError) and str(error.code) in RETRYABLE_POSTGREST_CODES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class MessageWriteBuffer:
+    """Groups message writes into multi-row inserts.
+
+    `submit` queues a row and waits for the batch it lands in. A batch is
+    written once it holds `max_batch_size` rows or its oldest row has waited
+    `max_delay` seconds, whichever comes first, so concurrent chats share
+    round trips while a lone write waits at most `max_delay`. Transient
+    failures are retried with exponential backoff. Any other failure splits
+    the batch in halves, so only the caller whose row is rejected gets the
+    error. `aclose` writes out whatever is still queued.
+    """
+
+    def __init__(
+        self,
+        message_service: SearchMessageService,
+        max_batch_size: int = 50,
+        max_delay: float = 0.05,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2
+    ):
+        self.message_service = message_service
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.batches_written = 0
+        self.rows_written = 0
+        self.failed_batches = 0
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._wake = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._closed = False
+
+    async def submit(
+        self,
+        session_id: str,
+        question: str,
+        answer: str,
+        sources: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Queues one message and returns the stored row once its batch is written."""
+        if self._closed:
+            raise RuntimeError("Message write buffer is closed")
+        # created_at is set now, so batching doesn't reorder a session's messages
+        row = self.message_service.message_row(session_id, question, answer, sources)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        self._wake.set()
+        return await asyncio.shield(future)
+
+    async def flush(self) -> None:
+        """Writes every queued row now and waits for all writes in flight."""
+        while self._pending:
+            self._start_batch()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def aclose(self) -> None:
+        self._closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.flush()
+        logger.info(
+            f"Message write buffer closed after {self.batches_written} batches, "
+            f"{self.rows_written} rows, {self.failed_batches} failed batches"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self._pending),
+            'in_flight': len(self._in_flight),
+            'batches_written': self.batches_written,
+            'rows_written': self.rows_written,
+            'failed_batches': self.failed_batches,
+            'rows_per_batch': self.rows_written / self.batches_written if self.batches_written else 0.0
+        }
+
+    async def _run(self) -> None:
+        while not self._closed:
+            await self._wake.wait()
+            self._wake.clear()
+            if not self._pending:
+                continue
+            deadline = time.monotonic() + self.max_delay
+            while len(self._pending) < self.max_batch_size and time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                self._wake.clear()
+            while self._pending:
+                self._start_batch()
+
+    def _start_batch(self) -> None:
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        # Batches are written concurrently; the next one doesn't wait for this one's round trip
+        task = asyncio.create_task(self._write(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            stored = await self._insert(rows)
+        except Exception as e:
+            if len(batch) > 1 and not is_retryable_write_error(e):
+                # One bad row fails the whole statement; halving narrows it down to the caller who sent it
+                logger.warning(f"Writing {len(rows)} messages failed, retrying in halves: {str(e)}")
+                half = len(batch) // 2
+                await asyncio.gather(self._write(batch[:half]), self._write(batch[half:]))
+                return
+            self.failed_batches += 1
+            logger.error(f"Giving up on a batch of {len(rows)} messages: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_written += 1
+        self.rows_written += len(rows)
+        stored_by_id = {row['id']: row for row in stored}
+        for row, future in batch:
+            if future.done():
+                continue
+            if row['id'] in stored_by_id:
+                future.set_result(stored_by_id[row['id']])
+            else:
+                future.set_exception(RuntimeError("Message was not returned by the batch insert"))
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Rows are upserted on their ids, so repeating a write that did land is harmless
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.message_service.create_messages(rows)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_write_error(e):
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning(f"Writing {len(rows)} messages failed, retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
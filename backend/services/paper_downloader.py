@@ -0,0 +1,112 @@
+import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.utils.metrics import track_stage
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class PaperDownloader:
+    """Downloads arXiv PDFs over a pooled HTTP session with bounded parallelism."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+        chunk_size: int = 64 * 1024
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.chunk_size = chunk_size
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        # One keep-alive connection per worker; retries are handled per file below
+        adapter = HTTPAdapter(
+            pool_connections=self.max_concurrency,
+            pool_maxsize=self.max_concurrency,
+            max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def download(self, url: str, filename: str) -> str:
+        with track_stage('pdf_download') as stage:
+            path = self._download_with_retries(url, filename)
+            stage.items = 1
+            stage.bytes = os.path.getsize(path)
+        return path
+
+    def _download_with_retries(self, url: str, filename: str) -> str:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.backoff_factor * (2 ** (attempt - 1)) * (1 + random.random())
+                logger.warning(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1}): {last_error}")
+                time.sleep(delay)
+            try:
+                return self._download_once(url, filename)
+            except requests.HTTPError as e:
+                last_error = e
+                if e.response is None or e.response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+            except (requests.ConnectionError, requests.Timeout, TimeoutError) as e:
+                last_error = e
+        raise last_error
+
+    def _download_once(self, url: str, filename: str) -> str:
+        deadline = time.monotonic() + self.timeout
+        tmp_filename = f"{filename}.part"
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_filename, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Download exceeded {self.timeout}s")
+                        f.write(chunk)
+            os.replace(tmp_filename, filename)
+            return filename
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def download_all(self, papers: Iterable[dict], papers_dir: str) -> Iterator[dict]:
+        """Downloads each paper's `pdf_url` into `papers_dir` and yields papers as they finish.
+
+        `local_path` is set on every paper that downloaded successfully; failed
+        papers are still yielded, without it.
+        """
+        os.makedirs(papers_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="pdf-download") as executor:
+            futures = {}
+            for paper in papers:
+                filename = os.path.join(papers_dir, f"{paper['arxiv_id']}.pdf")
+                futures[executor.submit(self.download, paper['pdf_url'], filename)] = paper
+
+            for future in as_completed(futures):
+                paper = futures[future]
+                try:
+                    paper['local_path'] = future.result()
+                    logger.info(f"Downloaded {paper['arxiv_id']}")
+                except Exception as e:
+                    logger.error(f"Failed to download {paper['arxiv_id']}: {str(e)}")
+                yield paper
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r'^(?P<base>.+?)(?P<version>v\d+)?$')
+
+
+class PaperManifest:
+    """Tracks downloaded papers and the ingestion stages each one has completed.
+
+    The manifest lives next to the PDFs as `manifest.json`, keyed by the
+    versioned arXiv id used for the PDF filename. Stage flags are tied to the
+    recorded content hash, so a re-downloaded file with different bytes starts
+    over from scratch. Papers marked with a `chunking` fingerprint only count
+    as done for that same fingerprint.
+    """
+
+    STAGES = ('parsed', 'embedded', 'upserted')
+
+    def __init__(self, papers_dir: str, filename: str = "manifest.json"):
+        self.papers_dir = papers_dir
+        self.path = os.path.join(papers_dir, filename)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        self._mtime: Optional[float] = None
+        self._reload_if_changed()
+
+    def get(self, arxiv_id: str) -> Optional[dict]:
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entries.get(arxiv_id)
+            return dict(entry) if entry else None
+
+    def cached_path(self, arxiv_id: str) -> Optional[str]:
+        """Returns the local PDF path if a complete copy is already on disk."""
+        path = self.pdf_path(arxiv_id)
+        if not os.path.exists(path):
+            return None
+
+        entry = self.get(arxiv_id)
+        if entry:
+            if os.path.getsize(path) != entry.get('size'):
+                logger.warning(f"Cached PDF for {arxiv_id} does not match manifest, re-downloading")
+                return None
+            # A file touched since it was recorded may have been rewritten at the same size
+            if os.path.getmtime(path) != entry.get('mtime'):
+                if self._hash_file(path) != entry.get('sha256'):
+                    logger.warning(f"Cached PDF for {arxiv_id} changed since it was downloaded, re-downloading")
+                    return None
+                self._record_mtime(arxiv_id, path)
+            return path
+
+        # PDFs downloaded before the manifest existed are adopted if they look complete
+        if self._looks_complete(path):
+            self.record_download(arxiv_id, path)
+            return path
+        return None
+
+    def pdf_path(self, arxiv_id: str) -> str:
+        return os.path.join(self.papers_dir, f"{arxiv_id}.pdf")
+
+    def record_download(self, arxiv_id: str, path: str) -> dict:
+        content_hash = self._hash_file(path)
+        match = VERSION_PATTERN.match(arxiv_id)
+        with self._lock:
+            self._reload_if_changed()
+            previous = self._entries.get(arxiv_id)
+            stages = dict.fromkeys(self.STAGES, False)
+            chunking = None
+            if previous and previous.get('sha256') == content_hash:
+                stages = previous.get('stages', stages)
+                chunking = previous.get('chunking')
+
+            entry = {
+                'arxiv_id': match.group('base'),
+                'version': match.group('version'),
+                'sha256': content_hash,
+                'size': os.path.getsize(path),
+                'mtime': os.path.getmtime(path),
+                'downloaded_at': datetime.now(timezone.utc).isoformat(),
+                'stages': stages
+            }
+            if chunking:
+                entry['chunking'] = chunking
+            self._entries[arxiv_id] = entry
+            self._save()
+            return dict(entry)
+
+    def _record_mtime(self, arxiv_id: str, path: str) -> None:
+        # The content was just verified; later lookups can trust the size again
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entries.get(arxiv_id)
+            if entry is not None:
+                entry['mtime'] = os.path.getmtime(path)
+                self._save()
+
+    def is_done(self, arxiv_id: str, stage: str, chunking: Optional[str] = None) -> bool:
+        entry = self.get(arxiv_id)
+        if not (entry and entry['stages'].get(stage)):
+            return False
+        # Entries from before fingerprints were recorded are taken to match
+        return chunking is None or entry.get('chunking', chunking) == chunking
+
+    def mark(self, arxiv_ids: Iterable[str], *stages: str, chunking: Optional[str] = None) -> None:
+        unknown = set(stages) - set(self.STAGES)
+        if unknown:
+            raise ValueError(f"Unknown manifest stages: {sorted(unknown)}")
+
+        with self._lock:
+            self._reload_if_changed()
+            changed = False
+            for arxiv_id in arxiv_ids:
+                entry = self._entries.get(arxiv_id)
+                if entry is None:
+                    path = self.pdf_path(arxiv_id)
+                    if not os.path.exists(path):
+                        logger.debug(f"Not recording stages for {arxiv_id}: no local PDF")
+                        continue
+                    self.record_download(arxiv_id, path)
+                    entry = self._entries[arxiv_id]
+                for stage in stages:
+                    if not entry['stages'].get(stage):
+                        entry['stages'][stage] = True
+                        changed = True
+                if chunking and entry.get('chunking') != chunking:
+                    entry['chunking'] = chunking
+                    changed = True
+            if changed:
+                self._save()
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f).get('papers', {})
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read paper manifest {self.path}: {str(e)}")
+
+    def _save(self) -> None:
+        os.makedirs(self.papers_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'papers': self._entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _looks_complete(path: str) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                if f.read(5) != b'%PDF-':
+                    return False
+                f.seek(max(0, os.path.getsize(path) - 1024))
+                return b'%%EOF' in f.read()
+        except OSError:
+            return False
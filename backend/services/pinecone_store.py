@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, List
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryResult
+from llama_index.vector_stores.pinecone import PineconeVectorStore
+
+from backend.utils.metrics import track_stage
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pinecone caps a delete request at 1000 ids
+DELETE_BATCH_SIZE = 1000
+
+
+class ThreadedPineconeVectorStore(PineconeVectorStore):
+    """PineconeVectorStore whose async methods run the blocking gRPC calls on a worker thread.
+
+    The base class falls back to calling the sync methods directly, which
+    would stall the event loop for the whole round trip.
+
+    `delete` removes a document's vectors by listing their ids instead of
+    deleting by metadata filter, which serverless indexes don't support. It
+    relies on node ids starting with `<ref_doc_id>:`, as DeterministicNodeIds
+    makes them.
+    """
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        with track_stage('vector_upsert') as stage:
+            ids = super().add(nodes, **add_kwargs)
+            stage.items = len(ids)
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        # Listing ids is paginated; collect them all before deleting, so deletes don't shift the pages
+        ids = [
+            vector_id
+            for page in self._pinecone_index.list(prefix=f"{ref_doc_id}:", namespace=self.namespace)
+            for vector_id in page
+        ]
+        if not ids:
+            logger.debug(f"No vectors to delete for {ref_doc_id}")
+            return
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            self._pinecone_index.delete(
+                ids=ids[start:start + DELETE_BATCH_SIZE], namespace=self.namespace, **delete_kwargs
+            )
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        return await asyncio.to_thread(self.query, query, **kwargs)
+
+    async def async_add(self, nodes: List[BaseNode], **kwargs: Any) -> List[str]:
+        return await asyncio.to_thread(self.add, nodes, **kwargs)
+
+    async def adelete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        await asyncio.to_thread(self.delete, ref_doc_id, **delete_kwargs)
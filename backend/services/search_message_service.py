@@ -1,24 +1,47 @@
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from uuid import UUID
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import UUID, uuid4
+
+from backend.services.history_cache import HistoryCache
+from backend.utils.pagination import Page, keyset_page, to_page
 import logging
 logger = logging.getLogger(__name__)
 
 class SearchMessageService:
-    def __init__(self, supabase_client):
+    def __init__(self, supabase_client, cache: Optional[HistoryCache] = None):
+        # An async supabase client (see utils.supabase_client.get_async_supabase)
         self.supabase = supabase_client
+        # Reads are served from here when present; writes invalidate their session's entries
+        self.cache = cache
         self.table_name = 'search_messages'
+        # "summary" leaves out the answer and sources, which are most of a row
+        self.column_sets = {
+            'summary': 'id,session_id,question,created_at',
+            'full': '*'
+        }
 
-    async def get_messages_by_session_id(self, session_id: UUID) -> List[Dict[str, Any]]:
-
+    async def list_messages_by_session_id(
+        self,
+        session_id: UUID,
+        limit: Optional[int] = 100,
+        cursor: Optional[str] = None,
+        fields: str = 'full'
+    ) -> Page:
+        """Oldest messages first, `limit` at a time; pass `next_cursor` back for the next page."""
+        key = ('messages', str(session_id), limit, cursor, fields)
+        cached, generation = self._from_cache(key, str(session_id))
+        if cached is not None:
+            return cached
         try:
-            response = self.supabase.table(self.table_name)\
-                .select('*')\
-                .eq('session_id', str(session_id))\
-                .order('created_at', desc=False)\
-                .execute()
-            
-            return response.data
+            query = self.supabase.table(self.table_name)\
+                .select(self.column_sets[fields])\
+                .eq('session_id', str(session_id))
+            response = await keyset_page(query, cursor, limit).execute()
+            page = to_page(response.data, limit)
+            self._to_cache(key, page, str(session_id), generation)
+            return page
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error fetching messages for session: {str(e)}")
 
@@ -31,28 +54,57 @@ class SearchMessageService:
     ) -> Dict[str, Any]:
 
         try:
-            message_data = {
-                'session_id': str(session_id),
-                'question': question,
-                'answer': answer,
-                'sources': sources or [],
-                'created_at': datetime.utcnow().isoformat()
-            }
+            message_data = self.message_row(session_id, question, answer, sources)
             
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .insert(message_data)\
                 .execute()
             
             logging.info(response)
             
+            self._invalidate(str(session_id))
             return response.data[0]
         except Exception as e:
             raise Exception(f"Error creating message: {str(e)}")
 
+    async def create_messages(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Stores rows built by `message_row` in one statement; they are all stored or none are.
+
+        Rows carry their own ids and are upserted on them, so repeating a
+        write whose response was lost doesn't store the messages twice.
+        """
+        if not rows:
+            return []
+        try:
+            response = await self.supabase.table(self.table_name)\
+                .upsert(rows, on_conflict='id')\
+                .execute()
+            
+            self._invalidate(*{row['session_id'] for row in rows})
+            return response.data
+        except Exception as e:
+            raise Exception(f"Error creating {len(rows)} messages: {str(e)}")
+
+    @staticmethod
+    def message_row(
+        session_id: str,
+        question: str,
+        answer: str,
+        sources: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return {
+            'id': str(uuid4()),
+            'session_id': str(session_id),
+            'question': question,
+            'answer': answer,
+            'sources': sources or [],
+            'created_at': datetime.utcnow().isoformat()
+        }
+
     async def get_message_by_id(self, message_id: UUID) -> Optional[Dict[str, Any]]:
 
         try:
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .select('*')\
                 .eq('id', str(message_id))\
                 .limit(1)\
@@ -79,11 +131,28 @@ class SearchMessageService:
             if not update_data:
                 raise ValueError("No update parameters provided")
 
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .update(update_data)\
                 .eq('id', str(message_id))\
                 .execute()
             
+            self._invalidate(response.data[0]['session_id'])
             return response.data[0]
         except Exception as e:
-            raise Exception(f"Error updating message: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error updating message: {str(e)}")
+
+    def _from_cache(self, key: tuple, session_id: str) -> Tuple[Optional[Any], Optional[int]]:
+        """The cached value, if any, and the generation to store a fresh read under."""
+        if self.cache is None:
+            return None, None
+        # Taken before the lookup, so a write that lands during the query keeps its result out
+        generation = self.cache.generation(session_id)
+        return self.cache.get(key), generation
+
+    def _to_cache(self, key: tuple, value: Any, session_id: str, generation: Optional[int]) -> None:
+        if self.cache is not None:
+            self.cache.set(key, value, session_id, generation)
+
+    def _invalidate(self, *session_ids: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(*session_ids)
\ No newline at end of file
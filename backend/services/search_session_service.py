@@ -1,34 +1,62 @@
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from uuid import UUID
 
+from backend.services.history_cache import ALL_SESSIONS, HistoryCache
+from backend.utils.pagination import Page, keyset_page, to_page
+
 class SearchSessionService:
-    def __init__(self, supabase_client):
+    def __init__(self, supabase_client, cache: Optional[HistoryCache] = None):
+        # An async supabase client (see utils.supabase_client.get_async_supabase)
         self.supabase = supabase_client
+        # Reads are served from here when present; writes invalidate what they touch
+        self.cache = cache
         self.table_name = 'search_sessions'
+        # "summary" is what the session list needs; "full" is every column
+        self.column_sets = {
+            'summary': 'id,title,created_at,updated_at',
+            'full': '*'
+        }
 
-    async def get_all_sessions(self) -> List[Dict[str, Any]]:
-
+    async def list_sessions(
+        self,
+        limit: Optional[int] = 50,
+        cursor: Optional[str] = None,
+        fields: str = 'full'
+    ) -> Page:
+        """Newest sessions first, `limit` at a time; pass `next_cursor` back for the next page."""
+        key = ('sessions', limit, cursor, fields)
+        cached, generation = self._from_cache(key, ALL_SESSIONS)
+        if cached is not None:
+            return cached
         try:
-            response = self.supabase.table(self.table_name)\
-                .select('*')\
-                .execute()
-            
-            # Return the data from the response
-            return response.data
+            query = self.supabase.table(self.table_name).select(self.column_sets[fields])
+            response = await keyset_page(query, cursor, limit, descending=True).execute()
+            page = to_page(response.data, limit)
+            self._to_cache(key, page, ALL_SESSIONS, generation)
+            return page
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error fetching search sessions: {str(e)}")
 
     async def get_session_by_id(self, session_id: UUID) -> Optional[Dict[str, Any]]:
 
+        key = ('session', str(session_id))
+        cached, generation = self._from_cache(key, str(session_id))
+        if cached is not None:
+            return cached
         try:
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .select('*')\
                 .eq('id', str(session_id))\
                 .limit(1)\
                 .execute()
             
-            return response.data[0] if response.data else None
+            if not response.data:
+                return None
+            self._to_cache(key, response.data[0], str(session_id), generation)
+            return response.data[0]
         except Exception as e:
             raise Exception(f"Error fetching search session by ID: {str(e)}")
 
@@ -42,10 +70,11 @@ class SearchSessionService:
                 'updated_at': current_time
             }
             
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .insert(session_data)\
                 .execute()
             
+            self._invalidate(ALL_SESSIONS)
             return response.data[0]
         except Exception as e:
             raise Exception(f"Error creating search session: {str(e)}")
@@ -54,12 +83,29 @@ class SearchSessionService:
 
         try:
           
-            response = self.supabase.table(self.table_name)\
+            response = await self.supabase.table(self.table_name)\
                 .update({'title': title})\
                 .eq('id', id)\
                 .execute()
             
+            self._invalidate(str(id), ALL_SESSIONS)
             return response
         except Exception as e:
             raise Exception(f"Error creating search session: {str(e)}")
+
+    def _from_cache(self, key: tuple, session_id: str) -> Tuple[Optional[Any], Optional[int]]:
+        """The cached value, if any, and the generation to store a fresh read under."""
+        if self.cache is None:
+            return None, None
+        # Taken before the lookup, so a write that lands during the query keeps its result out
+        generation = self.cache.generation(session_id)
+        return self.cache.get(key), generation
+
+    def _to_cache(self, key: tuple, value: Any, session_id: str, generation: Optional[int]) -> None:
+        if self.cache is not None:
+            self.cache.set(key, value, session_id, generation)
+
+    def _invalidate(self, *session_ids: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(*session_ids)
     
\ No newline at end of file
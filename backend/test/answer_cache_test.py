@@ -0,0 +1,61 @@
+from backend.services.answer_cache import SemanticAnswerCache, invalidate_answer_caches
+
+
+def answer(text):
+    return {'question': text, 'answer': text, 'sources': [], 'error': None}
+
+
+def test_similar_question_hits():
+    cache = SemanticAnswerCache("test-similar", similarity_threshold=0.95)
+    cache.store([1.0, 0.0, 0.0], answer("creatine"), latency=2.0)
+
+    hit = cache.lookup([0.99, 0.05, 0.0])
+    assert hit is not None
+    assert hit[0]['answer'] == "creatine"
+    assert hit[1] == 2.0
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_expired_entries_are_dropped():
+    cache = SemanticAnswerCache("test-ttl", ttl_seconds=0)
+    cache.store([1.0, 0.0], answer("protein"), latency=1.0)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_served_is_evicted():
+    cache = SemanticAnswerCache("test-lru", max_entries=2)
+    cache.store([1.0, 0.0, 0.0], answer("a"), latency=1.0)
+    cache.store([0.0, 1.0, 0.0], answer("b"), latency=1.0)
+    assert cache.lookup([1.0, 0.0, 0.0]) is not None
+    cache.store([0.0, 0.0, 1.0], answer("c"), latency=1.0)
+
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0])[0]['answer'] == "a"
+    assert cache.lookup([0.0, 0.0, 1.0])[0]['answer'] == "c"
+
+
+def test_ingestion_invalidates_caches_for_the_same_index():
+    cache = SemanticAnswerCache("test-invalidate")
+    other = SemanticAnswerCache("test-other")
+    cache.store([1.0, 0.0], answer("sleep"), latency=1.0)
+    other.store([1.0, 0.0], answer("sleep"), latency=1.0)
+
+    invalidate_answer_caches("test-invalidate")
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert other.lookup([1.0, 0.0]) is not None
+
+
+def test_answer_started_before_invalidation_is_not_stored():
+    cache = SemanticAnswerCache("test-generation", similarity_threshold=0.9)
+    generation = cache.generation
+    # Ingestion lands while the answer is still being generated
+    cache.invalidate()
+    cache.store([1.0, 0.0], answer("stale"), latency=1.0, generation=generation)
+    assert cache.lookup([1.0, 0.0]) is None
+
+    cache.store([1.0, 0.0], answer("fresh"), latency=1.0, generation=cache.generation)
+    assert cache.lookup([1.0, 0.0])[0]['answer'] == "fresh"
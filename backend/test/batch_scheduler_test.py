@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from backend.services import batch_scheduler
+from backend.services.batch_scheduler import RateLimitedBatchScheduler, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the `time` module; sleeping advances the clock instead of blocking."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(0.0, seconds)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(batch_scheduler, "time", clock)
+    # No jitter: every backoff is exactly its nominal delay
+    monkeypatch.setattr(batch_scheduler.random, "random", lambda: 0.5)
+    return clock
+
+
+def test_rate_limited_batch_is_retried_with_backoff(clock):
+    scheduler = RateLimitedBatchScheduler(max_concurrency=1, base_backoff=1.0)
+    attempts = []
+
+    def process(batch):
+        attempts.append(clock.monotonic())
+        if len(attempts) == 1:
+            raise RateLimitError("slow down")
+
+    report = scheduler.run(["b1"], process, cost=lambda batch: (1, 10))
+
+    assert report.succeeded == ["b1"]
+    assert (report.retries, report.rate_limited) == (1, 1)
+    # Rate limits back off twice as long as other errors
+    assert attempts[1] - attempts[0] >= 2.0
+    assert scheduler.request_bucket.rate < scheduler.request_bucket.max_rate
+
+
+def test_batch_that_keeps_failing_is_reported_after_max_retries(clock):
+    scheduler = RateLimitedBatchScheduler(max_concurrency=2, max_retries=2, base_backoff=0.5)
+    attempts = {"bad": 0, "good": 0}
+
+    def process(batch):
+        attempts[batch] += 1
+        if batch == "bad":
+            raise ValueError("malformed input")
+
+    report = scheduler.run(["bad", "good"], process, cost=lambda batch: (1, 10))
+
+    assert attempts == {"bad": 3, "good": 1}
+    assert report.succeeded == ["good"]
+    assert [(batch, str(error)) for batch, error in report.failed] == [("bad", "malformed input")]
+    assert report.retries == 2
+
+
+def test_request_budget_limits_how_fast_batches_start(clock):
+    scheduler = RateLimitedBatchScheduler(max_concurrency=1, requests_per_minute=6)
+    started = []
+
+    report = scheduler.run(range(8), lambda batch: started.append(clock.monotonic()), cost=lambda batch: (1, 1))
+
+    assert len(report.succeeded) == 8
+    # A full bucket covers a minute's worth of requests, then one refills every 10 seconds
+    assert started[:6] == [0.0] * 6
+    assert started[6:] == pytest.approx([10.0, 20.0])
+
+
+def test_throttled_bucket_refills_slower_then_recovers(clock):
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.throttle(factor=0.5)
+
+    assert bucket.acquire(1) == pytest.approx(2.0)
+    for _ in range(20):
+        bucket.recover(step_fraction=0.05)
+    assert bucket.rate == bucket.max_rate
+    assert bucket.acquire(1) == pytest.approx(1.0)
@@ -0,0 +1,112 @@
+"""Compares the chunking strategies on the same corpus.
+
+Run from the repository root:
+
+    python -m backend.test.chunking_report --papers 5 --output chunking.json
+
+Every strategy in `backend.services.chunking` ingests the same fixture
+PDFs into a fresh local index, using the stand-ins from
+`backend.test.pipeline_benchmark`. For each one the report gives:
+
+- embedding requests and texts sent during ingestion, split points
+  included, which is what the provider bills;
+- ingestion wall time and the time spent in the split stage;
+- retrieval hit rate: the share of questions, each a sentence taken from
+  one page, whose top-k results include a node from that page.
+
+The hashed embedding only captures shared words, so hit rates rank the
+strategies against each other rather than predict real retrieval quality.
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.node_parser.text.utils import split_by_sentence_tokenizer
+from llama_index.core.retrievers import VectorIndexRetriever
+
+from backend.services.chunking import CHUNKING_STRATEGIES
+from backend.services.document_service import parse_and_clean_pdf
+from backend.test.pipeline_benchmark import (
+    FIXTURES_DIR, build_config, build_parser, build_services, git_commit, stage_deltas
+)
+from backend.utils.metrics import STAGE_SECONDS
+
+
+def sample_questions(papers: int, count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """(question, source document id) pairs drawn from the pages the benchmark ingests."""
+    splitter = split_by_sentence_tokenizer()
+    candidates = []
+    names = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith(".pdf"))[:papers]
+    for name in names:
+        parsed = parse_and_clean_pdf(os.path.join(FIXTURES_DIR, name))
+        for idx, doc in parsed.documents:
+            for sentence in splitter(doc.text):
+                words = sentence.split()
+                if len(words) >= 10:
+                    candidates.append((" ".join(words[:20]), f"arxiv:{Path(name).stem}#{idx}"))
+    random.Random(seed).shuffle(candidates)
+    return candidates[:count]
+
+
+def evaluate(strategy: str, args, questions: List[Tuple[str, str]]) -> Dict[str, Any]:
+    args.chunking_strategy = strategy
+    with tempfile.TemporaryDirectory(prefix="chunking-") as workdir:
+        config = build_config(workdir, args)
+        embedding_service, _, document_service = build_services(config, args)
+        embedding_model = embedding_service.embedding_model
+
+        before = STAGE_SECONDS.totals()
+        start = time.perf_counter()
+        result = document_service.process_and_embed_papers("chunking report")
+        elapsed = time.perf_counter() - start
+        document_service.downloader.close()
+        if result.get('status') != "success":
+            raise RuntimeError(f"Ingestion with {strategy} chunking failed: {result}")
+        requests, texts = embedding_model.requests, embedding_model.texts
+        stages = stage_deltas(before)
+
+        index = VectorStoreIndex.from_vector_store(embedding_service.vector_store, embed_model=embedding_model)
+        retriever = VectorIndexRetriever(index=index, similarity_top_k=args.top_k)
+        hits = 0
+        for question, doc_id in questions:
+            if any(result.node.ref_doc_id == doc_id for result in retriever.retrieve(question)):
+                hits += 1
+
+        nodes = embedding_service.vector_store.get_nodes()
+        return {
+            'nodes': len(nodes),
+            'mean_node_chars': round(sum(len(node.get_content()) for node in nodes) / max(1, len(nodes)), 1),
+            'embed_requests': requests,
+            'embed_texts': texts,
+            'seconds': round(elapsed, 3),
+            'split_seconds': stages.get(f"{strategy}_split", {}).get('seconds', 0.0),
+            'hit_rate': round(hits / max(1, len(questions)), 3)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = build_parser(__doc__.splitlines()[0])
+    parser.add_argument("--strategies", nargs="+", choices=CHUNKING_STRATEGIES, default=list(CHUNKING_STRATEGIES))
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.set_defaults(questions=100)
+    args = parser.parse_args(argv)
+
+    questions = sample_questions(args.papers, args.questions)
+    strategies = {strategy: evaluate(strategy, args, questions) for strategy in args.strategies}
+    settings = {**vars(args), 'chunking_strategy': None}
+    results = {'commit': git_commit(), 'settings': settings, 'questions': len(questions), 'strategies': strategies}
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
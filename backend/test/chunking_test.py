@@ -0,0 +1,53 @@
+import pytest
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+
+from backend.services.base_service import ServiceConfig
+from backend.services.chunking import SentenceWindowSplitter, TopicShiftSplitter, create_splitter
+
+
+def split_sentences(text):
+    return [f"{sentence}. " for sentence in text.split(". ") if sentence]
+
+
+def test_sentence_windows_overlap():
+    splitter = SentenceWindowSplitter(window_size=3, window_overlap=1, sentence_splitter=split_sentences)
+    text = ". ".join(f"Sentence {i}" for i in range(7))
+
+    nodes = splitter.get_nodes_from_documents([Document(text=text)])
+
+    windows = [node.get_content().split(". ")[0] for node in nodes]
+    assert windows == ["Sentence 0", "Sentence 2", "Sentence 4"]
+    assert "Sentence 6" in nodes[-1].get_content()
+
+
+class CountingSplitter(SentenceSplitter):
+    calls: int = 0
+
+    def _parse_nodes(self, nodes, show_progress=False, **kwargs):
+        self.calls += len(nodes)
+        return super()._parse_nodes(nodes, show_progress, **kwargs)
+
+
+def test_topic_shift_sends_only_shifting_documents_to_the_semantic_splitter():
+    semantic, fallback = CountingSplitter(), CountingSplitter()
+    splitter = TopicShiftSplitter(
+        semantic=semantic, fallback=fallback, probe_sentences=2, sentence_splitter=split_sentences
+    )
+    steady = "Graph neural networks learn graph structure. Graph neural networks scale to large graph data. " * 3
+    shifting = (
+        "Graph neural networks learn graph structure. Graph neural networks scale to large graph data. "
+        "Protein folding depends on amino acid chemistry. Folding simulations predict protein shapes. "
+    )
+
+    assert not splitter.has_topic_shift(steady)
+    assert splitter.has_topic_shift(shifting)
+
+    splitter.get_nodes_from_documents([Document(text=steady), Document(text=shifting)])
+    assert (semantic.calls, fallback.calls) == (1, 1)
+
+
+def test_unknown_strategy_is_rejected():
+    config = ServiceConfig(openai_api_key="", pinecone_api_key="", index_name="test", chunking_strategy="paragraph")
+    with pytest.raises(ValueError, match="paragraph"):
+        create_splitter(config, embed_model=None)
@@ -0,0 +1,41 @@
+"""Micro-benchmark for page cleaning.
+
+Run from the repository root:
+
+    python -m backend.test.clean_up_text_benchmark --repeat 10
+"""
+import argparse
+import time
+
+from backend.test.clean_up_text_test import legacy_clean_up_text, load_paper_pages
+from backend.utils.text_normalizer import normalize_text
+
+
+def time_cleaner(cleaner, pages: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            cleaner(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and fused page cleaning")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_paper_pages()
+    total_chars = sum(len(page) for page in pages)
+    print(f"{len(pages)} pages, {total_chars} characters, best of {args.repeat}")
+
+    legacy = time_cleaner(legacy_clean_up_text, pages, args.repeat)
+    fused = time_cleaner(normalize_text, pages, args.repeat)
+    for name, elapsed in (("legacy", legacy), ("normalize_text", fused)):
+        print(f"{name:>15}: {elapsed * 1000:8.2f} ms  {total_chars / elapsed / 1e6:6.1f} Mchar/s")
+    print(f"{'speedup':>15}: {legacy / fused:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
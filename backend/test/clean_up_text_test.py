@@ -0,0 +1,83 @@
+import re
+import random
+from pathlib import Path
+
+import pytest
+
+from backend.utils.text_normalizer import normalize_text
+
+PAPERS_DIR = Path(__file__).resolve().parent.parent / "papers"
+
+
+def legacy_clean_up_text(content: str) -> str:
+    # Reference copy of the original DocumentService.clean_up_text chain
+    content = content.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+    content = re.sub(r'(\w+)-\n(\w+)', r'\1\2', content)
+    unwanted_patterns = [
+        r"\\n",
+        r"\s*—\s*",
+        r"—{3,}",
+        r"\\u[\dA-Fa-f]{4}",
+        r"[\uf075\uf0b7]",
+        r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]",
+        r"[^\x00-\x7F]+",
+    ]
+    for pattern in unwanted_patterns:
+        content = re.sub(pattern, " ", content)
+    content = re.sub(r'(\w)\s*-\s*(\w)', r'\1-\2', content)
+    content = re.sub(r'\s+', ' ', content)
+    content = ''.join(char for char in content if ord(char) < 0x10000)
+    return content.strip()
+
+
+def load_paper_pages() -> list:
+    pypdf = pytest.importorskip("pypdf")
+    pages = []
+    for pdf_path in sorted(PAPERS_DIR.glob("*.pdf")):
+        pages.extend(page.extract_text() for page in pypdf.PdfReader(pdf_path).pages)
+    return pages
+
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "hyphen-\nated word",
+    "a-\nb-\nc",
+    "x-\n-\ny",
+    "long-\n\nbreak",
+    "em — dash and —— runs ——— here",
+    "literal \\n escapes and \\u00e9 unicode \\u12G4 escapes",
+    "\\\\n and \\\\u1234",
+    "bullets \uf075 and \uf0b7 glyphs",
+    "control\x00\x07\x0b\x0c\x1c\x7fchars",
+    "caf\u00e9 na\u00efve \u00a0nbsp\u2003em-space",
+    "lone \ud800 surrogate and pair \ud835\udc00 and astral \U0001d400-\nx",
+    "\ufeffbyte order mark",
+    "a - b - c - d",
+    "a -b- c",
+    "x - y-z - w",
+    "digits \\u\u0663\u0663\u0663\u0663 arabic",
+    "trailing -",
+    "- leading",
+]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_matches_legacy_on_edge_cases(text):
+    assert normalize_text(text) == legacy_clean_up_text(text)
+
+
+def test_matches_legacy_on_random_text():
+    alphabet = list("ab1_ .,-\n\t\r\\unAF09—\uf075\uf0b7\x00\x0b\x1c\x7f\u00e9\u00a0\u2003\ud800\U0001d400\u0663")
+    alphabet += ["-\n", " - ", "\ud835\udc00"]
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+        assert normalize_text(text) == legacy_clean_up_text(text), repr(text)
+
+
+def test_matches_legacy_on_paper_corpus():
+    pages = load_paper_pages()
+    assert pages, "no PDFs found in backend/papers"
+    for page in pages:
+        assert normalize_text(page) == legacy_clean_up_text(page)
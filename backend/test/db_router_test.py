@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+
+from backend.services.container import (
+    get_message_write_buffer, get_search_message_service, get_search_session_service
+)
+from backend.services.history_cache import HistoryCache
+from backend.services.search_message_service import SearchMessageService
+from backend.services.search_session_service import SearchSessionService
+from backend.test.fakes import FakeSupabase
+
+
+async def with_client(run):
+    from backend.main import app
+
+    supabase = FakeSupabase()
+    cache = HistoryCache()
+    app.dependency_overrides.update({
+        get_search_session_service: lambda: SearchSessionService(supabase, cache),
+        get_search_message_service: lambda: SearchMessageService(supabase, cache),
+        get_message_write_buffer: lambda: None
+    })
+    try:
+        # No lifespan, so the app doesn't build the real services
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run(client)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_session_history_is_paged():
+    async def run(client):
+        session = (await client.post("/api/db/sessions", json={"title": "Sleep"})).json()
+        for i in range(5):
+            response = await client.post("/api/db/messages", json={
+                "session_id": session['id'], "question": f"q{i}", "answer": "a", "sources": []
+            })
+            response.raise_for_status()
+
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = await client.get(f"/api/db/sessions/{session['id']}/history", params=params)
+            response.raise_for_status()
+            assert response.json()['session']['title'] == "Sleep"
+            pages.append([message['question'] for message in response.json()['messages']])
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+
+        bad_cursor = await client.get(f"/api/db/sessions/{session['id']}/history", params={"cursor": "garbage"})
+        return pages, bad_cursor.status_code
+
+    pages, bad_cursor_status = asyncio.run(with_client(run))
+    assert pages == [["q0", "q1"], ["q2", "q3"], ["q4"]]
+    assert bad_cursor_status == 400
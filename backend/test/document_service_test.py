@@ -0,0 +1,37 @@
+import os
+from types import SimpleNamespace
+
+from backend.services.document_service import DocumentService
+from backend.services.paper_manifest import PaperManifest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "..", "papers")
+FIXTURE_IDS = ["2501.00235v1", "2412.21205v1"]
+
+
+def make_document_service(workdir) -> DocumentService:
+    # Parsing only reads the papers directory and the manifest off the embedding service
+    embedding_service = SimpleNamespace(
+        config=SimpleNamespace(papers_dir=workdir, parse_workers=0),
+        manifest=PaperManifest(workdir)
+    )
+    return DocumentService(embedding_service)
+
+
+def fixture_papers():
+    return [
+        {'arxiv_id': arxiv_id, 'title': f"Paper {arxiv_id}", 'local_path': os.path.join(FIXTURES_DIR, f"{arxiv_id}.pdf")}
+        for arxiv_id in FIXTURE_IDS
+    ]
+
+
+def test_pool_parsing_matches_parsing_in_thread(tmp_path):
+    service = make_document_service(str(tmp_path))
+
+    in_thread = service.load_and_clean_documents(fixture_papers(), skip_completed=False, workers=0)
+    in_pool = service.load_and_clean_documents(fixture_papers(), skip_completed=False, workers=2)
+
+    assert in_thread
+    assert {doc.metadata['arxiv_id'] for doc in in_thread} == set(FIXTURE_IDS)
+    assert [(doc.id_, doc.text, doc.metadata) for doc in in_pool] == [
+        (doc.id_, doc.text, doc.metadata) for doc in in_thread
+    ]
@@ -0,0 +1,100 @@
+import pytest
+from llama_index.core.schema import TextNode
+
+from backend.services.batch_scheduler import is_request_too_large_error
+from backend.services.embedding_batcher import TokenPackedEmbedding, pack_requests
+from backend.test.fakes import HashEmbedding
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class AuthenticationError(Exception):
+    status_code = 401
+
+
+class LimitedEmbedding(HashEmbedding):
+    """Rejects any request with more than `max_inputs` inputs, like a provider's token limit."""
+
+    max_inputs: int = 2
+
+    def _reject(self):
+        raise ValueError("maximum context length exceeded")
+
+    def _get_text_embeddings(self, texts):
+        if len(texts) > self.max_inputs:
+            self._count(0)
+            self._reject()
+        return super()._get_text_embeddings(texts)
+
+
+class RateLimitedEmbedding(LimitedEmbedding):
+
+    def _reject(self):
+        raise RateLimitError("rate limit reached")
+
+
+class UnauthorizedEmbedding(LimitedEmbedding):
+
+    def _reject(self):
+        # Mentions tokens, but the status says the request itself isn't the problem
+        raise AuthenticationError("Incorrect API key provided: sk-test. You can find your API key at ...tokens")
+
+
+def test_pack_requests_respects_token_and_input_limits():
+    assert pack_requests([40, 40, 40, 10, 200, 5], max_tokens=100, max_inputs=10) == [[0, 1], [2, 3], [4], [5]]
+    assert pack_requests([1] * 5, max_tokens=100, max_inputs=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_vectors_map_back_to_their_nodes():
+    model = HashEmbedding()
+    nodes = [TextNode(text=f"passage about topic {i}") for i in range(7)]
+    packed = TokenPackedEmbedding(model, max_tokens=15, max_concurrency=3)
+
+    packed(nodes)
+
+    assert [node.embedding for node in nodes] == [model._embed(node.get_content()) for node in nodes]
+    assert model.requests == 4
+
+
+def test_rejected_requests_are_split_in_half():
+    model = LimitedEmbedding(max_inputs=2)
+    nodes = [TextNode(text=f"passage {i}") for i in range(5)]
+
+    TokenPackedEmbedding(model)(nodes)
+
+    assert all(node.embedding is not None for node in nodes)
+    assert model.texts == 5
+
+
+def test_rate_limits_are_left_to_the_scheduler():
+    model = RateLimitedEmbedding(max_inputs=2)
+    nodes = [TextNode(text=f"passage {i}") for i in range(5)]
+
+    with pytest.raises(RateLimitError):
+        TokenPackedEmbedding(model)(nodes)
+    assert model.requests == 1
+
+
+def test_only_requests_that_are_too_large_are_split():
+    model = UnauthorizedEmbedding(max_inputs=2)
+    nodes = [TextNode(text=f"passage {i}") for i in range(5)]
+
+    with pytest.raises(AuthenticationError):
+        TokenPackedEmbedding(model)(nodes)
+    assert model.requests == 1
+
+
+def test_request_too_large_errors_are_recognized():
+    class BadRequestError(Exception):
+        status_code = 400
+
+    too_large = BadRequestError("This model's maximum context length is 8192 tokens, however you requested 9000 tokens")
+    assert is_request_too_large_error(too_large)
+    try:
+        raise RuntimeError("Embedding failed") from too_large
+    except RuntimeError as wrapped:
+        assert is_request_too_large_error(wrapped)
+    assert not is_request_too_large_error(BadRequestError("'$.input' is invalid. Please check the API reference"))
+    assert not is_request_too_large_error(ValueError("Unknown model: text-embedding-4"))
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from backend.services import embedding_cache
+from backend.services.embedding_cache import CachedEmbedding, EmbeddingCacheStore
+from backend.test.fakes import HashEmbedding
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(embedding_cache, "time", clock)
+    return clock
+
+
+def vector(value):
+    # 4 float64 values, 32 bytes stored
+    return [value, value / 3, -value, 0.1]
+
+
+def stored_access_times(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT key, last_access FROM embeddings"))
+
+
+def test_store_round_trip_and_persistence(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    store = EmbeddingCacheStore(path, max_bytes=1024)
+    store.put_many({"a": vector(1.0), "b": vector(2.0)})
+
+    assert store.get_many(["a", "b", "c"]) == {"a": vector(1.0), "b": vector(2.0)}
+    assert store.stats()['hit_rate'] == pytest.approx(2 / 3)
+
+    reopened = EmbeddingCacheStore(path, max_bytes=1024)
+    assert reopened.get_many(["b"]) == {"b": vector(2.0)}
+    assert reopened.stats()['size_bytes'] == 64
+
+
+def test_hits_write_access_times_in_batches(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    store = EmbeddingCacheStore(path, max_bytes=1024, access_flush_interval=30)
+    store.put_many({"a": vector(1.0), "b": vector(2.0)})
+
+    clock.now += 10
+    store.get_many(["a"])
+    assert stored_access_times(path) == {"a": 1000.0, "b": 1000.0}
+
+    clock.now += 30
+    store.get_many(["b"])
+    assert stored_access_times(path) == {"a": 1010.0, "b": 1040.0}
+
+    clock.now += 1
+    store.get_many(["a"])
+    store.flush()
+    assert stored_access_times(path)["a"] == 1041.0
+
+
+def test_least_recently_read_entries_are_evicted_first(tmp_path, clock):
+    store = EmbeddingCacheStore(str(tmp_path / "cache.sqlite3"), max_bytes=100, low_watermark=0.9)
+    for key in "abc":
+        clock.now += 1
+        store.put_many({key: vector(1.0)})
+
+    # Only noted in memory, but written before the eviction below
+    clock.now += 1
+    store.get_many(["a"])
+    clock.now += 1
+    store.put_many({"d": vector(1.0)})
+
+    assert sorted(store.get_many(["a", "b", "c", "d"])) == ["a", "d"]
+    assert store.stats()['size_bytes'] == 64
+
+
+def test_cached_embedding_only_sends_each_new_text_once(tmp_path, clock):
+    model = HashEmbedding()
+    cached = CachedEmbedding(model, EmbeddingCacheStore(str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20))
+
+    first = cached.get_text_embedding_batch(["creatine", "sleep", "creatine"])
+    assert model.texts == 2
+    assert first[0] == first[2] == model.get_text_embedding("creatine")
+
+    model.texts = 0
+    assert cached.get_text_embedding_batch(["sleep", "creatine"]) == [first[1], first[0]]
+    assert model.texts == 0
+
+    # Queries are keyed apart from documents
+    cached.get_query_embedding("sleep")
+    assert model.texts == 1
+    assert cached.stats()['hits'] == 2
@@ -0,0 +1,132 @@
+import os
+
+from llama_index.core import Document
+
+from backend.services.base_service import ServiceConfig
+from backend.services.embedding_service import EmbeddingService
+from backend.test.fakes import HashEmbedding
+
+TEXT = " ".join(
+    f"Sentence {i} describes graph neural networks and their training on large citation datasets."
+    for i in range(40)
+)
+
+
+class FlakyEmbedding(HashEmbedding):
+    """Fails every request until `failures` runs out."""
+
+    failures: int = 1
+
+    def _get_text_embeddings(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("embedding API unavailable")
+        return super()._get_text_embeddings(texts)
+
+
+class LocalEmbeddingService(EmbeddingService):
+    def __init__(self, config, embedding_model=None):
+        self._embedding_model = embedding_model or HashEmbedding()
+        super().__init__(config)
+
+    def _create_embedding_model(self):
+        return self._embedding_model
+
+
+def make_service(workdir, embedding_model=None, **overrides) -> EmbeddingService:
+    config = ServiceConfig(
+        openai_api_key="",
+        pinecone_api_key="",
+        index_name="test",
+        vector_store="local",
+        local_index_dir=os.path.join(workdir, "vector_index"),
+        papers_dir=os.path.join(workdir, "papers"),
+        lexical_index_path=None,
+        docstore_path=os.path.join(workdir, "docstore.json"),
+        embedding_cache_path=None,
+        **overrides
+    )
+    os.makedirs(config.papers_dir, exist_ok=True)
+    # The manifest only records stages for papers with a local PDF
+    with open(os.path.join(config.papers_dir, "2401.00001v1.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 test %%EOF")
+    return LocalEmbeddingService(config, embedding_model)
+
+
+def make_documents(*texts):
+    return [
+        Document(text=text, id_=f"arxiv:2401.00001v1#{i}", metadata={'arxiv_id': "2401.00001v1", 'segment_id': i})
+        for i, text in enumerate(texts)
+    ]
+
+
+def stored_rows(service):
+    # Replaced vectors stay in the index file as dead rows until it is compacted, so this counts every write
+    return service.vector_store.client.stats()['rows']
+
+
+def test_rerunning_the_same_documents_adds_no_vectors(tmp_path):
+    workdir = str(tmp_path)
+    service = make_service(workdir, chunking_strategy="token", chunk_size=128, chunk_overlap=0)
+    service.run_pipeline(make_documents(TEXT, TEXT.upper()), skip_completed=False)
+    node_ids = sorted(node.node_id for node in service.vector_store.get_nodes())
+    rows = stored_rows(service)
+
+    again = make_service(workdir, chunking_strategy="token", chunk_size=128, chunk_overlap=0)
+    again.run_pipeline(make_documents(TEXT, TEXT.upper()), skip_completed=False)
+
+    assert sorted(node.node_id for node in again.vector_store.get_nodes()) == node_ids
+    assert stored_rows(again) == rows
+    assert again.embedding_model.texts == 0
+
+
+def test_a_changed_segment_replaces_its_old_vectors(tmp_path):
+    workdir = str(tmp_path)
+    service = make_service(workdir, chunking_strategy="token", chunk_size=128, chunk_overlap=0)
+    service.run_pipeline(make_documents(TEXT, "Sleep deprivation impairs memory consolidation."), skip_completed=False)
+    old_ids = {node.node_id for node in service.vector_store.get_nodes()}
+
+    changed = "Creatine supplementation improves short term memory in vegetarians."
+    service.run_pipeline(make_documents(TEXT, changed), skip_completed=False)
+
+    nodes = service.vector_store.get_nodes()
+    segment = [node for node in nodes if node.ref_doc_id == "arxiv:2401.00001v1#1"]
+    assert [node.get_content() for node in segment] == [changed]
+    assert segment[0].node_id not in old_ids
+    # The unchanged segment keeps its nodes
+    assert {node.node_id for node in nodes if node.ref_doc_id == "arxiv:2401.00001v1#0"} <= old_ids
+
+
+def test_a_failed_batch_is_not_skipped_on_retry(tmp_path):
+    workdir = str(tmp_path)
+    service = make_service(
+        workdir, embedding_model=FlakyEmbedding(), chunking_strategy="token", chunk_size=128, max_batch_retries=0
+    )
+    service.run_pipeline(make_documents(TEXT), skip_completed=False)
+
+    assert service.docstore.get_document_hash("arxiv:2401.00001v1#0") is None
+    assert service.vector_store.get_nodes() == []
+    assert not service.is_ingested("2401.00001v1")
+
+    service.run_pipeline(make_documents(TEXT))
+    assert service.docstore.get_document_hash("arxiv:2401.00001v1#0") is not None
+    assert service.vector_store.get_nodes()
+    assert service.is_ingested("2401.00001v1")
+
+
+def test_changing_the_chunking_strategy_rechunks_ingested_papers(tmp_path):
+    workdir = str(tmp_path)
+    token = make_service(workdir, chunking_strategy="token", chunk_size=128, chunk_overlap=0)
+    assert token.run_pipeline(make_documents(TEXT)) == 1
+    assert token.is_ingested("2401.00001v1")
+
+    windows = make_service(workdir, chunking_strategy="sentence_window", sentence_window_size=4)
+    assert not windows.is_ingested("2401.00001v1")
+    assert windows.run_pipeline(make_documents(TEXT)) == 1
+
+    nodes = windows.vector_store.get_nodes()
+    assert {node.metadata['chunking'] for node in nodes} == {windows.chunking}
+    # 40 sentences in windows of 4 that overlap by 2
+    assert len(nodes) == 19
+    # The fingerprint is bookkeeping, not content
+    assert 'chunking' not in nodes[0].get_content(metadata_mode="embed")
@@ -0,0 +1,361 @@
+"""Deterministic local stand-ins for OpenAI, arXiv and Supabase.
+
+They let the services run end to end without keys or network access, for
+benchmarks and tests. Each can add a fixed latency per call, to mimic a
+round trip to the real service.
+"""
+import asyncio
+import copy
+import hashlib
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+from backend.services.paper_downloader import PaperDownloader
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashEmbedding(BaseEmbedding):
+    """Bag-of-words vectors hashed into `dim` buckets.
+
+    Texts sharing words get similar vectors, so retrieval still returns
+    related passages. `latency` seconds are spent once per batch, like one
+    API request; `requests` and `texts` count what the real API would bill.
+    """
+
+    dim: int = 256
+    latency: float = 0.0
+    requests: int = 0
+    texts: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _count(self, texts: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.texts += texts
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in _WORD.findall(text.lower()):
+            bucket = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+            vector[bucket % self.dim] += 1.0 if bucket & 1 << 31 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self._count(1)
+        time.sleep(self.latency)
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        self._count(1)
+        await asyncio.sleep(self.latency)
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+
+class EchoLLM(CustomLLM):
+    """Answers with a fixed-length summary of its prompt after `latency` seconds.
+
+    Streaming yields the answer word by word, `token_latency` seconds apart.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_words: int = 60
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="echo", is_chat_model=True)
+
+    def _answer(self, prompt: str) -> str:
+        words = _WORD.findall(prompt.lower())
+        digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+        body = " ".join(words[-self.answer_words:]) if words else "no context"
+        return f"[{digest}] {body}"
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(self.latency)
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        time.sleep(self.latency)
+        text = ""
+        for word in self._answer(prompt).split(" "):
+            time.sleep(self.token_latency)
+            delta = word if not text else f" {word}"
+            text += delta
+            yield CompletionResponse(text=text, delta=delta)
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        await asyncio.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content=self._answer(self.messages_to_prompt(messages))))
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any):
+        answer = self._answer(self.messages_to_prompt(messages))
+
+        async def gen():
+            await asyncio.sleep(self.latency)
+            text = ""
+            for word in answer.split(" "):
+                await asyncio.sleep(self.token_latency)
+                delta = word if not text else f" {word}"
+                text += delta
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=delta)
+
+        return gen()
+
+
+@dataclass
+class _Author:
+    name: str
+
+
+@dataclass
+class FakeArxivResult:
+    arxiv_id: str
+    title: str
+    summary: str
+    pdf_url: str
+    published: datetime
+    authors: List[_Author] = field(default_factory=list)
+
+    def get_short_id(self) -> str:
+        return self.arxiv_id
+
+
+class FakeArxivClient:
+    """Serves the PDFs in a local directory as search results, in file name order.
+
+    `pdf_url` is the local path; pair it with `LocalPaperDownloader`.
+    """
+
+    def __init__(self, fixtures_dir: str, latency: float = 0.0):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+
+    def results(self, search) -> Iterator[FakeArxivResult]:
+        time.sleep(self.latency)
+        names = sorted(name for name in os.listdir(self.fixtures_dir) if name.endswith(".pdf"))
+        for name in names[:search.max_results]:
+            arxiv_id = name[:-len(".pdf")]
+            yield FakeArxivResult(
+                arxiv_id=arxiv_id,
+                title=f"Fixture paper {arxiv_id}",
+                summary=f"Local copy of arXiv paper {arxiv_id}.",
+                pdf_url=os.path.join(self.fixtures_dir, name),
+                published=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                authors=[_Author("Fixture Author")]
+            )
+
+
+class LocalPaperDownloader(PaperDownloader):
+    """Copies `pdf_url` from the local filesystem instead of fetching it."""
+
+    def __init__(self, latency: float = 0.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def _download_once(self, url: str, filename: str) -> str:
+        time.sleep(self.latency)
+        shutil.copyfile(url, filename)
+        return filename
+
+
+class FakeSupabase:
+    """In-memory async supabase client covering the query builder calls the services make.
+
+    Supports select, insert, upsert, update, eq, order, limit and the or_ filters
+    that keyset pagination builds. Exceptions queued in `errors` fail the next
+    requests, one each, and `reject` can fail any write holding a given row,
+    the way a constraint violation would.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        reject: Optional[Callable[[Dict[str, Any]], Optional[BaseException]]] = None
+    ):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.requests = 0
+        self.errors: List[BaseException] = []
+        self.reject = reject
+
+    def table(self, name: str) -> "_FakeQuery":
+        return _FakeQuery(self, name)
+
+
+class _FakeQuery:
+
+    def __init__(self, client: FakeSupabase, table: str):
+        self._client = client
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._filters: List[Any] = []
+        self._order: List[Any] = []
+        self._limit: Optional[int] = None
+        self._conflict = "id"
+
+    def select(self, columns: str = "*") -> "_FakeQuery":
+        self._action, self._columns = "select", columns
+        return self
+
+    def insert(self, rows: Any) -> "_FakeQuery":
+        self._action, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "id") -> "_FakeQuery":
+        self._action, self._payload, self._conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_FakeQuery":
+        self._action, self._payload = "update", values
+        return self
+
+    def eq(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(("eq", column, str(value)))
+        return self
+
+    def or_(self, filters: str) -> "_FakeQuery":
+        self._filters.append(("or", _parse_or(filters)))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_FakeQuery":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "_FakeQuery":
+        self._limit = count
+        return self
+
+    async def execute(self) -> SimpleNamespace:
+        await asyncio.sleep(self._client.latency)
+        self._client.requests += 1
+        if self._client.errors:
+            raise self._client.errors.pop(0)
+        if self._client.reject is not None and self._action in ("insert", "upsert"):
+            for row in self._payload if isinstance(self._payload, list) else [self._payload]:
+                error = self._client.reject(row)
+                if error is not None:
+                    raise error
+        rows = self._client.tables[self._table]
+
+        if self._action == "insert":
+            inserted = []
+            for row in self._payload if isinstance(self._payload, list) else [self._payload]:
+                row = {'id': str(uuid.uuid4()), **copy.deepcopy(row)}
+                rows.append(row)
+                inserted.append(copy.deepcopy(row))
+            return SimpleNamespace(data=inserted)
+
+        if self._action == "upsert":
+            stored = []
+            for row in self._payload if isinstance(self._payload, list) else [self._payload]:
+                existing = next((r for r in rows if r.get(self._conflict) == row.get(self._conflict)), None)
+                if existing is None:
+                    existing = {'id': str(uuid.uuid4())}
+                    rows.append(existing)
+                existing.update(copy.deepcopy(row))
+                stored.append(copy.deepcopy(existing))
+            return SimpleNamespace(data=stored)
+
+        matched = [row for row in rows if all(_matches(row, condition) for condition in self._filters)]
+        if self._action == "update":
+            for row in matched:
+                row.update(copy.deepcopy(self._payload))
+            return SimpleNamespace(data=copy.deepcopy(matched))
+
+        for column, desc in reversed(self._order):
+            matched.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        if self._columns != "*":
+            columns = self._columns.split(",")
+            matched = [{column: row.get(column) for column in columns} for row in matched]
+        return SimpleNamespace(data=copy.deepcopy(matched))
+
+
+def _parse_or(filters: str) -> List[Any]:
+    """Parses `a.op."v",and(b.op."v",...)` into nested ("or"/"and", [...]) conditions."""
+    terms, depth, start = [], 0, 0
+    for index, char in enumerate(filters + ","):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            terms.append(filters[start:index])
+            start = index + 1
+    conditions = []
+    for term in terms:
+        if term.startswith("and(") and term.endswith(")"):
+            conditions.append(("and", _parse_or(term[len("and("):-1])))
+        else:
+            column, op, value = term.split(".", 2)
+            conditions.append((op, column, value.strip('"')))
+    return conditions
+
+
+def _matches(row: Dict[str, Any], condition: Any) -> bool:
+    kind = condition[0]
+    if kind == "or":
+        return any(_matches(row, inner) for inner in condition[1])
+    if kind == "and":
+        return all(_matches(row, inner) for inner in condition[1])
+    _, column, value = condition
+    actual = str(row.get(column))
+    return {
+        "eq": actual == value,
+        "gt": actual > value,
+        "lt": actual < value,
+    }[kind]
@@ -0,0 +1,87 @@
+import asyncio
+
+from backend.services.history_cache import ALL_SESSIONS, HistoryCache, compute_etag
+from backend.services.search_message_service import SearchMessageService
+from backend.test.fakes import FakeSupabase
+
+
+def test_invalidating_a_session_drops_only_its_entries():
+    cache = HistoryCache()
+    cache.set(('messages', "s1"), ["m1"], "s1")
+    cache.set(('messages', "s1", 10, None, 'full'), ["m1"], "s1")
+    cache.set(('messages', "s2"), ["m2"], "s2")
+    cache.set(('sessions', 50, None, 'summary'), ["s1", "s2"], ALL_SESSIONS)
+
+    cache.invalidate("s1")
+    assert cache.get(('messages', "s1")) is None
+    assert cache.get(('messages', "s1", 10, None, 'full')) is None
+    assert cache.get(('messages', "s2")) == ["m2"]
+    assert cache.get(('sessions', 50, None, 'summary')) == ["s1", "s2"]
+
+
+def test_expired_and_least_recently_read_entries_are_dropped():
+    cache = HistoryCache(ttl_seconds=0)
+    cache.set(('session', "s1"), {'id': "s1"}, "s1")
+    assert cache.get(('session', "s1")) is None
+
+    cache = HistoryCache(max_entries=2)
+    cache.set(('session', "a"), 1, "a")
+    cache.set(('session', "b"), 2, "b")
+    cache.get(('session', "a"))
+    cache.set(('session', "c"), 3, "c")
+    assert cache.get(('session', "b")) is None
+    assert cache.get(('session', "a")) == 1
+    assert cache.stats()['entries'] == 2
+
+
+def test_etag_changes_with_content_only():
+    assert compute_etag({'a': 1, 'b': [1, 2]}) == compute_etag({'b': [1, 2], 'a': 1})
+    assert compute_etag({'a': 1}) != compute_etag({'a': 2})
+
+
+def test_a_read_that_started_before_an_invalidation_is_not_stored():
+    cache = HistoryCache()
+    generation = cache.generation("s1")
+    cache.invalidate("s1")
+    cache.set(('messages', "s1"), ["before the write"], "s1", generation)
+    assert cache.get(('messages', "s1")) is None
+
+    cache.set(('messages', "s1"), ["after the write"], "s1", cache.generation("s1"))
+    assert cache.get(('messages', "s1")) == ["after the write"]
+    # Other groups are unaffected
+    cache.set(('messages', "s2"), ["m2"], "s2", generation)
+    assert cache.get(('messages', "s2")) == ["m2"]
+    assert cache.stats()['stale_sets'] == 1
+
+
+def test_history_read_racing_a_write_does_not_cache_stale_rows():
+    release = asyncio.Event()
+
+    class SlowReads(FakeSupabase):
+        """Selects snapshot their rows at once but answer only when released, like a slow response."""
+
+        def table(self, name):
+            query = super().table(name)
+            execute = query.execute
+
+            async def slow_execute():
+                result = await execute()
+                if query._action == "select":
+                    await release.wait()
+                return result
+
+            query.execute = slow_execute
+            return query
+
+    async def run():
+        service = SearchMessageService(SlowReads(), HistoryCache())
+        read = asyncio.create_task(service.list_messages_by_session_id("s1"))
+        await asyncio.sleep(0)
+        await service.create_message("s1", "q", "a")
+        release.set()
+        stale = await read
+        return stale, await service.list_messages_by_session_id("s1")
+
+    stale, fresh = asyncio.run(run())
+    assert stale.items == []
+    assert [message['question'] for message in fresh.items] == ["q"]
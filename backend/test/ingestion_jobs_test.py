@@ -0,0 +1,78 @@
+import threading
+import time
+
+from backend.services.ingestion_jobs import IngestionJobManager, JobStatus
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.active:
+        assert time.monotonic() < deadline, f"job {job.id} still {job.status.value}"
+        time.sleep(0.01)
+    return job
+
+
+def test_identical_submissions_share_one_job():
+    manager = IngestionJobManager(max_workers=2)
+    release = threading.Event()
+    runs = []
+
+    def work(job):
+        runs.append(job.id)
+        release.wait(5)
+        return {'status': 'success'}
+
+    first, created = manager.submit("topic", "sleep", work)
+    second, created_again = manager.submit("topic", "sleep", work)
+    other, _ = manager.submit("topic", "creatine", work)
+    release.set()
+
+    assert (created, created_again) == (True, False)
+    assert second is first
+    assert other is not first
+    wait_until_finished(first)
+    wait_until_finished(other)
+    assert sorted(runs) == sorted([first.id, other.id])
+    manager.shutdown()
+
+
+def test_a_finished_job_can_be_resubmitted():
+    manager = IngestionJobManager(max_workers=1)
+
+    def work(job):
+        job.increment('papers_downloaded', 3)
+        return {'status': 'success'}
+
+    first, _ = manager.submit("topic", "sleep", work)
+    wait_until_finished(first)
+    second, created = manager.submit("topic", "sleep", work)
+    wait_until_finished(second)
+
+    assert created and second is not first
+    assert first.status == second.status == JobStatus.SUCCEEDED
+    assert second.to_dict()['progress'] == {'papers_downloaded': 3}
+    assert [job.id for job in manager.list()] == [second.id, first.id]
+    manager.shutdown()
+
+
+def test_a_failed_job_reports_its_error():
+    manager = IngestionJobManager(max_workers=1)
+
+    def raises(job):
+        job.set_stage("downloading")
+        raise ConnectionError("arXiv unavailable")
+
+    def reports(job):
+        return {'status': 'error', 'message': "No papers found"}
+
+    crashed, _ = manager.submit("topic", "sleep", raises)
+    errored, _ = manager.submit("papers", "2401.00001", reports)
+    wait_until_finished(crashed)
+    wait_until_finished(errored)
+
+    assert crashed.status == errored.status == JobStatus.FAILED
+    assert crashed.to_dict()['errors'] == ["arXiv unavailable"]
+    assert crashed.to_dict()['stage'] == "done"
+    assert errored.to_dict()['errors'] == ["No papers found"]
+    assert manager.get(crashed.id) is crashed
+    manager.shutdown()
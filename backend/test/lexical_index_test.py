@@ -0,0 +1,70 @@
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeRelationship, NodeWithScore, QueryBundle, RelatedNodeInfo, TextNode
+
+from backend.services.lexical_index import BM25Index, HybridRetriever, tokenize
+
+
+def make_node(node_id, text, doc_id="doc"):
+    return TextNode(
+        id_=node_id,
+        text=text,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)}
+    )
+
+
+class FixedRetriever(BaseRetriever):
+
+    def __init__(self, results):
+        self._results = results
+        super().__init__()
+
+    def _retrieve(self, query_bundle):
+        return list(self._results)
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is the effect of HMB on muscle?") == ["effect", "hmb", "muscle"]
+
+
+def test_exact_terms_rank_first(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.sqlite3"))
+    index.add([
+        make_node("a", "Protein intake and muscle protein synthesis in older adults"),
+        make_node("b", "Beta-hydroxy-beta-methylbutyrate (HMB) supplementation and muscle mass"),
+        make_node("c", "Sleep duration and recovery"),
+    ])
+
+    results = index.search("does HMB help muscle", top_k=2)
+    assert [result.node.node_id for result in results] == ["b", "a"]
+    assert results[0].node.get_content() == "Beta-hydroxy-beta-methylbutyrate (HMB) supplementation and muscle mass"
+
+    reopened = BM25Index(str(tmp_path / "lexical.sqlite3"))
+    assert reopened.search("sleep", top_k=5)[0].node.node_id == "c"
+
+
+def test_readding_and_deleting_nodes(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.sqlite3"))
+    index.add([make_node("a", "creatine loading", doc_id="d1"), make_node("b", "caffeine timing", doc_id="d2")])
+    index.add([make_node("a", "vitamin d status", doc_id="d1")])
+
+    assert index.search("creatine", top_k=5) == []
+    assert [r.node.node_id for r in index.search("vitamin", top_k=5)] == ["a"]
+    assert index.stats()['documents'] == 2
+
+    index.delete("d1")
+    assert index.search("vitamin", top_k=5) == []
+    assert index.stats()['documents'] == 1
+
+
+def test_hybrid_keeps_lexical_hits_below_the_cutoff(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.sqlite3"))
+    hmb = make_node("hmb", "HMB supplementation in athletes")
+    protein = make_node("protein", "Protein and resistance training")
+    index.add([hmb, protein])
+
+    dense = FixedRetriever([NodeWithScore(node=protein, score=0.82), NodeWithScore(node=hmb, score=0.65)])
+    retriever = HybridRetriever(dense, index, similarity_top_k=2, similarity_cutoff=0.7)
+
+    results = retriever.retrieve(QueryBundle("HMB dosage"))
+    assert {result.node.node_id for result in results} == {"hmb", "protein"}
+    assert results[0].score > 0
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+
+import httpx
+from llama_index.core import Document
+
+from backend.routes.retrieval import _format_sse
+from backend.services.base_service import ServiceConfig
+from backend.services.container import get_llm_service
+from backend.services.embedding_service import EmbeddingService
+from backend.services.llm_service import LLMService
+from backend.test.fakes import EchoLLM, HashEmbedding
+
+
+class FailingLLM(EchoLLM):
+    async def astream_chat(self, messages, **kwargs):
+        raise RuntimeError("model overloaded")
+
+
+def make_llm_service(workdir, llm=None) -> LLMService:
+    config = ServiceConfig(
+        openai_api_key="",
+        pinecone_api_key="",
+        index_name=f"llm-test-{os.path.basename(workdir)}",
+        vector_store="local",
+        local_index_dir=os.path.join(workdir, "vector_index"),
+        papers_dir=os.path.join(workdir, "papers"),
+        lexical_index_path=None,
+        docstore_path=None,
+        embedding_cache_path=None,
+        chunking_strategy="token",
+        chunk_size=128,
+        chunk_overlap=0,
+        answer_mode="single_pass",
+        # Hashed bag-of-words similarities are far lower than real embeddings'
+        similarity_cutoff=0.0
+    )
+    embedding_model = HashEmbedding()
+
+    class LocalEmbeddingService(EmbeddingService):
+        def _create_embedding_model(self):
+            return embedding_model
+
+    class LocalLLMService(LLMService):
+        def _create_llm(self):
+            return llm or EchoLLM(answer_words=8)
+
+    embedding_service = LocalEmbeddingService(config)
+    embedding_service.run_pipeline([
+        Document(text="Creatine supplementation improves short term memory.", id_="doc#0", metadata={'title': "Creatine"}),
+        Document(text="Sleep deprivation impairs memory consolidation.", id_="doc#1", metadata={'title': "Sleep"}),
+    ])
+    return LocalLLMService(embedding_service, config)
+
+
+def stream(service, question):
+    async def run():
+        return [event async for event in service.astream_query_with_research(question)]
+    return asyncio.run(run())
+
+
+def test_stream_yields_sources_then_tokens_then_done(tmp_path):
+    service = make_llm_service(str(tmp_path))
+
+    events = stream(service, "Does creatine help memory?")
+
+    kinds = [event['event'] for event in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"}
+    assert events[0]['data']['sources']
+    done = events[-1]['data']
+    assert "".join(event['data']['delta'] for event in events[1:-1]) == done['answer']
+    assert done['sources'] == events[0]['data']['sources']
+    assert done['error'] is None
+
+
+def test_a_cached_answer_is_streamed_in_one_token(tmp_path):
+    service = make_llm_service(str(tmp_path))
+    first = stream(service, "Does creatine help memory?")
+
+    events = stream(service, "Does creatine help memory?")
+
+    assert [event['event'] for event in events] == ["sources", "token", "done"]
+    assert events[1]['data']['delta'] == first[-1]['data']['answer']
+    assert events[2]['data']['answer'] == first[-1]['data']['answer']
+    # No generation stage: the model wasn't called
+    assert 'generation_ms' not in events[2]['data']['timings']
+    assert service.answer_cache.stats()['hits'] == 1
+
+
+def test_a_failure_becomes_an_error_event(tmp_path):
+    service = make_llm_service(str(tmp_path), llm=FailingLLM())
+
+    events = stream(service, "Does creatine help memory?")
+
+    assert [event['event'] for event in events] == ["sources", "error"]
+    assert events[-1]['data'] == {
+        'question': "Does creatine help memory?", 'answer': None, 'sources': None, 'error': "model overloaded"
+    }
+    assert service.answer_cache.stats()['entries'] == 0
+
+
+def test_ask_stream_route_frames_events_as_sse(tmp_path):
+    from backend.main import app
+
+    service = make_llm_service(str(tmp_path))
+    app.dependency_overrides[get_llm_service] = lambda: service
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/query/ask/stream", json={"query": "Does creatine help memory?"})
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.split("\n\n")
+    assert frames[-1] == ""
+    events = []
+    for frame in frames[:-1]:
+        event_line, data_line = frame.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    assert events[0][0] == "sources" and events[-1][0] == "done"
+    assert "".join(data['delta'] for kind, data in events if kind == "token") == events[-1][1]['answer']
+
+
+def test_format_sse():
+    assert _format_sse("token", {'delta': "line one\nline two"}) == (
+        'event: token\ndata: {"delta": "line one\\nline two"}\n\n'
+    )
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+import numpy as np
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters, VectorStoreQuery
+
+from backend.services.local_vector_store import LocalVectorStore
+
+
+def make_node(node_id, vector, doc_id="doc", **metadata):
+    return TextNode(
+        id_=node_id,
+        text=f"text of {node_id}",
+        embedding=list(vector),
+        metadata=metadata,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)}
+    )
+
+
+def query(store, vector, top_k=2, **kwargs):
+    return store.query(VectorStoreQuery(query_embedding=list(vector), similarity_top_k=top_k, **kwargs))
+
+
+def test_exact_search_and_persistence(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.add([make_node("a", [1, 0, 0]), make_node("b", [0, 1, 0])])
+    store.add([make_node("c", [0.9, 0.1, 0], title="creatine")])
+
+    result = query(store, [1, 0, 0])
+    assert result.ids == ["a", "c"]
+    assert result.similarities[0] > result.similarities[1]
+    assert result.nodes[1].metadata["title"] == "creatine"
+    assert result.nodes[1].get_content() == "text of c"
+
+    reopened = LocalVectorStore(str(tmp_path))
+    assert query(reopened, [0, 1, 0], top_k=1).ids == ["b"]
+
+
+def test_upsert_delete_and_filters(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.add([make_node("a", [1, 0], doc_id="d1", topic="sleep"), make_node("b", [0, 1], doc_id="d2", topic="diet")])
+    store.add([make_node("a", [0, 1], doc_id="d1", topic="sleep")])
+
+    result = query(store, [0, 1], top_k=3)
+    assert sorted(result.ids) == ["a", "b"]
+    assert result.similarities == pytest.approx([1.0, 1.0])
+
+    filters = MetadataFilters(filters=[MetadataFilter(key="topic", value="diet")])
+    assert query(store, [1, 0], top_k=1, filters=filters).ids == ["b"]
+
+    store.delete("d2")
+    assert query(store, [0, 1], top_k=3).ids == ["a"]
+    assert query(LocalVectorStore(str(tmp_path)), [0, 1], top_k=3).ids == ["a"]
+
+
+def test_ivf_finds_nearest_neighbours(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), mode="ivf", ivf_lists=16, ivf_probes=4, ivf_min_vectors=1000)
+    store.add([make_node(str(i), vector) for i, vector in enumerate(vectors)])
+
+    hits = 0
+    for i in range(50):
+        hits += query(store, vectors[i] + rng.normal(scale=0.05, size=16), top_k=1).ids == [str(i)]
+    assert hits >= 45
+
+
+def test_nodes_added_through_a_pipeline_are_searchable(tmp_path):
+    from llama_index.core import Document
+    from llama_index.core.embeddings import MockEmbedding
+    from llama_index.core.ingestion import IngestionPipeline
+    from llama_index.core.node_parser import SentenceSplitter
+
+    store = LocalVectorStore(str(tmp_path))
+    embed_model = MockEmbedding(embed_dim=8)
+    # The pipeline holds a copy of the store, which must share its index
+    IngestionPipeline(transformations=[SentenceSplitter(), embed_model], vector_store=store).run(
+        documents=[Document(text="creatine and sleep")]
+    )
+
+    assert query(store, embed_model.get_query_embedding("sleep"), top_k=1).nodes[0].get_content() == "creatine and sleep"
+
+
+def test_dead_rows_are_compacted_away(tmp_path):
+    store = LocalVectorStore(str(tmp_path), compact_dead_fraction=0.5)
+    store.add([make_node(str(i), [1, i, 0], doc_id=f"d{i}") for i in range(4)])
+    store.add([make_node("0", [0, 0, 1], doc_id="d0")])
+    store.delete("d1")
+    assert store.client.stats() == {'rows': 5, 'live': 3, 'dead_fraction': 0.4}
+
+    store.delete("d2")
+    assert store.client.stats() == {'rows': 2, 'live': 2, 'dead_fraction': 0.0}
+    assert query(store, [0, 0, 1], top_k=1).ids == ["0"]
+    assert query(store, [1, 3, 0], top_k=1).ids == ["3"]
+    assert [name for name in os.listdir(tmp_path) if name.startswith("vectors")] == ["vectors.1.f32"]
+
+    reopened = LocalVectorStore(str(tmp_path))
+    assert sorted(node.node_id for node in reopened.get_nodes()) == ["0", "3"]
+    assert query(reopened, [0, 0, 1], top_k=1).ids == ["0"]
+
+
+def test_index_is_compacted_on_load(tmp_path):
+    store = LocalVectorStore(str(tmp_path), compact_dead_fraction=1.0)
+    store.add([make_node(str(i), [1, i], doc_id=f"d{i}") for i in range(4)])
+    store.delete("d0")
+    store.delete("d1")
+    # A compaction interrupted before its commit leaves a stray file behind
+    (tmp_path / "vectors.1.f32").write_bytes(b"\0" * 8)
+
+    reopened = LocalVectorStore(str(tmp_path), compact_dead_fraction=0.25)
+    assert reopened.client.stats()['rows'] == 2
+    assert query(reopened, [1, 3], top_k=1).ids == ["3"]
+    assert "vectors.f32" not in os.listdir(tmp_path)
@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from backend.services.message_write_buffer import MessageWriteBuffer, is_retryable_write_error
+from backend.services.search_message_service import SearchMessageService
+from backend.test.fakes import FakeSupabase
+
+RETRYABLE_ERRORS = [
+    httpx.ReadTimeout("timed out"),
+    httpx.ConnectError("connection refused"),
+    httpx.PoolTimeout("no connection available"),
+    APIError({'code': 503, 'message': "JSON could not be generated"}),
+    APIError({'code': '429', 'message': "Too many requests"}),
+]
+
+
+def foreign_key_violation():
+    return APIError({'code': '23503', 'message': 'insert or update on table "search_messages" violates foreign key constraint'})
+
+
+def make_buffer(supabase=None, **kwargs):
+    supabase = supabase or FakeSupabase(latency=0.01)
+    # Errors reach the buffer wrapped by the real service, as they do in the app
+    return supabase, MessageWriteBuffer(SearchMessageService(supabase), retry_backoff=0, **kwargs)
+
+
+def stored_questions(supabase):
+    return sorted(row['question'] for row in supabase.tables['search_messages'])
+
+
+def test_concurrent_writes_share_inserts():
+    supabase, buffer = make_buffer(max_batch_size=4, max_delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(buffer.submit("s1", f"q{i}", "a") for i in range(10)))
+
+    stored = asyncio.run(run())
+    assert supabase.requests == 3
+    assert buffer.stats()['rows_per_batch'] == pytest.approx(10 / 3)
+    assert [row['question'] for row in stored] == [f"q{i}" for i in range(10)]
+
+
+@pytest.mark.parametrize("error", RETRYABLE_ERRORS, ids=lambda error: type(error).__name__)
+def test_client_and_server_errors_are_retried_not_split(error):
+    supabase, buffer = make_buffer(max_batch_size=8, max_delay=0.05, max_retries=2)
+    supabase.errors = [error]
+
+    async def run():
+        return await asyncio.gather(*(buffer.submit("s1", f"q{i}", "a") for i in range(6)))
+
+    assert len(asyncio.run(run())) == 6
+    # One failed attempt and one retry of the whole batch
+    assert supabase.requests == 2
+    assert stored_questions(supabase) == [f"q{i}" for i in range(6)]
+
+
+def test_failed_writes_are_retried_then_surfaced():
+    supabase, buffer = make_buffer(max_retries=2)
+    supabase.errors = [httpx.ReadTimeout("timed out"), httpx.ConnectError("connection refused")]
+    assert asyncio.run(buffer.submit("s1", "q", "a"))['question'] == "q"
+
+    supabase, buffer = make_buffer(max_retries=2)
+    supabase.errors = [httpx.ReadTimeout("timed out")] * 3
+    with pytest.raises(Exception, match="timed out"):
+        asyncio.run(buffer.submit("s1", "q", "a"))
+    assert supabase.requests == 3
+
+
+def test_close_writes_queued_messages():
+    supabase, buffer = make_buffer(max_delay=60)
+
+    async def run():
+        pending = asyncio.ensure_future(buffer.submit("s1", "q", "a"))
+        await asyncio.sleep(0)
+        await buffer.aclose()
+        return await pending
+
+    assert asyncio.run(run())['question'] == "q"
+    assert supabase.requests == 1
+
+
+def test_permanent_errors_are_not_retried():
+    supabase, buffer = make_buffer(max_retries=3)
+    supabase.errors = [APIError({'code': '42501', 'message': "permission denied for table search_messages"})]
+
+    with pytest.raises(Exception, match="permission denied"):
+        asyncio.run(buffer.submit("s1", "q", "a"))
+    assert supabase.requests == 1
+
+
+def test_a_bad_row_only_fails_its_own_caller():
+    supabase = FakeSupabase(reject=lambda row: foreign_key_violation() if row['question'] == "q2" else None)
+    supabase, buffer = make_buffer(supabase, max_batch_size=8, max_delay=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            *(buffer.submit("s1", f"q{i}", "a") for i in range(6)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert "foreign key" in str(results[2])
+    assert [row['question'] for row in results if isinstance(row, dict)] == ["q0", "q1", "q3", "q4", "q5"]
+    assert stored_questions(supabase) == ["q0", "q1", "q3", "q4", "q5"]
+
+
+def test_retryable_errors_are_recognized_through_the_service_wrapper():
+    async def fail_with(error):
+        supabase = FakeSupabase()
+        supabase.errors = [error]
+        try:
+            await SearchMessageService(supabase).create_messages([SearchMessageService.message_row("s1", "q", "a")])
+        except Exception as wrapped:
+            return wrapped
+
+    for error in RETRYABLE_ERRORS:
+        assert is_retryable_write_error(asyncio.run(fail_with(error))), repr(error)
+    assert not is_retryable_write_error(asyncio.run(fail_with(foreign_key_violation())))
+
+
+def test_retried_upserts_do_not_duplicate_rows():
+    supabase = FakeSupabase()
+    service = SearchMessageService(supabase)
+    rows = [service.message_row("s1", f"q{i}", "a") for i in range(3)]
+
+    async def run():
+        await service.create_messages(rows)
+        # The first response was lost; the buffer writes the same rows again
+        return await service.create_messages(rows)
+
+    stored = asyncio.run(run())
+    assert [row['id'] for row in stored] == [row['id'] for row in rows]
+    assert len(supabase.tables['search_messages']) == 3
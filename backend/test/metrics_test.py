@@ -0,0 +1,28 @@
+import pytest
+
+from backend.utils.metrics import STAGE_ERRORS, STAGE_SECONDS, MetricsRegistry, track_stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, stage="parse")
+
+    lines = registry.render().splitlines()
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="parse"} 4' in lines
+    assert 'test_seconds_sum{stage="parse"} 4.25' in lines
+
+
+def test_track_stage_counts_failures():
+    runs = STAGE_SECONDS.count(stage="test_stage")
+    errors = STAGE_ERRORS.value(stage="test_stage")
+    with pytest.raises(ValueError):
+        with track_stage("test_stage"):
+            raise ValueError("boom")
+
+    assert STAGE_SECONDS.count(stage="test_stage") == runs + 1
+    assert STAGE_ERRORS.value(stage="test_stage") == errors + 1
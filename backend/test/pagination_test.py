@@ -0,0 +1,26 @@
+import pytest
+
+from backend.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, to_page
+
+
+def row(i):
+    return {'id': f"id-{i}", 'created_at': f"2024-05-0{i}T10:00:00.123+00:00"}
+
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor(row(3))) == ("2024-05-03T10:00:00.123+00:00", "id-3")
+
+
+def test_garbage_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_extra_row_means_another_page():
+    page = to_page([row(1), row(2), row(3)], limit=2)
+    assert [r['id'] for r in page.items] == ["id-1", "id-2"]
+    assert decode_cursor(page.next_cursor) == ("2024-05-02T10:00:00.123+00:00", "id-2")
+
+    last = to_page([row(1), row(2)], limit=2)
+    assert last.next_cursor is None
+    assert len(last.items) == 2
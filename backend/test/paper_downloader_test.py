@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from backend.services.paper_downloader import PaperDownloader
+
+
+class FakeResponse:
+    def __init__(self, status_code, chunks, on_chunk=None):
+        self.status_code = status_code
+        self._chunks = chunks
+        self._on_chunk = on_chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def iter_content(self, chunk_size):
+        for chunk in self._chunks:
+            if self._on_chunk:
+                self._on_chunk()
+            yield chunk
+
+
+class FakeSession:
+    """Answers each url with its scripted outcomes in turn: a status code, an exception, or a delay in seconds."""
+
+    def __init__(self, script, on_chunk=None):
+        self.script = {url: list(outcomes) for url, outcomes in script.items()}
+        self.calls = []
+        self.on_chunk = on_chunk
+        self._lock = threading.Lock()
+
+    def get(self, url, stream=False, timeout=None):
+        with self._lock:
+            self.calls.append(url)
+            outcome = self.script[url].pop(0) if len(self.script[url]) > 1 else self.script[url][0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, float):
+            time.sleep(outcome)
+            outcome = 200
+        return FakeResponse(outcome, [b"%PDF-1.4 ", url.encode(), b" %%EOF"], self.on_chunk)
+
+    def close(self):
+        pass
+
+
+def make_downloader(script, on_chunk=None, **kwargs):
+    downloader = PaperDownloader(backoff_factor=0, **kwargs)
+    downloader.session = FakeSession(script, on_chunk)
+    return downloader
+
+
+def test_every_paper_is_downloaded_and_the_list_keeps_its_order(tmp_path):
+    # Later papers finish first
+    delays = {f"https://arxiv.org/pdf/2401.0000{i}v1": 0.05 * (3 - i) for i in range(4)}
+    downloader = make_downloader({url: [delay] for url, delay in delays.items()}, max_concurrency=4)
+    papers = [{'arxiv_id': url.rsplit("/", 1)[1], 'pdf_url': url} for url in delays]
+
+    finished = [paper['arxiv_id'] for paper in downloader.download_all(papers, str(tmp_path))]
+
+    assert finished == [paper['arxiv_id'] for paper in reversed(papers)]
+    assert [paper['arxiv_id'] for paper in papers] == ["2401.00000v1", "2401.00001v1", "2401.00002v1", "2401.00003v1"]
+    for paper in papers:
+        assert paper['local_path'] == os.path.join(str(tmp_path), f"{paper['arxiv_id']}.pdf")
+        with open(paper['local_path'], "rb") as f:
+            assert paper['pdf_url'].encode() in f.read()
+
+
+def test_downloads_are_written_to_a_part_file_then_renamed(tmp_path):
+    filename = str(tmp_path / "2401.00001v1.pdf")
+    seen = []
+
+    def on_chunk():
+        seen.append((os.path.exists(f"{filename}.part"), os.path.exists(filename)))
+
+    downloader = make_downloader({"https://arxiv.org/pdf/2401.00001v1": [200]}, on_chunk)
+    assert downloader.download("https://arxiv.org/pdf/2401.00001v1", filename) == filename
+
+    # Chunks go to the .part file; the final name only appears once every chunk is in
+    assert seen == [(True, False)] * 3
+    assert os.listdir(tmp_path) == ["2401.00001v1.pdf"]
+
+
+def test_a_failed_download_leaves_no_files_behind(tmp_path):
+    def on_chunk():
+        raise requests.ConnectionError("connection reset")
+
+    downloader = make_downloader({"https://arxiv.org/pdf/2401.00001v1": [200]}, on_chunk, max_retries=1)
+    with pytest.raises(requests.ConnectionError):
+        downloader.download("https://arxiv.org/pdf/2401.00001v1", str(tmp_path / "2401.00001v1.pdf"))
+
+    assert len(downloader.session.calls) == 2
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_statuses_are_retried(tmp_path, status):
+    url = "https://arxiv.org/pdf/2401.00001v1"
+    downloader = make_downloader({url: [status, requests.Timeout("read timed out"), 200]}, max_retries=3)
+
+    assert downloader.download(url, str(tmp_path / "2401.00001v1.pdf"))
+    assert len(downloader.session.calls) == 3
+
+
+def test_other_statuses_fail_at_once_and_retries_run_out(tmp_path):
+    missing = make_downloader({"https://arxiv.org/pdf/missing": [404]}, max_retries=3)
+    with pytest.raises(requests.HTTPError):
+        missing.download("https://arxiv.org/pdf/missing", str(tmp_path / "missing.pdf"))
+    assert len(missing.session.calls) == 1
+
+    overloaded = make_downloader({"https://arxiv.org/pdf/busy": [503]}, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        overloaded.download("https://arxiv.org/pdf/busy", str(tmp_path / "busy.pdf"))
+    assert len(overloaded.session.calls) == 3
+    assert os.listdir(tmp_path) == []
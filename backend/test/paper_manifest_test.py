@@ -0,0 +1,67 @@
+import os
+
+from backend.services.paper_manifest import PaperManifest
+
+PDF = b"%PDF-1.4 fixture body %%EOF"
+
+
+def write_pdf(manifest, arxiv_id, content=PDF, mtime=None):
+    path = manifest.pdf_path(arxiv_id)
+    with open(path, "wb") as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_cached_path_accepts_only_the_recorded_content(tmp_path):
+    manifest = PaperManifest(str(tmp_path))
+    path = write_pdf(manifest, "2401.00001v1", mtime=1_700_000_000)
+    manifest.record_download("2401.00001v1", path)
+    assert manifest.cached_path("2401.00001v1") == path
+
+    # Touched but unchanged: verified by hash and accepted
+    os.utime(path, (1_700_000_100, 1_700_000_100))
+    assert manifest.cached_path("2401.00001v1") == path
+    assert manifest.get("2401.00001v1")['mtime'] == 1_700_000_100
+
+    # Rewritten at the same size
+    write_pdf(manifest, "2401.00001v1", PDF.replace(b"fixture", b"FIXTURE"), mtime=1_700_000_200)
+    assert manifest.cached_path("2401.00001v1") is None
+
+    # Truncated
+    write_pdf(manifest, "2401.00001v1", PDF[:10])
+    assert manifest.cached_path("2401.00001v1") is None
+    assert manifest.cached_path("2401.00002v1") is None
+
+
+def test_stages_are_kept_until_the_content_changes(tmp_path):
+    manifest = PaperManifest(str(tmp_path))
+    path = write_pdf(manifest, "2401.00001v2")
+    manifest.mark(["2401.00001v2", "2401.00009v1"], 'parsed', 'upserted', chunking="token:size=512,overlap=64")
+
+    assert manifest.is_done("2401.00001v2", 'upserted')
+    assert manifest.is_done("2401.00001v2", 'upserted', chunking="token:size=512,overlap=64")
+    assert not manifest.is_done("2401.00001v2", 'upserted', chunking="sentence_window:size=8,overlap=2")
+    assert not manifest.is_done("2401.00001v2", 'embedded')
+    # No local PDF, so nothing is recorded
+    assert manifest.get("2401.00009v1") is None
+
+    entry = manifest.record_download("2401.00001v2", path)
+    assert (entry['arxiv_id'], entry['version']) == ("2401.00001", "v2")
+    assert PaperManifest(str(tmp_path)).is_done("2401.00001v2", 'parsed')
+
+    write_pdf(manifest, "2401.00001v2", PDF + b"\n% revised\n%%EOF")
+    manifest.record_download("2401.00001v2", path)
+    assert not manifest.is_done("2401.00001v2", 'parsed')
+
+
+def test_pdfs_from_before_the_manifest_are_adopted_when_complete(tmp_path):
+    manifest = PaperManifest(str(tmp_path))
+    complete = write_pdf(manifest, "2401.00001v1")
+    write_pdf(manifest, "2401.00002v1", b"%PDF-1.4 cut off mid-download")
+
+    assert manifest.cached_path("2401.00001v1") == complete
+    assert manifest.get("2401.00001v1")['size'] == len(PDF)
+    assert manifest.cached_path("2401.00002v1") is None
+    assert manifest.get("2401.00002v1") is None
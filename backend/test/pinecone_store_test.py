@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from llama_index.core import Document
+from llama_index.core.ingestion import DocstoreStrategy, IngestionPipeline
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from backend.services import pinecone_store
+from backend.services.embedding_service import DeterministicNodeIds
+from backend.services.pinecone_store import ThreadedPineconeVectorStore
+from backend.test.fakes import HashEmbedding
+
+
+class ServerlessIndex:
+    """In-memory stand-in for a serverless Pinecone index, which rejects deletes by metadata filter."""
+
+    def __init__(self, page_size=2):
+        self.vectors = {}
+        self.page_size = page_size
+        self.delete_requests = 0
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        for vector in vectors:
+            self.vectors[vector['id']] = vector
+
+    def list(self, prefix="", namespace=None):
+        ids = sorted(vector_id for vector_id in self.vectors if vector_id.startswith(prefix))
+        for start in range(0, len(ids), self.page_size):
+            yield ids[start:start + self.page_size]
+
+    def delete(self, ids=None, filter=None, namespace=None, **kwargs):
+        if filter is not None:
+            raise Exception("Serverless and Starter indexes do not support deleting with metadata filtering")
+        self.delete_requests += 1
+        for vector_id in ids:
+            self.vectors.pop(vector_id, None)
+
+
+def make_node(node_id, doc_id):
+    return TextNode(
+        id_=node_id,
+        text=f"text of {node_id}",
+        embedding=[1.0, 0.0],
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)}
+    )
+
+
+def test_delete_lists_a_documents_ids_instead_of_filtering(monkeypatch):
+    monkeypatch.setattr(pinecone_store, "DELETE_BATCH_SIZE", 2)
+    index = ServerlessIndex()
+    store = ThreadedPineconeVectorStore(pinecone_index=index)
+    store.add([make_node(f"arxiv:2401.00001v1#1:{i:016x}", "arxiv:2401.00001v1#1") for i in range(3)])
+    store.add([make_node("arxiv:2401.00001v1#10:0000000000000000", "arxiv:2401.00001v1#10")])
+
+    store.delete("arxiv:2401.00001v1#1")
+    assert list(index.vectors) == ["arxiv:2401.00001v1#10:0000000000000000"]
+    assert index.delete_requests == 2
+
+    asyncio.run(store.adelete("arxiv:2401.00001v1#10"))
+    asyncio.run(store.adelete("arxiv:2401.00001v1#2"))
+    assert index.vectors == {}
+    assert index.delete_requests == 3
+
+
+def test_changed_segments_are_reingested_on_a_serverless_index():
+    index = ServerlessIndex()
+    pipeline = IngestionPipeline(
+        transformations=[SentenceSplitter(chunk_size=64, chunk_overlap=0), DeterministicNodeIds(), HashEmbedding()],
+        vector_store=ThreadedPineconeVectorStore(pinecone_index=index),
+        docstore=SimpleDocumentStore(),
+        docstore_strategy=DocstoreStrategy.UPSERTS,
+        disable_cache=True
+    )
+
+    pipeline.run(documents=[Document(text="Sleep deprivation impairs memory.", id_="arxiv:2401.00001v1#0")])
+    pipeline.run(documents=[Document(text="Creatine improves short term memory.", id_="arxiv:2401.00001v1#0")])
+
+    [vector] = index.vectors.values()
+    assert vector['id'].startswith("arxiv:2401.00001v1#0:")
+    assert "Creatine" in vector['metadata']['_node_content']
@@ -0,0 +1,329 @@
+"""End-to-end benchmark that needs no keys or network.
+
+Run from the repository root:
+
+    python -m backend.test.pipeline_benchmark --output benchmark.json
+
+The real services run against the stand-ins in `backend.test.fakes` and a
+local vector store in a temporary directory. The PDFs in `backend/papers`
+are the corpus. The benchmark measures three things:
+
+- ingestion throughput: the full search, download, parse, clean, split,
+  embed and upsert run, in pages/s and nodes/s;
+- latency percentiles for /api/query/ask through the FastAPI app, and
+  time to first token for the answer stream;
+- latency of message writes and history reads through /api/db.
+
+Latency flags set how long the fake OpenAI and Supabase calls take, so
+runs model a realistic service without depending on it. The JSON output
+records the commit and the settings, so runs can be compared across
+commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.services.base_service import ServiceConfig
+from backend.services.chunking import CHUNKING_STRATEGIES
+from backend.services.container import (
+    get_llm_service, get_message_write_buffer, get_search_message_service, get_search_session_service
+)
+from backend.services.history_cache import HistoryCache
+from backend.test.fakes import EchoLLM, FakeArxivClient, FakeSupabase, HashEmbedding, LocalPaperDownloader
+from backend.utils.metrics import STAGE_SECONDS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "papers")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 2),
+        'p50_ms': round(at(0.50) * 1000, 2),
+        'p90_ms': round(at(0.90) * 1000, 2),
+        'p99_ms': round(at(0.99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+
+def stage_deltas(before: Dict[Tuple[str, ...], Tuple[float, int]]) -> Dict[str, Dict[str, float]]:
+    """Seconds and runs per stage recorded since `before`."""
+    deltas = {}
+    for key, (total, count) in STAGE_SECONDS.totals().items():
+        previous_total, previous_count = before.get(key, (0.0, 0))
+        if count > previous_count:
+            deltas[key[0]] = {'seconds': round(total - previous_total, 4), 'runs': count - previous_count}
+    return deltas
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def build_config(workdir: str, args: argparse.Namespace) -> ServiceConfig:
+    return ServiceConfig(
+        openai_api_key="sk-benchmark",
+        pinecone_api_key="",
+        index_name="benchmark",
+        vector_store="local",
+        local_index_dir=os.path.join(workdir, "vector_index"),
+        local_index_mode=args.local_index_mode,
+        papers_dir=os.path.join(workdir, "papers"),
+        parse_workers=args.parse_workers,
+        chunking_strategy=args.chunking_strategy,
+        # Hashed bag-of-words similarities are far lower than real embeddings'
+        similarity_cutoff=0.0,
+        retrieval_strategy=args.retrieval_strategy,
+        lexical_index_path=os.path.join(workdir, "lexical.sqlite3"),
+        answer_mode=args.answer_mode,
+        docstore_path=os.path.join(workdir, "docstore.json"),
+        embedding_cache_path=None,
+        answer_cache_max_entries=0 if args.no_answer_cache else 1000
+    )
+
+
+def build_services(config: ServiceConfig, args: argparse.Namespace):
+    from backend.services.document_service import DocumentService
+    from backend.services.embedding_service import EmbeddingService
+    from backend.services.llm_service import LLMService
+
+    embedding_model = HashEmbedding(latency=args.embed_latency_ms / 1000)
+    llm = EchoLLM(latency=args.llm_latency_ms / 1000, token_latency=args.token_latency_ms / 1000)
+
+    class BenchmarkEmbeddingService(EmbeddingService):
+        def _create_embedding_model(self):
+            return embedding_model
+
+    class BenchmarkLLMService(LLMService):
+        def _create_llm(self):
+            return llm
+
+    embedding_service = BenchmarkEmbeddingService(config)
+    llm_service = BenchmarkLLMService(embedding_service, config)
+    document_service = DocumentService(embedding_service, max_results=args.papers)
+    document_service.arxiv = FakeArxivClient(FIXTURES_DIR, latency=args.arxiv_latency_ms / 1000)
+    document_service.downloader = LocalPaperDownloader(latency=args.download_latency_ms / 1000)
+    return embedding_service, llm_service, document_service
+
+
+def bench_ingestion(embedding_service, document_service) -> Dict[str, Any]:
+    before = STAGE_SECONDS.totals()
+    start = time.perf_counter()
+    result = document_service.process_and_embed_papers("benchmark")
+    elapsed = time.perf_counter() - start
+    if result.get('status') != "success":
+        raise RuntimeError(f"Ingestion failed: {result}")
+
+    pages = result['documents_processed']
+    nodes = len(embedding_service.vector_store.get_nodes())
+    return {
+        'papers': result['papers_fetched'],
+        'pages': pages,
+        'nodes': nodes,
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(pages / elapsed, 2),
+        'nodes_per_second': round(nodes / elapsed, 2),
+        'stages': stage_deltas(before)
+    }
+
+
+def sample_questions(embedding_service, count: int) -> List[str]:
+    """Opening words of evenly spaced ingested passages, so every question has relevant context."""
+    nodes = embedding_service.vector_store.get_nodes()
+    step = max(1, len(nodes) // count)
+    questions = []
+    for node in nodes[::step][:count]:
+        words = node.get_content().split()
+        questions.append(" ".join(words[:12]) + "?")
+    return questions
+
+
+async def bench_ask(client: httpx.AsyncClient, questions: List[str], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    server_timings: Dict[str, List[float]] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/query/ask", json={"query": question})
+            latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        body = response.json()
+        if body.get('error'):
+            raise RuntimeError(f"/ask failed: {body['error']}")
+        for stage, ms in (body.get('timings') or {}).items():
+            server_timings.setdefault(stage, []).append(ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(question) for question in questions))
+    elapsed = time.perf_counter() - start
+    return {
+        **percentiles(latencies),
+        'requests_per_second': round(len(questions) / elapsed, 2),
+        'server_mean_ms': {stage: round(statistics.fmean(values), 2) for stage, values in sorted(server_timings.items())}
+    }
+
+
+async def bench_ask_stream(llm_service, questions: List[str]) -> Dict[str, Any]:
+    """Times the event stream behind /api/query/ask/stream.
+
+    httpx's ASGI transport hands over a response only once it is complete,
+    so time to first token is measured on the service's event generator,
+    which the route only formats as SSE.
+    """
+    first_token: List[float] = []
+    complete: List[float] = []
+    for question in questions:
+        start = time.perf_counter()
+        async for event in llm_service.astream_query_with_research(question):
+            if event['event'] == "token" and len(first_token) < len(complete) + 1:
+                first_token.append(time.perf_counter() - start)
+            elif event['event'] == "error":
+                raise RuntimeError(f"Streaming failed for {question!r}: {event['data']['error']}")
+        complete.append(time.perf_counter() - start)
+    return {'first_token': percentiles(first_token), 'complete': percentiles(complete)}
+
+
+async def bench_history(client: httpx.AsyncClient, sessions: int, messages_per_session: int) -> Dict[str, Any]:
+    writes: List[float] = []
+    reads: List[float] = []
+    session_ids = []
+    for index in range(sessions):
+        response = await client.post("/api/db/sessions", json={"title": f"Benchmark session {index}"})
+        response.raise_for_status()
+        session_ids.append(response.json()['id'])
+
+    for session_id in session_ids:
+        for index in range(messages_per_session):
+            start = time.perf_counter()
+            response = await client.post("/api/db/messages", json={
+                "session_id": session_id,
+                "question": f"Question {index}",
+                "answer": "An answer " * 50,
+                "sources": [{"title": "Fixture", "score": 0.5}] * 5
+            })
+            writes.append(time.perf_counter() - start)
+            response.raise_for_status()
+        # Re-reading unchanged history is what the sidebar and chat view do most
+        for _ in range(3):
+            start = time.perf_counter()
+            response = await client.get(f"/api/db/messages/{session_id}")
+            reads.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return {'message_write': percentiles(writes), 'history_read': percentiles(reads)}
+
+
+async def bench_app(
+    args: argparse.Namespace,
+    llm_service,
+    questions: List[str],
+    stream_questions: List[str]
+) -> Dict[str, Any]:
+    from backend.main import app
+    from backend.services.search_message_service import SearchMessageService
+    from backend.services.search_session_service import SearchSessionService
+
+    supabase = FakeSupabase(latency=args.supabase_latency_ms / 1000)
+    history_cache = HistoryCache()
+    session_service = SearchSessionService(supabase, history_cache)
+    message_service = SearchMessageService(supabase, history_cache)
+    app.dependency_overrides.update({
+        get_llm_service: lambda: llm_service,
+        get_search_session_service: lambda: session_service,
+        get_search_message_service: lambda: message_service,
+        get_message_write_buffer: lambda: None
+    })
+    try:
+        # No lifespan, so the app doesn't build the real services
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            results = {
+                'ask': await bench_ask(client, questions, args.concurrency),
+                'ask_stream': await bench_ask_stream(llm_service, stream_questions),
+                'history': await bench_history(client, args.sessions, args.messages_per_session)
+            }
+        results['history']['supabase_requests'] = supabase.requests
+        return results
+    finally:
+        app.dependency_overrides.clear()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+        config = build_config(workdir, args)
+        embedding_service, llm_service, document_service = build_services(config, args)
+
+        ingestion = bench_ingestion(embedding_service, document_service)
+        # Streaming gets its own questions, so it doesn't replay answers cached by /ask
+        questions = sample_questions(embedding_service, args.questions + args.stream_questions)
+        app_results = asyncio.run(bench_app(args, llm_service, questions[:args.questions], questions[args.questions:]))
+        document_service.downloader.close()
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'settings': vars(args),
+        'ingestion': ingestion,
+        **app_results
+    }
+
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--papers", type=int, default=3, help="fixture PDFs to ingest")
+    parser.add_argument("--parse-workers", type=int, default=0)
+    parser.add_argument("--chunking-strategy", choices=CHUNKING_STRATEGIES, default="semantic")
+    parser.add_argument("--local-index-mode", choices=("exact", "ivf"), default="exact")
+    parser.add_argument("--retrieval-strategy", choices=("vector", "hybrid", "lexical"), default="vector")
+    parser.add_argument("--answer-mode", choices=("two_pass", "single_pass"), default="two_pass")
+    parser.add_argument("--no-answer-cache", action="store_true")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--stream-questions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--messages-per-session", type=int, default=10)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--arxiv-latency-ms", type=float, default=0.0)
+    parser.add_argument("--download-latency-ms", type=float, default=0.0)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser(__doc__.splitlines()[0]).parse_args(argv)
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
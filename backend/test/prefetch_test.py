@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from backend.utils.prefetch import prefetch
+
+
+def test_prefetch_keeps_order_and_bounds_the_buffer():
+    produced = []
+
+    def source():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = prefetch(source(), max_buffered=2)
+    assert next(items) == 0
+    time.sleep(0.2)
+    # One item handed out, two buffered and at most one more waiting to be put
+    assert len(produced) <= 4
+    assert list(items) == list(range(1, 10))
+
+
+def test_prefetch_reraises_producer_errors():
+    def source():
+        yield 1
+        raise ValueError("parse failed")
+
+    items = prefetch(source(), max_buffered=4)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="parse failed"):
+        next(items)
+
+
+def test_closing_prefetch_closes_the_source():
+    closed = threading.Event()
+
+    def source():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    items = prefetch(source(), max_buffered=1)
+    assert next(items) == 0
+    items.close()
+    assert closed.is_set()
@@ -0,0 +1,58 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Response header carrying the cursor for the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class Page:
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past `row` in (created_at, id) order."""
+    payload = json.dumps([str(row['created_at']), str(row['id'])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+        return str(created_at), str(row_id)
+    except Exception:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def keyset_page(query, cursor: Optional[str], limit: Optional[int], descending: bool = False) -> Any:
+    """Orders a PostgREST query by (created_at, id) and seeks past `cursor`.
+
+    Seeking on the sort key instead of using an offset keeps every page an
+    index range scan, however deep the caller pages. One extra row is
+    requested so `to_page` can tell whether another page follows.
+    """
+    if cursor is not None:
+        created_at, row_id = decode_cursor(cursor)
+        op = "lt" if descending else "gt"
+        query = query.or_(
+            f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}."{row_id}")'
+        )
+    query = query.order('created_at', desc=descending).order('id', desc=descending)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def to_page(rows: List[Dict[str, Any]], limit: Optional[int]) -> Page:
+    if limit is None or len(rows) <= limit:
+        return Page(items=rows)
+    rows = rows[:limit]
+    return Page(items=rows, next_cursor=encode_cursor(rows[-1]))
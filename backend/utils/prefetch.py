@@ -0,0 +1,60 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def prefetch(items: Iterable[T], max_buffered: int) -> Iterator[T]:
+    """Iterates `items` on a background thread, keeping up to `max_buffered` of them ready.
+
+    The producer blocks while the buffer is full, so memory stays bounded
+    however long `items` is. Its exceptions are re-raised in the consumer,
+    and closing the returned iterator early stops it and closes `items`.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, max_buffered))
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        source = None
+        try:
+            source = iter(items)
+            for item in source:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,113 @@
+"""Reports where cold start time goes.
+
+    python -m backend.utils.startup_profile [--top 20] [--budget-ms 1500] [--init]
+
+Import times come from `python -X importtime` in a fresh interpreter, so
+nothing cached in this process skews them. `--init` also builds each
+service in the container (this needs the API keys) and reports how long
+each took. With `--budget-ms`, the exit status is 1 when importing the app
+takes longer than the budget, so CI can catch regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile_imports(module: str) -> List[ImportTiming]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        timings.append(ImportTiming(
+            module=stripped,
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+            depth=(len(name) - len(stripped) - 1) // 2
+        ))
+    return timings
+
+
+def module_total_ms(timings: List[ImportTiming], module: str) -> Optional[float]:
+    for timing in timings:
+        if timing.module == module and timing.depth == 0:
+            return timing.cumulative_us / 1000
+    return None
+
+
+def by_package(timings: List[ImportTiming]) -> Dict[str, float]:
+    totals: Dict[str, float] = defaultdict(float)
+    for timing in timings:
+        totals[timing.module.split(".")[0]] += timing.self_us / 1000
+    return dict(totals)
+
+
+def profile_init() -> Dict[str, float]:
+    from backend.services.container import ServiceContainer
+
+    services = ServiceContainer()
+    for name in ('embedding_service', 'llm_service', 'document_service', 'job_manager'):
+        start = time.perf_counter()
+        try:
+            getattr(services, name)
+        except Exception as e:
+            print(f"  {name}: failed after {(time.perf_counter() - start) * 1000:.0f} ms: {e}")
+    return {name: seconds * 1000 for name, seconds in services.build_times.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--init", action="store_true", help="also build every service and time it")
+    args = parser.parse_args(argv)
+
+    timings = profile_imports(args.module)
+    total_ms = module_total_ms(timings, args.module)
+    print(f"import {args.module}: {total_ms:.0f} ms" if total_ms is not None else f"import {args.module}: already imported")
+
+    print(f"\nSlowest packages (self time):")
+    for package, ms in sorted(by_package(timings).items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {ms:9.1f} ms  {package}")
+
+    print(f"\nSlowest modules (self time):")
+    for timing in sorted(timings, key=lambda t: t.self_us, reverse=True)[:args.top]:
+        print(f"  {timing.self_us / 1000:9.1f} ms  {timing.module}")
+
+    if args.init:
+        print("\nService initialization (imports included):")
+        for name, ms in profile_init().items():
+            print(f"  {ms:9.1f} ms  {name}")
+
+    if args.budget_ms is not None and total_ms is not None and total_ms > args.budget_ms:
+        print(f"\nImport time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
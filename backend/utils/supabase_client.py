@@ -1,11 +1,14 @@
 import os
-from typing import Optional
-from supabase import create_client, Client
+import asyncio
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
+
 class SupabaseClientSingleton:
     _instance: Optional['SupabaseClientSingleton'] = None
-    _client: Optional[Client] = None
+    _client: Optional["Client"] = None
     
     def __init__(self) -> None:
         if SupabaseClientSingleton._instance is not None:
@@ -19,6 +22,9 @@ class SupabaseClientSingleton:
         if not supabase_url or not supabase_key:
             raise ValueError('Missing Supabase environment variables')
             
+        # Imported on first use; the supabase package is slow to import
+        from supabase import create_client
+
         self._client = create_client(supabase_url, supabase_key)
         SupabaseClientSingleton._instance = self
         
@@ -28,10 +34,56 @@ class SupabaseClientSingleton:
             cls._instance = SupabaseClientSingleton()
         return cls._instance
         
-    def get_client(self) -> Client:
+    def get_client(self) -> "Client":
         if not self._client:
             raise RuntimeError('Supabase client is not initialized')
         return self._client
 
-def get_supabase() -> Client:
-    return SupabaseClientSingleton.get_instance().get_client()
\ No newline at end of file
+def get_supabase() -> "Client":
+    return SupabaseClientSingleton.get_instance().get_client()
+
+_async_client: Optional["AsyncClient"] = None
+_async_client_lock: Optional[asyncio.Lock] = None
+
+
+async def get_async_supabase() -> "AsyncClient":
+    """Shared async client; all queries go through its pooled HTTP/2 connection.
+
+    Timeouts come from SUPABASE_TIMEOUT (seconds per request, default 10) and
+    SUPABASE_CONNECT_TIMEOUT (default 5).
+    """
+    global _async_client, _async_client_lock
+    if _async_client is not None:
+        return _async_client
+    if _async_client_lock is None:
+        _async_client_lock = asyncio.Lock()
+
+    async with _async_client_lock:
+        if _async_client is None:
+            load_dotenv()
+            supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+            supabase_key = os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
+            if not supabase_url or not supabase_key:
+                raise ValueError('Missing Supabase environment variables')
+
+            import httpx
+            from supabase import AsyncClientOptions, acreate_client
+
+            timeout = httpx.Timeout(
+                float(os.getenv('SUPABASE_TIMEOUT', '10')),
+                connect=float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+            )
+            _async_client = await acreate_client(
+                supabase_url,
+                supabase_key,
+                options=AsyncClientOptions(postgrest_client_timeout=timeout)
+            )
+    return _async_client
+
+
+async def close_async_supabase() -> None:
+    global _async_client, _async_client_lock
+    if _async_client is not None:
+        await _async_client.postgrest.aclose()
+        _async_client = None
+    _async_client_lock = None
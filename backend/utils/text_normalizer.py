@@ -0,0 +1,105 @@
+import re
+
+# Lone surrogates are the only input that needs the UTF-16 round trip
+_SURROGATES = re.compile(r'[\ud800-\udfff]')
+
+_WORD_RUN = re.compile(r'\w+')
+
+# Everything that ends up as a single space: escaped newlines and unicode
+# escapes, whitespace, control characters and any non-ASCII run (which
+# covers em dashes and the / bullets)
+_SEPARATOR_RUN = re.compile(r'(?:\\n|\\u[\dA-Fa-f]{4}|[^!-~])+')
+_SEPARATOR_RUN_NO_ESCAPES = re.compile(r'[^!-~]+')
+
+
+def normalize_text(content: str) -> str:
+    """Cleans PDF page text for embedding.
+
+    Produces the same result as the original chain of substitutions in
+    `DocumentService.clean_up_text` while scanning the page a few times
+    instead of a dozen:
+
+    - repair lone surrogates (only when there are any),
+    - join words hyphenated across a line break,
+    - collapse escapes, whitespace, control and non-ASCII runs to one space,
+    - tighten spaced hyphens between words.
+    """
+    if _SURROGATES.search(content):
+        content = content.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+
+    if '-\n' in content:
+        content = _join_line_break_hyphens(content)
+
+    if '\\' in content:
+        content = _SEPARATOR_RUN.sub(' ', content)
+    else:
+        content = _SEPARATOR_RUN_NO_ESCAPES.sub(' ', content)
+
+    if ' -' in content or '- ' in content:
+        content = _tighten_spaced_hyphens(content)
+
+    return content.strip()
+
+
+def _is_word(char: str) -> bool:
+    # Same definition as `\w` for str patterns
+    return char.isalnum() or char == '_'
+
+
+def _join_line_break_hyphens(content: str) -> str:
+    """Equivalent to re.sub(r'(\\w+)-\\n(\\w+)', r'\\1\\2', content).
+
+    Visits only the `-\\n` occurrences instead of retrying `\\w+` at every
+    position. A match consumes the whole word after the break, so the next
+    break only joins if its left-hand word character was not part of it.
+    """
+    pieces = []
+    start = 0
+    consumed_end = 0
+    index = content.find('-\n')
+    while index != -1:
+        after = index + 2
+        if (
+            index > 0
+            and index - 1 >= consumed_end
+            and _is_word(content[index - 1])
+            and after < len(content)
+            and _is_word(content[after])
+        ):
+            pieces.append(content[start:index])
+            start = after
+            consumed_end = _WORD_RUN.match(content, after).end()
+        index = content.find('-\n', index + 1)
+    pieces.append(content[start:])
+    return ''.join(pieces)
+
+
+def _tighten_spaced_hyphens(content: str) -> str:
+    """Equivalent to re.sub(r'(\\w)\\s*-\\s*(\\w)', r'\\1-\\2', content) once
+    whitespace has been collapsed to single spaces.
+
+    A match consumes the word character after the hyphen, which then cannot
+    serve as the left-hand side of the next hyphen.
+    """
+    pieces = []
+    start = 0
+    consumed = -1
+    length = len(content)
+    index = content.find('-')
+    while index != -1:
+        left = index - 2 if index > 0 and content[index - 1] == ' ' else index - 1
+        right = index + 2 if index + 1 < length and content[index + 1] == ' ' else index + 1
+        if (
+            left >= 0
+            and left != consumed
+            and _is_word(content[left])
+            and right < length
+            and _is_word(content[right])
+        ):
+            pieces.append(content[start:left + 1])
+            pieces.append('-')
+            start = right
+            consumed = right
+        index = content.find('-', index + 1)
+    pieces.append(content[start:])
+    return ''.join(pieces)
@@ -18,9 +18,10 @@ const Dashboard = () => {
 
     useEffect(() => {
         setLoading(true)
+        // Recent conversations only shows the newest few
         const fetchSessions = async () => {
-            const data = await dbService.getAllSessions()
-            setSessions(data.reverse())
+            const page = await dbService.getSessions(undefined, 6)
+            setSessions(page.items)
             setLoading(false)
         };
         fetchSessions();
@@ -15,18 +15,33 @@ interface SidebarProps {
 const SidebarComponent: React.FC<SidebarProps> = ({id}) => {
     const [isOpen, setIsOpen] = useState(true);
     const [sessions, setSessions] = useState<Session[]>([])
+    const [nextCursor, setNextCursor] = useState<string | undefined>()
+    const [loadingMore, setLoadingMore] = useState(false)
     const router = useRouter()
     useEffect(() => {
 
+        // Only the newest page; older sessions load when asked for
         const fetchSessions = async () => {
-            const data = await dbService.getAllSessions()
-            setSessions(data.reverse())
-            console.log(data)
+            const page = await dbService.getSessions()
+            setSessions(page.items)
+            setNextCursor(page.nextCursor)
         };
         fetchSessions();
 
     }, [])
 
+    const handleLoadMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true)
+        try {
+            const page = await dbService.getSessions(nextCursor)
+            setSessions(previous => [...previous, ...page.items])
+            setNextCursor(page.nextCursor)
+        } finally {
+            setLoadingMore(false)
+        }
+    }
+
     const handleNewChat = () => {
         router.push('/');
     };
@@ -98,6 +113,16 @@ const SidebarComponent: React.FC<SidebarProps> = ({id}) => {
                                     <span className="ml-auto text-xs text-gray-500">{getRelativeTimeString(session.updated_at)}</span>
                                 </Button>
                             ))}
+                            {nextCursor && (
+                                <Button
+                                    variant="ghost"
+                                    className="w-full text-sm text-gray-500 hover:bg-gray-100 rounded-lg"
+                                    onClick={handleLoadMore}
+                                    disabled={loadingMore}
+                                >
+                                    {loadingMore ? "Loading..." : "Load older chats"}
+                                </Button>
+                            )}
                         </div>
                     </div>
                 </ScrollArea>
@@ -14,6 +14,8 @@ interface SearchSessionProps {
 
 const SearchSession: React.FC<SearchSessionProps> = ({ id }) => {
     const [messages, setMessages] = useState<Message[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | undefined>();
+    const [loadingMore, setLoadingMore] = useState<boolean>(false);
     const [querying, setQuerying] = useState<boolean>(false);
     const [session, setSession] = useState<Session | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -26,9 +28,22 @@ const SearchSession: React.FC<SearchSessionProps> = ({ id }) => {
         scrollToBottom();
     }, [messages]);
     const retriveResponses = async (session_id: string) => {
-        const responses = await dbService.getSessionMessages(session_id);
-        if (responses == null) return;
-        setMessages(responses);
+        const page = await dbService.getSessionMessages(session_id);
+        if (page == null) return;
+        setMessages(page.items);
+        setNextCursor(page.nextCursor);
+    };
+
+    const handleLoadMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const page = await dbService.getSessionMessages(id, nextCursor);
+            setMessages(previous => [...previous, ...page.items]);
+            setNextCursor(page.nextCursor);
+        } finally {
+            setLoadingMore(false);
+        }
     };
 
     const retriveSession = async (session_id: string) => {
@@ -43,8 +58,11 @@ const SearchSession: React.FC<SearchSessionProps> = ({ id }) => {
     const handleSubmit = async (prompt: string) => {
         setQuerying(true);
         try {
-            await handleQuery(prompt, id);
-            await retriveResponses(id);
+            const message = await handleQuery(prompt, id);
+            // With later pages still unloaded, the new message arrives when they are loaded
+            if (!nextCursor) {
+                setMessages(previous => [...previous, message]);
+            }
         } finally {
             setQuerying(false);
         }
@@ -59,7 +77,7 @@ const SearchSession: React.FC<SearchSessionProps> = ({ id }) => {
             answer: message.answer,
             sources: message.sources ? [{}] : [] // Fix for the 422 error
         };
-        await dbService.createMessage(messageBody);
+        return await dbService.createMessage(messageBody);
     };
 
     useEffect(() => {
@@ -95,6 +113,16 @@ const SearchSession: React.FC<SearchSessionProps> = ({ id }) => {
                                 response={message}
                             />
                         ))}
+                        {nextCursor && (
+                            <Button
+                                variant="ghost"
+                                className="w-full text-gray-500"
+                                onClick={handleLoadMore}
+                                disabled={loadingMore}
+                            >
+                                {loadingMore ? "Loading..." : "Load more messages"}
+                            </Button>
+                        )}
                         <div ref={messagesEndRef} /> 
 
                     </div>
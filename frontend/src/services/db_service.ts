@@ -1,10 +1,15 @@
-import { Session, CreateMessageRequest, Message, TitleRequest } from '@/utils/types';
+import { Session, CreateMessageRequest, Message, Page, TitleRequest } from '@/utils/types';
 import axios, { AxiosError } from 'axios';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
 const API_BASE_URL = `${API_URL}/api/db`;
 
+// List endpoints return one page at a time; the next page's cursor comes back in this header
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+const SESSIONS_PAGE_SIZE = 50;
+const MESSAGES_PAGE_SIZE = 100;
+
 export class DBService {
   private static instance: DBService;
   private constructor() {}
@@ -23,14 +28,19 @@ export class DBService {
     throw error;
   }
 
+  private async getPage<T>(url: string, params: Record<string, string | number | undefined>): Promise<Page<T>> {
+    const response = await axios.get<T[]>(url, { params });
+    return { items: response.data, nextCursor: response.headers[NEXT_CURSOR_HEADER] || undefined };
+  }
+
   // Session Methods
-  public async getAllSessions(): Promise<Session[]> {
+  // Newest first; callers fetch the next page only when the user asks for more
+  public async getSessions(cursor?: string, limit: number = SESSIONS_PAGE_SIZE): Promise<Page<Session>> {
     try {
-      const response = await axios.get<Session[]>(`${API_BASE_URL}/sessions`);
-      return response.data;
+      return await this.getPage<Session>(`${API_BASE_URL}/sessions`, { limit, cursor, fields: 'summary' });
     } catch (error) {
       this.handleError(error);
-      return []; // TypeScript requires this, though it will never be reached
+      return { items: [] }; // TypeScript requires this, though it will never be reached
     }
   }
 
@@ -56,13 +66,13 @@ export class DBService {
   }
 
   // Message Methods
-  public async getSessionMessages(sessionId: string): Promise<Message[]> {
+  // Oldest first, like the chat itself
+  public async getSessionMessages(sessionId: string, cursor?: string, limit: number = MESSAGES_PAGE_SIZE): Promise<Page<Message>> {
     try {
-      const response = await axios.get<Message[]>(`${API_BASE_URL}/messages/${sessionId}`);
-      return response.data;
+      return await this.getPage<Message>(`${API_BASE_URL}/messages/${sessionId}`, { limit, cursor });
     } catch (error) {
       this.handleError(error);
-      return []; // TypeScript requires this, though it will never be reached
+      return { items: [] }; // TypeScript requires this, though it will never be reached
     }
   }
 
@@ -14,6 +14,12 @@ export interface Message {
   sources: object[];
 }
 
+// One page of a list endpoint; pass nextCursor back to get the page after it
+export interface Page<T> {
+  items: T[];
+  nextCursor?: string;
+}
+
 export interface CreateMessageRequest {
   session_id: string;
   question: string;